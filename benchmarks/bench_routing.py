@@ -0,0 +1,120 @@
+"""
+Routing benchmark: networkx reference vs the compiled CSR core.
+
+Routes every ordered pair of PRESET_LOCATIONS hotspots for all four route
+types and reports per-query latency, mean nodes settled and a cost check
+against networkx.
+
+Usage:
+    python benchmarks/bench_routing.py                 # all 600 hotspot pairs
+    python benchmarks/bench_routing.py --pairs 100 --flood-time 40
+    python benchmarks/bench_routing.py --search dijkstra,astar,bidirectional,cch
+"""
+
+import argparse
+import itertools
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import networkx as nx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import config as global_config
+from server import routing
+
+ROUTE_TYPES = ["shortest", "Fastest", "flood_avoid", "smart"]
+
+
+def _nx_cost(G, route_nodes, weight):
+    return sum(weight(a, b, G.get_edge_data(a, b)) for a, b in zip(route_nodes[:-1], route_nodes[1:]))
+
+
+def _ms(samples):
+    if not samples:
+        return "-"
+    p95 = sorted(samples)[int(0.95 * (len(samples) - 1))]
+    return f"{statistics.mean(samples) * 1000:8.2f} {p95 * 1000:8.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark networkx vs CSR routing")
+    parser.add_argument("--pairs", type=int, default=0, help="Limit number of OD pairs (0 = all)")
+    parser.add_argument("--flood-time", type=int, default=0, help="Flood index for flood_avoid / smart")
+    parser.add_argument("--search", default=global_config.ROUTING_SEARCH,
+                        help="Comma-separated CSR search modes (dijkstra, astar, bidirectional, cch)")
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.search.split(",") if m.strip()]
+
+    G = routing.load_graph()
+    core = routing.load_core()
+    if core is None:
+        raise SystemExit("CSR core build failed")
+
+    hotspots = list(global_config.PRESET_LOCATIONS.values())
+    t0 = time.perf_counter()
+    nodes = [routing.find_routable_node(p["lat"], p["lon"]) for p in hotspots]
+    t_snap = (time.perf_counter() - t0) / len(hotspots)
+    pairs = [(a, b) for a, b in itertools.permutations(nodes, 2) if a != b]
+    if args.pairs:
+        pairs = pairs[: args.pairs]
+
+    flooded = int(routing._get_flood_mask(core, args.flood_time).sum())
+
+    print(f"Graph: nodes={G.number_of_nodes()} edges={G.number_of_edges()} pairs={len(pairs)} flooded_edges={flooded}")
+    print(f"Snapping: {t_snap * 1e6:.0f} us per find_routable_node")
+    print(f"{'route_type':<12} {'search':<14} {'nx mean/p95 ms':>18} {'csr mean/p95 ms':>18} {'speedup':>8} {'settled':>8} {'mismatch':>8}")
+
+    for route_type in ROUTE_TYPES:
+        resolved = routing.resolve_route_weights(core, route_type, args.flood_time)
+        weights = resolved["cost"]
+        weight = routing._nx_overlay_weight(weights)
+
+        t_nx, ref_costs = [], []
+        for o, d in pairs:
+            t0 = time.perf_counter()
+            try:
+                route_nodes = nx.shortest_path(G, o, d, weight=weight)
+            except nx.NetworkXNoPath:
+                route_nodes = None
+            t_nx.append(time.perf_counter() - t0)
+            ref_costs.append(None if route_nodes is None else _nx_cost(G, route_nodes, weight))
+
+        for mode in modes:
+            metric = None
+            if mode == "cch":
+                cch = routing.load_cch()
+                if cch is None:
+                    print(f"{route_type:<12} {mode:<14} (CCH unavailable)")
+                    continue
+                t0 = time.perf_counter()
+                metric = cch.customized(resolved["cost_key"], weights)
+                print(f"{route_type:<12} {'customize':<14} {(time.perf_counter() - t0) * 1000:>37.1f} ms")
+
+            t_csr, settled, mismatches = [], [], 0
+            for (o, d), ref in zip(pairs, ref_costs):
+                t0 = time.perf_counter()
+                if metric is not None:
+                    edge_ids, n_settled = metric.query(core.dense_node(o), core.dense_node(d))
+                else:
+                    edge_ids, n_settled = core.search(
+                        core.dense_node(o), core.dense_node(d), weights,
+                        mode=mode, bound_scale=resolved["bound_scale"],
+                    )
+                t_csr.append(time.perf_counter() - t0)
+                settled.append(n_settled)
+
+                if ref is None or edge_ids is None:
+                    mismatches += int((ref is None) != (edge_ids is None))
+                    continue
+                got = sum(float(weights[e]) for e in edge_ids)
+                if abs(ref - got) > 1e-3 * max(1.0, ref):
+                    mismatches += 1
+
+            speedup = statistics.mean(t_nx) / max(statistics.mean(t_csr), 1e-9)
+            print(f"{route_type:<12} {mode:<14} {_ms(t_nx):>18} {_ms(t_csr):>18} {speedup:>7.1f}x {statistics.mean(settled):>8.0f} {mismatches:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Build the contraction hierarchy for `shortest` routes and check it.
+
+Contracts the routing graph under edge length, saves it next to the
+GraphML as <graph stem>.ch.npz (keyed by the GraphML hash, so the server
+ignores it once the graph changes), then compares CH path lengths against
+networkx on random OD pairs and reports query latency.
+
+Usage:
+    python benchmarks/build_ch.py                  # build + check 500 random pairs
+    python benchmarks/build_ch.py --check-only --pairs 2000 --seed 7
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import networkx as nx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from server import routing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and verify the contraction hierarchy")
+    parser.add_argument("--pairs", type=int, default=500, help="Random OD pairs to check against networkx")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check-only", action="store_true", help="Use the saved hierarchy instead of rebuilding")
+    args = parser.parse_args()
+
+    G = routing.load_graph()
+    core = routing.load_core()
+    if core is None:
+        raise SystemExit("CSR core build failed")
+
+    ch = routing.load_ch() if args.check_only else routing.build_ch()
+    if ch is None:
+        raise SystemExit("No contraction hierarchy available")
+
+    rng = random.Random(args.seed)
+    nodes = core.node_ids.tolist()
+    t_ch, t_nx, settled = [], [], []
+    mismatches = 0
+
+    for _ in range(args.pairs):
+        o, d = rng.choice(nodes), rng.choice(nodes)
+
+        t0 = time.perf_counter()
+        edge_ids, n_settled = ch.query(core.dense_node(o), core.dense_node(d))
+        t_ch.append(time.perf_counter() - t0)
+        settled.append(n_settled)
+
+        t0 = time.perf_counter()
+        try:
+            ref = nx.shortest_path_length(G, o, d, weight="length")
+        except nx.NetworkXNoPath:
+            ref = None
+        t_nx.append(time.perf_counter() - t0)
+
+        if ref is None or edge_ids is None:
+            if (ref is None) != (edge_ids is None):
+                mismatches += 1
+                print(f"MISMATCH {o} -> {d}: networkx={ref} ch={'no path' if edge_ids is None else 'path'}")
+            continue
+
+        # The unpacked edges must form a connected o -> d walk of the same length
+        uvk = [core.edge_uvk(e) for e in edge_ids]
+        connected = all(a[1] == b[0] for a, b in zip(uvk[:-1], uvk[1:]))
+        ends_ok = not uvk or (uvk[0][0] == o and uvk[-1][1] == d)
+        got = sum(float(core.length[e]) for e in edge_ids)
+        if not (connected and ends_ok) or abs(got - ref) > 1e-3 * max(1.0, ref):
+            mismatches += 1
+            print(f"MISMATCH {o} -> {d}: networkx={ref:.2f} ch={got:.2f} connected={connected and ends_ok}")
+
+    p95 = sorted(t_ch)[int(0.95 * (len(t_ch) - 1))]
+    print(f"Checked {args.pairs} random pairs: mismatches={mismatches}")
+    print(f"CH query: mean {statistics.mean(t_ch) * 1000:.3f} ms, p95 {p95 * 1000:.3f} ms, "
+          f"settled {statistics.mean(settled):.0f} (networkx mean {statistics.mean(t_nx) * 1000:.2f} ms)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
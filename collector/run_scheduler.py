@@ -76,8 +76,8 @@ def log(message: str):
         pass  # Don't fail if logging fails
 
 
-def collect_traffic():
-    """Run the traffic collection script."""
+def collect_traffic() -> bool:
+    """Run the traffic collection script. Returns True if it succeeded."""
     collector_script = Path(__file__).parent / "collect_tomtom.py"
     project_root = Path(__file__).parent.parent
     
@@ -91,12 +91,13 @@ def collect_traffic():
         )
         if result.returncode == 0:
             log("✅ Collection completed successfully")
-        else:
-            log(f"⚠️ Collection finished with warnings: {result.stderr[:200] if result.stderr else 'unknown'}")
+            return True
+        log(f"⚠️ Collection finished with warnings: {result.stderr[:200] if result.stderr else 'unknown'}")
     except subprocess.TimeoutExpired:
         log("❌ Collection timed out after 5 minutes")
     except Exception as e:
         log(f"❌ Collection failed: {e}")
+    return False
 
 
 def write_pid():
@@ -147,8 +148,13 @@ def cleanup_pid():
 # ============================================================================
 # MAIN SCHEDULER LOOP
 # ============================================================================
-def run_scheduler():
-    """Main scheduler loop with smart peak/off-peak intervals."""
+def run_scheduler(on_collect=None):
+    """
+    Main scheduler loop with smart peak/off-peak intervals.
+
+    on_collect: optional callable run after every successful collection
+                (the combined server uses it to refresh precomputed routes).
+    """
     
     # Check if already running
     existing_pid = read_pid()
@@ -196,7 +202,11 @@ def run_scheduler():
             
             # Collect traffic data
             log(f"{period} | Interval: {interval} min | Starting collection #{collection_count + 1}...")
-            collect_traffic()
+            if collect_traffic() and on_collect is not None:
+                try:
+                    on_collect()
+                except Exception as e:
+                    log(f"⚠️ on_collect hook failed: {e}")
             collection_count += 1
             
             # Calculate sleep time (align to interval boundaries)
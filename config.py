@@ -97,13 +97,61 @@ COLLECTOR_INTERVAL_MIN = int(os.getenv("COLLECTOR_INTERVAL_MIN", "10"))
 FLOOD_DEPTH_THRESHOLD_M = float(os.getenv("FLOOD_DEPTH_THRESHOLD_M", "0.3"))
 FLOOD_PENALTY = float(os.getenv("FLOOD_PENALTY", "1000000.0"))
 
+# Routing engine: "csr" (compiled array graph) or "networkx" (reference fallback)
+ROUTING_ENGINE = os.getenv("ROUTING_ENGINE", "csr").strip().lower()
+
+# CSR search algorithm: "astar" (geographic lower bound), "bidirectional" or "dijkstra"
+ROUTING_SEARCH = os.getenv("ROUTING_SEARCH", "astar").strip().lower()
+
+# Customizable contraction hierarchy for Fastest / smart / flood_avoid
+# (re-customized per traffic snapshot and flood index instead of rebuilt)
+CCH_ENABLED = os.getenv("CCH_ENABLED", "True").lower() == "true"
+
+# Precompute hotspot-to-hotspot routes (PRESET_LOCATIONS) after every traffic collection
+HOTSPOT_ROUTES_ENABLED = os.getenv("HOTSPOT_ROUTES_ENABLED", "True").lower() == "true"
+
+# Max versioned weight overlays (traffic snapshot x flood index) kept in memory
+MAX_WEIGHT_OVERLAYS = int(os.getenv("MAX_WEIGHT_OVERLAYS", "32"))
+
 # Route cache settings
 MAX_ROUTE_CACHE_SIZE = int(os.getenv("MAX_ROUTE_CACHE_SIZE", "500"))
+# Total size bound of cached route path records (compact JSON), in MB
+ROUTE_CACHE_MAX_MB = float(os.getenv("ROUTE_CACHE_MAX_MB", "64"))
+# Per-route-type time to live (seconds), "type=seconds" pairs
+ROUTE_CACHE_TTL_S = {
+    k.strip(): float(v)
+    for k, v in (
+        pair.split("=", 1)
+        for pair in os.getenv(
+            "ROUTE_CACHE_TTL_S", "shortest=86400,Fastest=1800,flood_avoid=21600,smart=1800"
+        ).split(",")
+        if "=" in pair
+    )
+}
+
+# Max origins (and max destinations) accepted by /api/route/matrix
+MAX_MATRIX_POINTS = int(os.getenv("MAX_MATRIX_POINTS", "500"))
+
+# Worker processes for ingesting the flood files into the flood cell store (0 = one per CPU)
+FLOOD_PRECOMPUTE_WORKERS = int(os.getenv("FLOOD_PRECOMPUTE_WORKERS", "0"))
+
+# /api/flood/tiles: cells are merged + simplified up to this zoom, and the
+# most recently used (time, tile) responses are kept in memory
+FLOOD_TILE_MERGE_ZOOM = int(os.getenv("FLOOD_TILE_MERGE_ZOOM", "14"))
+FLOOD_TILE_CACHE_SIZE = int(os.getenv("FLOOD_TILE_CACHE_SIZE", "4096"))
+
+# Max flood cells one /api/flood/series bbox query may return
+FLOOD_SERIES_MAX_CELLS = int(os.getenv("FLOOD_SERIES_MAX_CELLS", "5000"))
 
 # Persistent cache directory (survives server restarts)
 CACHE_DIR = WEB_DIR / "data" / "cache"
-FLOOD_CACHE_FILE = CACHE_DIR / "flood_cache.json"
-ROUTE_CACHE_FILE = CACHE_DIR / "route_cache.json"
+# Packed flooded-edge bitmaps, one row per flood index (+ .npz key)
+FLOOD_CACHE_FILE = CACHE_DIR / "flood_bitmaps.npy"
+# Disk tier of the route cache: one SQLite row per path, written on insert
+ROUTE_CACHE_FILE = CACHE_DIR / "route_cache.sqlite3"
+ROUTE_CACHE_DISK_MAX_ROWS = int(os.getenv("ROUTE_CACHE_DISK_MAX_ROWS", "100000"))
+# Columnar flood store: cell table + [timestamp x cell] depth matrix (see server/flood_cells.py)
+FLOOD_CELLS_DIR = CACHE_DIR / "flood_cells"
 
 # ============================================================================
 # GEOPANDAS AND SPATIAL LIBRARIES
@@ -20,6 +20,7 @@ import config
 
 # Import Flask app
 from server.api import app
+from server.routing import schedule_hotspot_refresh
 
 # ============================================================================
 # SCHEDULER MANAGEMENT (runs in a background thread)
@@ -42,8 +43,9 @@ def run_scheduler_in_thread():
         print("✅ Traffic scheduler thread started")
         scheduler_running = True
         
-        # Run the scheduler (this blocks until stopped)
-        run_scheduler()
+        # Run the scheduler (this blocks until stopped); every new traffic
+        # snapshot triggers a background rebuild of the hotspot route table
+        run_scheduler(on_collect=schedule_hotspot_refresh)
         
     except Exception as e:
         print(f"❌ Scheduler error: {e}")
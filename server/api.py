@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List
 import sys
 import json
 import requests
@@ -16,11 +16,6 @@ from flask_cors import CORS
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 import config as global_config
 
-# ============================================================================
-# GLOBAL VARIABLES AND CACHES
-# ============================================================================
-_FLOOD_ROADS_CACHE: Dict[str, Dict[str, Any]] = {}  # key -> geojson dict
-
 # ============================================================================
 # SETUP FLASK APP
 # ============================================================================
@@ -49,15 +44,15 @@ else:
 # ROUTING IMPORT
 # ============================================================================
 try:
-    from server.routing import find_route, get_graph_info, precompute_all_flood_data, get_cache_stats
+    from server.routing import find_route, compare_routes, route_matrix, get_graph_info, precompute_all_flood_data, get_cache_stats, ROUTE_TYPES
 except ImportError:
-    from routing import find_route, get_graph_info, precompute_all_flood_data, get_cache_stats
+    from routing import find_route, compare_routes, route_matrix, get_graph_info, precompute_all_flood_data, get_cache_stats, ROUTE_TYPES
 
 # Import cache functions for API exposure
 try:
-    from server.routing import save_route_cache_to_disk, invalidate_caches
+    from server.routing import save_route_cache_to_disk, invalidate_caches, schedule_hotspot_refresh, get_flood_precompute_progress
 except ImportError:
-    from routing import save_route_cache_to_disk, invalidate_caches
+    from routing import save_route_cache_to_disk, invalidate_caches, schedule_hotspot_refresh, get_flood_precompute_progress
 
 # ============================================================================
 # USE GLOBAL CONFIGURATION
@@ -81,12 +76,24 @@ from server.handlers.flood_handler import (
     list_flood_files,
     resolve_flood_path_by_index,
     get_flood_data,
-    get_flooded_roads
+    get_flood_tile,
+    get_flood_series,
+    get_flooded_roads,
+    precompute_flooded_roads,
+    precompute_flood_gzip
 )
 from server.handlers.traffic_handler import (
     get_traffic_snapshot,
     get_traffic_info
 )
+from server.flood_cells import FloodCellsNotReady
+
+
+def _flood_loading(e: FloodCellsNotReady):
+    """503 while the flood cell store is first ingested, with the ingestion progress."""
+    response = jsonify({"error": str(e), "progress": get_flood_precompute_progress()})
+    response.headers["Retry-After"] = "30"
+    return response, 503
 
 
 @app.route("/api/times")
@@ -116,21 +123,94 @@ def api_times():
 @app.route("/api/flood")
 def api_flood():
     """
-    Returns flood polygons GeoJSON (as stored).
+    Returns flood polygons GeoJSON (as stored, minified).
     GET /api/flood?time=<index or filename>
+
+    Sent gzipped to clients that accept it, with a strong ETag per
+    representation; If-None-Match answers 304 Not Modified.
     """
     try:
         time_param = request.args.get("time")
-        result = get_flood_data(time_param)
-        if result["success"]:
-            return result["data"], 200, {"Content-Type": "application/json"}
-        return jsonify({"error": "Failed to retrieve flood data"}), 500
+        result = get_flood_data(time_param, accept_gzip=bool(request.accept_encodings["gzip"]))
+        if not result["success"]:
+            return jsonify({"error": "Failed to retrieve flood data"}), 500
+
+        response = make_response(result["body"])
+        if result["gzip"]:
+            response.headers["Content-Encoding"] = "gzip"
+            response.set_etag(result["etag"] + "-gz")
+        else:
+            response.set_etag(result["etag"])
+        response.headers["Content-Type"] = "application/json"
+        response.headers["Vary"] = "Accept-Encoding"
+        # Always revalidate: a matching ETag costs a 304 with no body
+        response.headers["Cache-Control"] = "public, no-cache"
+        return response.make_conditional(request)
     except FileNotFoundError as e:
         return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": f"Failed reading flood GeoJSON: {str(e)}"}), 500
 
 
+@app.route("/api/flood/tiles/<int:z>/<int:x>/<int:y>")
+def api_flood_tiles(z: int, x: int, y: int):
+    """
+    Returns the flood polygons of one map tile as GeoJSON, clipped to the tile.
+    Cells are merged and simplified at low zooms (FLOOD_TILE_MERGE_ZOOM).
+    GET /api/flood/tiles/<z>/<x>/<y>?time=<index or filename>
+
+    The ETag carries the flood cell store version, so re-ingested flood
+    files are never served from a stale client cache; If-None-Match
+    answers 304 Not Modified.
+    """
+    try:
+        body, etag = get_flood_tile(request.args.get("time"), z, x, y)
+        response = make_response(body)
+        response.set_etag(etag)
+        response.headers["Content-Type"] = "application/json"
+        # Always revalidate: a matching ETag costs a 304 with no body
+        response.headers["Cache-Control"] = "public, no-cache"
+        return response.make_conditional(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FloodCellsNotReady as e:
+        return _flood_loading(e)
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": f"Failed building flood tile: {str(e)}"}), 500
+
+
+@app.route("/api/flood/series")
+def api_flood_series():
+    """
+    Depth over time of the flood cells at a point or inside a bbox.
+    GET /api/flood/series?lat=<lat>&lon=<lon>
+    GET /api/flood/series?bbox=<west>,<south>,<east>,<north>
+    """
+    try:
+        bbox = request.args.get("bbox")
+        try:
+            if bbox:
+                parts = [float(v) for v in bbox.split(",")]
+                if len(parts) != 4:
+                    return jsonify({"error": "bbox must be west,south,east,north"}), 400
+                result = get_flood_series(bbox=tuple(parts))
+            else:
+                result = get_flood_series(float(request.args.get("lat")), float(request.args.get("lon")))
+        except TypeError:
+            return jsonify({"error": "Provide lat and lon, or bbox"}), 400
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FloodCellsNotReady as e:
+        return _flood_loading(e)
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": f"Failed reading flood series: {str(e)}"}), 500
+
+
 @app.route("/api/flood-roads")
 def api_flood_roads():
     """
@@ -144,12 +224,16 @@ def api_flood_roads():
 
     try:
         time_param = request.args.get("time")
-        result = get_flooded_roads(time_param)
+        body = get_flooded_roads(time_param)
         
+        # Pre-encoded GeoJSON bytes, sent as-is
+        response = make_response(body)
+        response.headers["Content-Type"] = "application/json"
         # Add cache headers for 1 hour - flood data for a specific time doesn't change
-        response = make_response(jsonify(result))
         response.headers["Cache-Control"] = "public, max-age=3600"
         return response
+    except FloodCellsNotReady as e:
+        return _flood_loading(e)
     except FileNotFoundError as e:
         return jsonify({"error": str(e)}), 404
     except Exception as e:
@@ -186,10 +270,15 @@ def api_traffic_info():
 
 @app.route("/api/traffic/refresh", methods=["POST"])
 def api_traffic_refresh():
-    """Endpoint for collector to refresh traffic data."""
+    """
+    Endpoint for collector to refresh traffic data.
+    Rebuilds the hotspot route table for the latest snapshot in the background
+    (the combined server does this itself after each collection).
+    """
+    schedule_hotspot_refresh()
     return jsonify({
         "status": "ok",
-        "message": "Refresh endpoint is ready. Hook it to your collector script when you want live updates."
+        "message": "Hotspot route refresh scheduled for the latest traffic snapshot."
     })
 
 
@@ -283,6 +372,9 @@ def api_route():
 
         return jsonify(geojson)
 
+    except FloodCellsNotReady as e:
+        return _flood_loading(e)
+
     except TypeError:
         # Backward compatibility if find_route() doesn't accept flood_time
         try:
@@ -299,6 +391,98 @@ def api_route():
         return jsonify({"error": f"Route calculation failed: {str(e)}"}), 500
 
 
+@app.route("/api/route/compare")
+def api_route_compare():
+    """
+    All four route types for one origin/destination in a single call.
+
+    Query params:
+      origin_lat, origin_lon, dest_lat, dest_lon
+      flood_time: selected flood index from slider
+
+    Returns {"routes": {type: FeatureCollection}, "summary": [...],
+             "best_eta_route_type", "flood_time", "debug_seconds"}
+    """
+    try:
+        try:
+            origin_lat = float(request.args.get("origin_lat"))
+            origin_lon = float(request.args.get("origin_lon"))
+            dest_lat = float(request.args.get("dest_lat"))
+            dest_lon = float(request.args.get("dest_lon"))
+        except TypeError:
+            return jsonify({"error": "Missing required parameters"}), 400
+        except ValueError:
+            return jsonify({"error": "Coordinates must be valid numbers"}), 400
+        flood_time = request.args.get("flood_time", None)
+
+        result = compare_routes(origin_lat, origin_lon, dest_lat, dest_lon, flood_time=flood_time)
+        for route_type, geojson in result["routes"].items():
+            geojson.setdefault("properties", {})
+            geojson["properties"]["flood_time"] = flood_time
+            geojson["properties"]["route_type"] = route_type
+
+        if all(row["error"] for row in result["summary"]):
+            return jsonify(result), 404
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({"error": f"Route comparison failed: {str(e)}"}), 500
+
+
+def _parse_latlon_list(items) -> List[tuple]:
+    """[[lat, lon], ...] or [{"lat": .., "lon": ..}, ...] -> [(lat, lon), ...]"""
+    points = []
+    for item in items:
+        if isinstance(item, dict):
+            points.append((float(item["lat"]), float(item.get("lon", item.get("lng")))))
+        else:
+            lat, lon = item
+            points.append((float(lat), float(lon)))
+    return points
+
+
+@app.route("/api/route/matrix", methods=["POST"])
+def api_route_matrix():
+    """
+    Many-to-many distance / ETA matrix (no geometry).
+
+    JSON body:
+      origins, destinations: [[lat, lon], ...] or [{"lat": .., "lon": ..}, ...]
+      type: shortest | Fastest | flood_avoid | smart
+      flood_time: selected flood index from slider
+
+    Returns distance_m[i][j] and eta_s[i][j] (None when unreachable)
+    plus per-phase debug_seconds.
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        origins = _parse_latlon_list(body.get("origins") or [])
+        destinations = _parse_latlon_list(body.get("destinations") or [])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "origins/destinations must be lists of [lat, lon] or {lat, lon}"}), 400
+
+    if not origins or not destinations:
+        return jsonify({"error": "Missing origins or destinations"}), 400
+    limit = global_config.MAX_MATRIX_POINTS
+    if len(origins) > limit or len(destinations) > limit:
+        return jsonify({"error": f"At most {limit} origins and {limit} destinations"}), 400
+
+    types = {t.lower(): t for t in ROUTE_TYPES}
+    route_type = types.get(str(body.get("type", "shortest")).strip().lower(), "shortest")
+    flood_time = body.get("flood_time")
+    flood_time = str(flood_time) if flood_time is not None else None
+
+    try:
+        result = route_matrix(origins, destinations, route_type, flood_time=flood_time)
+    except FloodCellsNotReady as e:
+        return _flood_loading(e)
+    except Exception as e:
+        return jsonify({"error": f"Matrix calculation failed: {str(e)}"}), 500
+    if result.get("error"):
+        return jsonify(result), 500
+    return jsonify(result)
+
+
 @app.route("/api/graph-info")
 def api_graph_info():
     """Get information about the underlying graph."""
@@ -345,6 +529,7 @@ def index():
 # ----------------------------
 # BACKGROUND INITIALIZATION
 # ----------------------------
+import multiprocessing
 import threading
 
 
@@ -355,8 +540,18 @@ def _init_background_cache():
         try:
             precompute_all_flood_data()
             print("[Background] ✓ Flood cache ready!\n")
+            # Hotspot routes for every flood index cached above
+            schedule_hotspot_refresh()
         except Exception as e:
             print(f"[Background] Warning: Flood pre-computation failed: {e}\n")
+        try:
+            precompute_flooded_roads()
+        except Exception as e:
+            print(f"[Background] Warning: Flooded roads pre-computation failed: {e}\n")
+        try:
+            precompute_flood_gzip()
+        except Exception as e:
+            print(f"[Background] Warning: Flood GeoJSON gzip failed: {e}\n")
     
     # Start caching in background (daemon thread won't block app startup)
     cache_thread = threading.Thread(target=background_cache, daemon=True)
@@ -364,8 +559,10 @@ def _init_background_cache():
     print("[Background] Cache initialization started in background thread")
 
 
-# Start background caching when app module loads
-_init_background_cache()
+# Start background caching when app module loads (not in the flood worker
+# processes, which re-import the main module when they are spawned)
+if multiprocessing.parent_process() is None:
+    _init_background_cache()
 
 
 if __name__ == "__main__":
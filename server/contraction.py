@@ -0,0 +1,341 @@
+# server/contraction.py
+"""
+Contraction Hierarchies over the compiled CSR graph.
+
+Preprocessing contracts nodes one by one (least important first), adding
+shortcut arcs wherever a contracted node lay on the only short path
+between two of its neighbours. A query is then a bidirectional Dijkstra
+that only ever climbs to higher-ranked nodes, which settles a few hundred
+nodes instead of a large part of the city.
+
+Arcs are stored in one table: original arcs point at a dense edge id of
+the CompiledGraph, shortcut arcs at the two arcs they replace, so a path
+unpacks back into the original (u, v, k) edges for rendering.
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from server.graph_core import CompiledGraph
+except ImportError:
+    from graph_core import CompiledGraph
+
+# Witness searches give up after settling this many nodes; a missed
+# witness only costs a redundant shortcut, never a wrong answer.
+WITNESS_SETTLE_LIMIT = 60
+
+
+class ContractionHierarchy:
+    """
+    Upward / downward search graphs of a contraction hierarchy.
+
+    up_*:   arcs a -> b with rank[b] > rank[a], grouped by a (forward search)
+    down_*: arcs a -> b with rank[a] > rank[b], grouped by b (backward search)
+    """
+
+    def __init__(
+        self,
+        rank: np.ndarray,
+        arc_tail: np.ndarray,
+        arc_head: np.ndarray,
+        arc_weight: np.ndarray,
+        arc_eid: np.ndarray,
+        arc_child: np.ndarray,
+    ):
+        self.rank = rank
+        self.arc_tail = arc_tail
+        self.arc_head = arc_head
+        self.arc_weight = arc_weight
+        self.arc_eid = arc_eid
+        self.arc_child = arc_child  # (A, 2) child arcs of shortcuts, -1 for original arcs
+        n = int(rank.shape[0])
+
+        # Keep only the cheapest arc per (tail, head); superseded arcs stay in the
+        # table because shortcuts may still unpack through them.
+        order = np.lexsort((arc_weight, arc_head, arc_tail))
+        t, h = arc_tail[order], arc_head[order]
+        first = np.ones(order.shape[0], dtype=bool)
+        first[1:] = (t[1:] != t[:-1]) | (h[1:] != h[:-1])
+        best = order[first]
+
+        up = best[rank[arc_head[best]] > rank[arc_tail[best]]]
+        down = best[rank[arc_tail[best]] > rank[arc_head[best]]]
+        up = up[np.argsort(arc_tail[up], kind="stable")]
+        down = down[np.argsort(arc_head[down], kind="stable")]
+
+        self.up_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(arc_tail[up], minlength=n), out=self.up_indptr[1:])
+        self.down_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(arc_head[down], minlength=n), out=self.down_indptr[1:])
+
+        self._up_ptr = memoryview(self.up_indptr)
+        self._up_node = memoryview(np.ascontiguousarray(arc_head[up]))
+        self._up_w = memoryview(np.ascontiguousarray(arc_weight[up]))
+        self._up_arc = memoryview(np.ascontiguousarray(up))
+        self._down_ptr = memoryview(self.down_indptr)
+        self._down_node = memoryview(np.ascontiguousarray(arc_tail[down]))
+        self._down_w = memoryview(np.ascontiguousarray(arc_weight[down]))
+        self._down_arc = memoryview(np.ascontiguousarray(down))
+        self._eid_l = memoryview(np.ascontiguousarray(arc_eid))
+        self._child_l = memoryview(np.ascontiguousarray(arc_child[:, 0])), memoryview(np.ascontiguousarray(arc_child[:, 1]))
+
+    @property
+    def n_arcs(self) -> int:
+        return int(self.arc_tail.shape[0])
+
+    @property
+    def n_shortcuts(self) -> int:
+        return int((self.arc_eid < 0).sum())
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "rank": self.rank,
+            "arc_tail": self.arc_tail,
+            "arc_head": self.arc_head,
+            "arc_weight": self.arc_weight,
+            "arc_eid": self.arc_eid,
+            "arc_child": self.arc_child,
+        }
+
+    @classmethod
+    def from_arrays(cls, data) -> "ContractionHierarchy":
+        return cls(data["rank"], data["arc_tail"], data["arc_head"], data["arc_weight"], data["arc_eid"], data["arc_child"])
+
+    # ---------------------------
+    # Query
+    # ---------------------------
+    def query(self, source: int, target: int) -> Tuple[Optional[List[int]], int]:
+        """
+        Shortest path between dense nodes.
+
+        Returns:
+            (dense edge ids along the path or None if unreachable, nodes settled)
+        """
+        if source == target:
+            return [], 1
+
+        inf = float("inf")
+        push, pop = heapq.heappush, heapq.heappop
+        up_ptr, up_node, up_w, up_arc = self._up_ptr, self._up_node, self._up_w, self._up_arc
+        dn_ptr, dn_node, dn_w, dn_arc = self._down_ptr, self._down_node, self._down_w, self._down_arc
+
+        dist_f: Dict[int, float] = {source: 0.0}
+        dist_b: Dict[int, float] = {target: 0.0}
+        pred_f: Dict[int, int] = {}
+        pred_b: Dict[int, int] = {}
+        done_f = set()
+        done_b = set()
+        heap_f = [(0.0, source)]
+        heap_b = [(0.0, target)]
+        best = inf
+        meet = -1
+
+        # Both searches only go upward, so neither can stop at the first
+        # meeting: each runs until its queue head can't improve `best`.
+        while (heap_f and heap_f[0][0] < best) or (heap_b and heap_b[0][0] < best):
+            if heap_f and heap_f[0][0] < best and (not heap_b or heap_b[0][0] >= best or heap_f[0][0] <= heap_b[0][0]):
+                d, u = pop(heap_f)
+                if u in done_f:
+                    continue
+                done_f.add(u)
+                db = dist_b.get(u)
+                if db is not None and d + db < best:
+                    best, meet = d + db, u
+                # Stall-on-demand: a higher node already reaches u more cheaply,
+                # so u's tentative distance is not exact and expanding it is wasted
+                if any(dist_f.get(dn_node[i], inf) + dn_w[i] < d for i in range(dn_ptr[u], dn_ptr[u + 1])):
+                    continue
+                for i in range(up_ptr[u], up_ptr[u + 1]):
+                    v = up_node[i]
+                    nd = d + up_w[i]
+                    if nd < dist_f.get(v, inf):
+                        dist_f[v] = nd
+                        pred_f[v] = up_arc[i]
+                        push(heap_f, (nd, v))
+            else:
+                d, u = pop(heap_b)
+                if u in done_b:
+                    continue
+                done_b.add(u)
+                df = dist_f.get(u)
+                if df is not None and d + df < best:
+                    best, meet = d + df, u
+                if any(dist_b.get(up_node[i], inf) + up_w[i] < d for i in range(up_ptr[u], up_ptr[u + 1])):
+                    continue
+                for i in range(dn_ptr[u], dn_ptr[u + 1]):
+                    v = dn_node[i]
+                    nd = d + dn_w[i]
+                    if nd < dist_b.get(v, inf):
+                        dist_b[v] = nd
+                        pred_b[v] = dn_arc[i]
+                        push(heap_b, (nd, v))
+
+        settled = len(done_f) + len(done_b)
+        if meet < 0:
+            return None, settled
+
+        arcs: List[int] = []
+        node = meet
+        while node != source:
+            a = pred_f[node]
+            arcs.append(a)
+            node = int(self.arc_tail[a])
+        arcs.reverse()
+        node = meet
+        while node != target:
+            a = pred_b[node]
+            arcs.append(a)
+            node = int(self.arc_head[a])
+        return self.unpack(arcs), settled
+
+    def unpack(self, arcs: List[int]) -> List[int]:
+        """Expand shortcut arcs (recursively) into original dense edge ids, in path order."""
+        eid_l = self._eid_l
+        left, right = self._child_l
+        out: List[int] = []
+        stack = list(reversed(arcs))
+        while stack:
+            a = stack.pop()
+            e = eid_l[a]
+            if e >= 0:
+                out.append(e)
+            else:
+                stack.append(right[a])
+                stack.append(left[a])
+        return out
+
+
+# ---------------------------
+# Preprocessing
+# ---------------------------
+def build_contraction_hierarchy(core: CompiledGraph, weights: np.ndarray) -> ContractionHierarchy:
+    """
+    Contract every node of `core` under the static per-edge `weights`
+    (e.g. core.length). Node order: lazy-updated edge difference plus
+    the number of already contracted neighbours.
+    """
+    t0 = time.perf_counter()
+    n = core.n_nodes
+    w = np.asarray(weights, dtype=np.float64)
+
+    # One arc per (u, v): the cheapest parallel edge; self-loops never help
+    src = core.edge_source.astype(np.int64)
+    dst = core.edge_target.astype(np.int64)
+    order = np.lexsort((w, dst, src))
+    order = order[src[order] != dst[order]]
+    keep = np.ones(order.shape[0], dtype=bool)
+    keep[1:] = (src[order][1:] != src[order][:-1]) | (dst[order][1:] != dst[order][:-1])
+    order = order[keep]
+
+    arc_tail: List[int] = src[order].tolist()
+    arc_head: List[int] = dst[order].tolist()
+    arc_weight: List[float] = w[order].tolist()
+    arc_eid: List[int] = order.tolist()
+    arc_child: List[Tuple[int, int]] = [(-1, -1)] * len(arc_tail)
+
+    out_adj: List[Dict[int, int]] = [dict() for _ in range(n)]
+    in_adj: List[Dict[int, int]] = [dict() for _ in range(n)]
+    for a, (u, v) in enumerate(zip(arc_tail, arc_head)):
+        out_adj[u][v] = a
+        in_adj[v][u] = a
+
+    inf = float("inf")
+
+    def witness(u: int, skip: int, limit: float) -> Dict[int, float]:
+        """Distances from u in the remaining graph, avoiding `skip`, up to `limit`."""
+        dist = {u: 0.0}
+        heap = [(0.0, u)]
+        settled = 0
+        while heap and settled < WITNESS_SETTLE_LIMIT:
+            d, x = heapq.heappop(heap)
+            if d > dist.get(x, inf):
+                continue
+            if d > limit:
+                break
+            settled += 1
+            for y, a in out_adj[x].items():
+                if y == skip:
+                    continue
+                nd = d + arc_weight[a]
+                if nd < dist.get(y, inf):
+                    dist[y] = nd
+                    heapq.heappush(heap, (nd, y))
+        return dist
+
+    def shortcuts(v: int) -> List[Tuple[int, int, int, int]]:
+        """(u, x, in arc, out arc) shortcuts that contracting v would need."""
+        needed = []
+        outs = out_adj[v]
+        if not outs:
+            return needed
+        max_out = max(arc_weight[a] for a in outs.values())
+        for u, a_in in in_adj[v].items():
+            w_in = arc_weight[a_in]
+            dist = witness(u, v, w_in + max_out)
+            for x, a_out in outs.items():
+                if x == u:
+                    continue
+                if dist.get(x, inf) > w_in + arc_weight[a_out]:
+                    needed.append((u, x, a_in, a_out))
+        return needed
+
+    deleted = [0] * n
+
+    def priority(v: int) -> int:
+        return len(shortcuts(v)) - len(in_adj[v]) - len(out_adj[v]) + deleted[v]
+
+    heap = [(priority(v), v) for v in range(n)]
+    heapq.heapify(heap)
+    rank = np.full(n, -1, dtype=np.int64)
+    next_rank = 0
+
+    while heap:
+        _, v = heapq.heappop(heap)
+        if rank[v] >= 0:
+            continue
+        p = priority(v)
+        if heap and p > heap[0][0]:
+            heapq.heappush(heap, (p, v))
+            continue
+
+        for u, x, a_in, a_out in shortcuts(v):
+            via = arc_weight[a_in] + arc_weight[a_out]
+            existing = out_adj[u].get(x)
+            if existing is not None and arc_weight[existing] <= via:
+                continue
+            a = len(arc_tail)
+            arc_tail.append(u)
+            arc_head.append(x)
+            arc_weight.append(via)
+            arc_eid.append(-1)
+            arc_child.append((a_in, a_out))
+            out_adj[u][x] = a
+            in_adj[x][u] = a
+
+        for u in in_adj[v]:
+            del out_adj[u][v]
+            deleted[u] += 1
+        for x in out_adj[v]:
+            del in_adj[x][v]
+            deleted[x] += 1
+        in_adj[v] = {}
+        out_adj[v] = {}
+        rank[v] = next_rank
+        next_rank += 1
+
+    ch = ContractionHierarchy(
+        rank,
+        np.asarray(arc_tail, dtype=np.int32),
+        np.asarray(arc_head, dtype=np.int32),
+        np.asarray(arc_weight, dtype=np.float64),
+        np.asarray(arc_eid, dtype=np.int64),
+        np.asarray(arc_child, dtype=np.int64).reshape(-1, 2),
+    )
+    print(f"[CH] Contracted {n} nodes: {ch.n_arcs} arcs ({ch.n_shortcuts} shortcuts) in {time.perf_counter() - t0:.1f}s")
+    return ch
@@ -0,0 +1,71 @@
+# server/edge_geometry.py
+"""
+Flat per-edge geometry store for route rendering.
+
+Every edge's polyline is resolved once (osmnx edge geometry, road GeoJSON
+fallback, or the straight u -> v segment) and flattened into a single
+(n_points, 2) float64 (lon, lat) buffer with a CSR-style offset array
+indexed by dense edge id. The buffer is memory-mapped from disk, so
+assembling a route's LineString is a gather over a few slices instead of a
+GeoDataFrame MultiIndex lookup per edge.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+class EdgeGeometry:
+    """
+    coords[ptr[e]:ptr[e+1]] are the (lon, lat) points of edge e, in travel
+    order. Coordinates are kept as float64 so rendered output is bit-identical
+    to the source geometries.
+    """
+
+    def __init__(self, coords: np.ndarray, ptr: np.ndarray):
+        self.coords = coords
+        self.ptr = ptr
+        self.n_edges = int(ptr.shape[0]) - 1
+
+    @classmethod
+    def from_edge_points(cls, edge_points: Iterable[Sequence[Tuple[float, float]]]) -> "EdgeGeometry":
+        """Flatten per-edge point lists (indexed by dense edge id)."""
+        counts: List[int] = []
+        flat: List[Tuple[float, float]] = []
+        for pts in edge_points:
+            counts.append(len(pts))
+            flat.extend((float(p[0]), float(p[1])) for p in pts)
+        ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=ptr[1:])
+        coords = np.asarray(flat, dtype=np.float64).reshape(-1, 2)
+        return cls(coords, ptr)
+
+    @property
+    def n_points(self) -> int:
+        return int(self.coords.shape[0])
+
+    def edge_coords(self, eid: int) -> List[List[float]]:
+        return self.coords[self.ptr[eid]:self.ptr[eid + 1]].tolist()
+
+    def linestring(self, edge_ids: Sequence[int]) -> List[List[float]]:
+        """
+        [[lon, lat], ...] for consecutive edges. The first point of an edge is
+        dropped when it repeats the previous edge's last point.
+        """
+        if len(edge_ids) == 0:
+            return []
+        ids = np.asarray(edge_ids, dtype=np.int64)
+        start = self.ptr[ids]
+        end = self.ptr[ids + 1]
+
+        # Edges always have at least one point, so the previous edge's last
+        # point is the last coordinate emitted so far.
+        start[1:] += np.all(self.coords[start[1:]] == self.coords[end[:-1] - 1], axis=1)
+
+        counts = end - start
+        out_ptr = np.zeros(ids.shape[0], dtype=np.int64)
+        np.cumsum(counts[:-1], out=out_ptr[1:])
+        take = np.repeat(start - out_ptr, counts) + np.arange(int(counts.sum()))
+        return self.coords[take].tolist()
@@ -0,0 +1,80 @@
+# server/flood_bitmaps.py
+"""
+Per-timestamp flooded-edge sets as packed bitmaps over dense edge ids.
+
+Row t of a single (n_slots, ceil(n_edges / 8)) uint8 matrix holds the
+flooded flag of every edge at flood index t (little bit order, so edge e is
+bit e & 7 of byte e >> 3). A `present` flag per row tells computed rows
+apart from all-clear ones. The matrix lives in one .npy memory-mapped
+read/write (routing._open_flood_store), so every timestamp loads in
+milliseconds at 1 bit per edge. Each row is flushed to disk as soon as it is
+computed, before its present flag is written to the .npz key, so an
+interrupted pre-computation resumes from the rows already on disk.
+Membership, union, difference and popcount are numpy bit operations.
+"""
+
+from __future__ import annotations
+
+from typing import List, Sequence
+
+import numpy as np
+
+# Set bits per byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class FloodBitmaps:
+    def __init__(self, bits: np.ndarray, present: np.ndarray, n_edges: int, source: str = ""):
+        self.bits = bits
+        self.present = present
+        self.n_edges = int(n_edges)
+        # Flood data the rows were computed from (cell store version + depth threshold)
+        self.source = source
+
+    @classmethod
+    def empty(cls, n_slots: int, n_edges: int, source: str = "") -> "FloodBitmaps":
+        bits = np.zeros((n_slots, (n_edges + 7) // 8), dtype=np.uint8)
+        return cls(bits, np.zeros(n_slots, dtype=bool), n_edges, source)
+
+    @property
+    def n_slots(self) -> int:
+        return int(self.bits.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.bits.nbytes + self.present.nbytes)
+
+    def has(self, t: int) -> bool:
+        return 0 <= t < self.n_slots and bool(self.present[t])
+
+    def indices(self) -> List[int]:
+        """Flood indices whose bitmap has been computed."""
+        return np.flatnonzero(self.present).tolist()
+
+    def set_mask(self, t: int, mask: np.ndarray) -> None:
+        self.bits[t] = np.packbits(np.asarray(mask, dtype=bool), bitorder="little")
+        self.present[t] = True
+
+    def _unpack(self, row: np.ndarray) -> np.ndarray:
+        return np.unpackbits(row, count=self.n_edges, bitorder="little").view(bool)
+
+    def mask(self, t: int) -> np.ndarray:
+        """Boolean flooded flag per dense edge id at flood index t."""
+        return self._unpack(self.bits[t])
+
+    def contains(self, t: int, eids) -> np.ndarray:
+        """Flooded flag of the given dense edge ids at flood index t."""
+        eids = np.asarray(eids, dtype=np.int64)
+        return ((self.bits[t, eids >> 3] >> (eids & 7).astype(np.uint8)) & 1).astype(bool)
+
+    def union(self, ts: Sequence[int]) -> np.ndarray:
+        """Edges flooded at any of the flood indices ts."""
+        return self._unpack(np.bitwise_or.reduce(self.bits[list(ts)], axis=0))
+
+    def difference(self, a: int, b: int) -> np.ndarray:
+        """Edges flooded at index a but not at index b."""
+        return self._unpack(self.bits[a] & ~self.bits[b])
+
+    def popcount(self, t: int) -> int:
+        """Number of flooded edges at flood index t."""
+        return int(_POPCOUNT[self.bits[t]].sum(dtype=np.int64))
@@ -0,0 +1,396 @@
+# server/flood_cells.py
+"""
+Columnar flood timeline: one cell table plus a [timestamp x cell] depth matrix.
+
+Every GEOCODED flood file repeats the same square cells (keyed by geo_code)
+and only their depth changes, stored under a property named after the file
+stem (D202507130400) rather than a fixed column. Ingestion reads each file
+once on a process pool (flood_precompute, persisting it under files/ as it
+goes, so an interrupted ingestion resumes) and writes to FLOOD_CELLS_DIR:
+  cells.npz   geo_code and WKB geometry (flat buffer + offsets) per cell
+  depth.npy   float32 [n_times, n_cells]; NaN where a file has no such cell,
+              -inf where its depth is null, missing or not a number (present,
+              never flooded)
+  series.npy  the same matrix transposed [n_cells, n_times], so the depth
+              history of one cell is a contiguous row
+  meta.json   the source files (name, size, mtime) they were built from
+Both matrices are memory-mapped, so loading the whole timeline is instant, a
+depth threshold over a timestamp is one row comparison and a cell's time
+series is one row read. An STRtree over the cells (tree) answers point and
+bbox lookups. Consumers map the flooded cells to edges or roads through a
+(cell, line) pair table built once per index (cell_pairs), instead of
+re-reading and re-joining GeoJSON; FloodTimeline walks the timestamps by
+applying only the cells whose flooded state changed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import shapely
+except ImportError:  # flood cells need shapely
+    shapely = None
+
+try:
+    from server.flood_precompute import STORE_FORMAT, Progress, ingest_flood_files, pack_wkb
+except ImportError:
+    from flood_precompute import STORE_FORMAT, Progress, ingest_flood_files, pack_wkb
+
+# Seconds between two scans of the flood files while the directory mtime is unchanged
+CHECK_INTERVAL_S = 5.0
+# Seconds before files whose ingestion failed are ingested again (unless they change)
+RETRY_INTERVAL_S = 600.0
+
+_flood_cells: Optional["FloodCells"] = None
+_flood_cells_lock = threading.Lock()
+# (flood directory mtime, monotonic time) of the last scan of the flood files
+_checked: Optional[Tuple[int, float]] = None
+# Background re-ingestion after the flood files changed at runtime
+_reingest_thread: Optional[threading.Thread] = None
+# (version, monotonic time) of the last failed ingestion
+_failed: Optional[Tuple[str, float]] = None
+
+
+class FloodCellsNotReady(Exception):
+    """The flood files are still being ingested into the flood cell store for the first time."""
+
+
+class FloodCells:
+    """Cell table + depth matrix of one version of the flood files."""
+
+    def __init__(
+        self,
+        names: List[str],
+        version: str,
+        geo_codes: np.ndarray,
+        wkb: np.ndarray,
+        wkb_ptr: np.ndarray,
+        depth: np.ndarray,
+        series: Optional[np.ndarray] = None,
+    ):
+        self.names = names
+        self.version = version
+        self.geo_codes = geo_codes
+        self.wkb = wkb
+        self.wkb_ptr = wkb_ptr
+        self.depth = depth
+        self.series = series if series is not None else np.ascontiguousarray(np.asarray(depth).T)
+        self._lock = threading.Lock()
+        self._geoms: Optional[np.ndarray] = None
+        self._tree: Optional[Any] = None
+
+    @classmethod
+    def load(cls, directory: Path, meta: Dict[str, Any]) -> "FloodCells":
+        with np.load(directory / "cells.npz") as data:
+            geo_codes, wkb, wkb_ptr = data["geo_code"], data["wkb"], data["wkb_ptr"]
+        depth = np.load(directory / "depth.npy", mmap_mode="r")
+        series = np.load(directory / "series.npy", mmap_mode="r")
+        return cls([s[0] for s in meta["sources"]], meta["version"], geo_codes, wkb, wkb_ptr, depth, series)
+
+    @property
+    def n_times(self) -> int:
+        return int(self.depth.shape[0])
+
+    @property
+    def n_cells(self) -> int:
+        return int(self.depth.shape[1])
+
+    def index_of(self, name: str) -> Optional[int]:
+        try:
+            return self.names.index(name)
+        except ValueError:
+            return None
+
+    def geoms(self) -> np.ndarray:
+        """Shapely geometry per cell, decoded from WKB on first use."""
+        with self._lock:
+            if self._geoms is None:
+                buf = self.wkb.tobytes()
+                ptr = self.wkb_ptr
+                self._geoms = shapely.from_wkb([buf[ptr[i]:ptr[i + 1]] for i in range(self.n_cells)])
+            return self._geoms
+
+    def tree(self) -> Any:
+        """STRtree over the cell geometries (tree indices are cell indices), built on first use."""
+        geoms = self.geoms()
+        with self._lock:
+            if self._tree is None:
+                t0 = time.perf_counter()
+                self._tree = shapely.STRtree(geoms)
+                print(f"[Flood] Cell index over {self.n_cells} cells built in {time.perf_counter() - t0:.3f}s")
+            return self._tree
+
+    def query(self, geometry: Any) -> np.ndarray:
+        """Sorted indices of the cells intersecting geometry."""
+        return np.sort(self.tree().query(geometry, predicate="intersects"))
+
+    def present(self, t: int) -> np.ndarray:
+        """Cells that appear in the flood file of timestamp t."""
+        return ~np.isnan(self.depth[t])
+
+    def flooded(self, t: int, depth_threshold: float) -> np.ndarray:
+        """Cells deeper than depth_threshold at timestamp t (absent cells never are)."""
+        return self.depth[t] > depth_threshold
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "times": self.n_times,
+            "cells": self.n_cells,
+            "depth_bytes": int(self.depth.nbytes),
+            "series_bytes": int(self.series.nbytes),
+            "geometry_bytes": int(self.wkb.nbytes),
+        }
+
+
+def cell_pairs(cells: FloodCells, index: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """(cell, line id) of every cell intersecting a line of `index` (a LineIndex)."""
+    return index.query(cells.geoms())
+
+
+def lines_of(pairs: Tuple[np.ndarray, np.ndarray], cell_mask: np.ndarray) -> np.ndarray:
+    """Line ids (with repeats) intersecting any cell of cell_mask."""
+    cell_idx, ids = pairs
+    return ids[cell_mask[cell_idx]]
+
+
+class FloodTimeline:
+    """
+    Flooded lines of the current timestamp of a flood cell store, maintained
+    incrementally. count[i] is the number of flooded cells intersecting line
+    i; moving to another timestamp only applies the cells that started or
+    stopped being flooded (consecutive timestamps share most of them), looked
+    up in the (cell, line) pair table grouped by cell.
+    """
+
+    def __init__(self, cells: FloodCells, pairs: Tuple[np.ndarray, np.ndarray], n_lines: int, depth_threshold: float):
+        cell_idx, ids = pairs
+        order = np.argsort(cell_idx, kind="stable")
+        self._ids = ids[order]
+        self._ptr = np.searchsorted(cell_idx[order], np.arange(cells.n_cells + 1))
+        self.cells = cells
+        self.depth_threshold = depth_threshold
+        self.count = np.zeros(n_lines, dtype=np.int32)
+        self.flooded = np.zeros(cells.n_cells, dtype=bool)
+
+    def _lines(self, cell_ids: np.ndarray) -> np.ndarray:
+        """Line ids (with repeats) of the given cells."""
+        starts = self._ptr[cell_ids]
+        lens = self._ptr[cell_ids + 1] - starts
+        offsets = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+        return self._ids[offsets + np.arange(offsets.shape[0])]
+
+    def advance(self, t: int) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Move to timestamp t. Returns the flooded flag per line plus
+        {"cells_flooded", "cells_added", "cells_removed", "lines_flooded", "seconds"}.
+        """
+        t0 = time.perf_counter()
+        flooded = self.cells.flooded(t, self.depth_threshold)
+        added = np.flatnonzero(flooded & ~self.flooded)
+        removed = np.flatnonzero(self.flooded & ~flooded)
+        np.add.at(self.count, self._lines(added), 1)
+        np.subtract.at(self.count, self._lines(removed), 1)
+        self.flooded = flooded
+        mask = self.count > 0
+        return mask, {
+            "cells_flooded": int(flooded.sum()),
+            "cells_added": int(added.shape[0]),
+            "cells_removed": int(removed.shape[0]),
+            "lines_flooded": int(mask.sum()),
+            "seconds": round(time.perf_counter() - t0, 4),
+        }
+
+
+def _sources(files: Sequence[Path]) -> List[List[Any]]:
+    out = []
+    for p in files:
+        st = p.stat()
+        out.append([p.name, st.st_size, st.st_mtime_ns])
+    return out
+
+
+def _version(sources: List[List[Any]]) -> str:
+    return hashlib.sha1(json.dumps([STORE_FORMAT, sources]).encode("utf-8")).hexdigest()[:16]
+
+
+def _save(directory: Path, cells: FloodCells, sources: List[List[Any]]) -> None:
+    """Write the store; meta.json goes last, so a partial write is never taken as current."""
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / "cells.npz.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, geo_code=cells.geo_codes, wkb=cells.wkb, wkb_ptr=cells.wkb_ptr)
+    tmp.replace(directory / "cells.npz")
+    tmp = directory / "depth.npy.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.asarray(cells.depth))
+    tmp.replace(directory / "depth.npy")
+    tmp = directory / "series.npy.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, cells.series)
+    tmp.replace(directory / "series.npy")
+    tmp = directory / "meta.json.tmp"
+    tmp.write_text(json.dumps({"version": cells.version, "sources": sources}), encoding="utf-8")
+    tmp.replace(directory / "meta.json")
+
+
+def build_flood_cells(
+    files: Sequence[Path], directory: Path, workers: int, progress: Optional[Progress] = None
+) -> FloodCells:
+    """
+    Ingest the flood files (on `workers` processes) and persist the store to
+    directory. Each file is persisted under directory/files as soon as it is
+    read, so an interrupted ingestion resumes with the files not read yet;
+    progress(done, total, resumed) is called after each file.
+    """
+    t0 = time.perf_counter()
+    sources = _sources(files)
+    code_index: Dict[str, int] = {}
+    wkb: List[bytes] = []
+    rows: List[Tuple[np.ndarray, np.ndarray]] = []
+    for codes, part_wkb, part_ptr, depths in ingest_flood_files(files, sources, directory / "files", workers, progress):
+        idx = np.empty(len(codes), dtype=np.int64)
+        for j, code in enumerate(codes.tolist()):
+            k = code_index.get(code)
+            if k is None:
+                k = code_index[code] = len(wkb)
+                wkb.append(part_wkb[part_ptr[j]:part_ptr[j + 1]].tobytes())
+            idx[j] = k
+        rows.append((idx, depths))
+
+    depth = np.full((len(files), len(wkb)), np.nan, dtype=np.float32)
+    for t, (idx, depths) in enumerate(rows):
+        depth[t, idx] = depths
+    wkb_buf, wkb_ptr = pack_wkb(wkb)
+    cells = FloodCells(
+        [p.name for p in files],
+        _version(sources),
+        np.array(list(code_index), dtype=str),
+        wkb_buf,
+        wkb_ptr,
+        depth,
+    )
+    print(f"[Flood] Ingested {len(files)} flood files: {cells.n_cells} cells, "
+          f"{depth.nbytes / 1e6:.1f} MB depth matrix in {time.perf_counter() - t0:.2f}s")
+
+    try:
+        _save(directory, cells, sources)
+        return FloodCells.load(directory, {"version": cells.version, "sources": sources})
+    except OSError as e:
+        print(f"[Flood] ✗ Flood cell store not persisted ({e}), keeping it in memory")
+        return cells
+
+
+def _open(directory: Path, version: str) -> Optional[FloodCells]:
+    """The persisted store if it was built from the files of `version`, else None."""
+    meta_path = directory / "meta.json"
+    if not meta_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("version") == version:
+            cells = FloodCells.load(directory, meta)
+            print(f"[Flood] ✓ Flood cell store: {cells.n_times} timestamps x {cells.n_cells} cells")
+            return cells
+        print("[Flood] Flood files changed, re-ingesting the flood cell store")
+    except Exception as e:
+        print(f"[Flood] Could not read the flood cell store ({e}), re-ingesting")
+    return None
+
+
+def _reingest(
+    files: Sequence[Path], directory: Path, version: str, workers: int, progress: Optional[Progress]
+) -> None:
+    global _flood_cells, _failed
+    try:
+        cells = _open(directory, version)
+        if cells is None:
+            cells = build_flood_cells(files, directory, workers, progress)
+    except Exception as e:
+        print(f"[Flood] ✗ Ingesting the flood cell store failed: {e} "
+              f"(retrying when the flood files change or in {RETRY_INTERVAL_S:.0f}s)")
+        with _flood_cells_lock:
+            _failed = (version, time.monotonic())
+        return
+    with _flood_cells_lock:
+        _flood_cells = cells
+        _failed = None
+
+
+def is_ingesting() -> bool:
+    """True while the flood files are being (re-)ingested on the background thread."""
+    thread = _reingest_thread
+    return thread is not None and thread.is_alive()
+
+
+def load_flood_cells(
+    flood_dir: Path,
+    directory: Path,
+    workers: int = 1,
+    progress: Optional[Progress] = None,
+    wait: bool = False,
+) -> Optional[FloodCells]:
+    """
+    Flood cells of flood_dir's D*.geojson files, memory-mapped from directory;
+    None without flood files, or while they are ingested for the first time
+    (see is_ingesting).
+
+    The files are re-scanned when the directory's mtime changes (files added,
+    removed or replaced) and at most every CHECK_INTERVAL_S otherwise (files
+    rewritten in place), so a call is normally one stat. A persisted store of
+    the current files is opened on the calling thread; anything else is
+    ingested on a background thread, reporting progress(done files, total
+    files, resumed files), while the current store (if any) keeps being
+    served. With wait=True the call waits for that ingestion instead. Files
+    whose ingestion failed are not ingested again before they change or
+    RETRY_INTERVAL_S has passed.
+    """
+    global _flood_cells, _checked, _reingest_thread
+    flood_dir = Path(flood_dir)
+    try:
+        dir_mtime = flood_dir.stat().st_mtime_ns
+    except OSError:
+        return None
+    current = _flood_cells
+    checked = _checked
+    if (checked is not None and checked[0] == dir_mtime and time.monotonic() - checked[1] < CHECK_INTERVAL_S
+            and (current is not None or _failed is not None or (is_ingesting() and not wait))):
+        return current
+
+    with _flood_cells_lock:
+        files = sorted(flood_dir.glob("D*.geojson"))
+        if not files or shapely is None:
+            return None
+        version = _version(_sources(files))
+        _checked = (dir_mtime, time.monotonic())
+        if _flood_cells is not None and _flood_cells.version == version:
+            return _flood_cells
+        if (_failed is not None and _failed[0] == version and not is_ingesting()
+                and time.monotonic() - _failed[1] < RETRY_INTERVAL_S):
+            return _flood_cells
+
+        if _flood_cells is None and not is_ingesting():
+            _flood_cells = _open(Path(directory), version)
+            if _flood_cells is not None:
+                return _flood_cells
+
+        if not is_ingesting():
+            _reingest_thread = threading.Thread(
+                target=_reingest, args=(files, Path(directory), version, workers, progress),
+                name="FloodCellsIngest", daemon=True,
+            )
+            _reingest_thread.start()
+        thread = _reingest_thread
+        if not wait:
+            return _flood_cells
+
+    thread.join()
+    return _flood_cells
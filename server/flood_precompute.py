@@ -0,0 +1,186 @@
+# server/flood_precompute.py
+"""
+Flood file ingestion for the flood cell store (see flood_cells).
+
+Each GEOCODED flood file is read into a FilePart (geo_codes, WKB geometry,
+depths) in a spawned worker process, and persisted under parts_dir as soon
+as its worker completes, in completion order. A restart after a crash or an
+interrupted ingestion therefore only reads the files that are not persisted
+yet; parts are keyed by file name, size and mtime, so a rewritten file is
+read again.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import shapely
+except ImportError:  # flood cells need shapely
+    shapely = None
+
+DEPTH_COLUMNS = ["depth", "flood_depth", "water_depth", "wd"]
+# Bumped when ingestion changes, so parts and stores written by older code are rebuilt
+STORE_FORMAT = 3
+
+# progress(done files, total files, resumed files) callback of an ingestion
+Progress = Callable[[int, int, int], None]
+
+# One ingested flood file: (geo_codes, WKB buffer, WKB offsets, float32 depths)
+FilePart = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def detect_depth_column(columns: Iterable[str], stem: str) -> Optional[str]:
+    """Depth property of a flood file: its own stem (DYYYYMMDDHHMM) or a conventional name."""
+    columns = set(columns)
+    for col in [stem] + DEPTH_COLUMNS:
+        if col in columns:
+            return col
+    return None
+
+
+def pack_wkb(wkb: Sequence[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """WKB geometries as one uint8 buffer plus int64 offsets (len + 1)."""
+    ptr = np.zeros(len(wkb) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(b) for b in wkb])
+    return np.frombuffer(b"".join(wkb), dtype=np.uint8), ptr
+
+
+def read_flood_file(flood_path: str) -> FilePart:
+    """
+    (geo_codes, WKB geometry buffer + offsets, float32 depths) of the cells of
+    one flood file. The depth property is looked for across the properties of
+    every feature. A null, missing or unreadable depth is stored as -inf
+    (present, never flooded), with a warning unless it is null; cells without
+    a geo_code are keyed by their position in the file.
+    """
+    path = Path(flood_path)
+    with open(path, "r", encoding="utf-8") as f:
+        features = json.load(f).get("features") or []
+
+    columns = set()
+    for feat in features:
+        columns.update(feat.get("properties") or {})
+    depth_col = detect_depth_column(columns, path.stem)
+    if features and depth_col is None:
+        print(f"[Flood] ⚠️ {path.name} has no depth property ({path.stem} or one of "
+              f"{', '.join(DEPTH_COLUMNS)}), none of its cells count as flooded")
+    codes: List[str] = []
+    geoms: List[str] = []
+    depths: List[float] = []
+    unreadable = 0
+    for i, feat in enumerate(features):
+        geom = feat.get("geometry")
+        if not geom or not geom.get("coordinates"):
+            continue
+        props = feat.get("properties") or {}
+        depth = -np.inf
+        if depth_col:
+            value = props.get(depth_col)
+            if value is not None:
+                try:
+                    depth = float(value)
+                except (TypeError, ValueError):
+                    depth = np.nan
+                if np.isnan(depth):
+                    depth = -np.inf
+                    unreadable += 1
+        code = props.get("geo_code")
+        codes.append(str(code) if code is not None else f"#{i}@{path.name}")
+        geoms.append(json.dumps(geom, separators=(",", ":")))
+        depths.append(depth)
+    if unreadable:
+        print(f"[Flood] ⚠️ {path.name}: {unreadable} cells with an unreadable {depth_col}, counted as not flooded")
+    wkb, ptr = pack_wkb(shapely.to_wkb(shapely.from_geojson(geoms)) if geoms else [])
+    return np.array(codes, dtype=str), wkb, ptr, np.asarray(depths, dtype=np.float32)
+
+
+def _part_path(parts_dir: Path, source: List[Any]) -> Path:
+    name, size, mtime_ns = source
+    return parts_dir / f"{name}.{size}.{mtime_ns}.v{STORE_FORMAT}.npz"
+
+
+def _load_part(path: Path) -> FilePart:
+    with np.load(path) as data:
+        return data["geo_code"], data["wkb"], data["wkb_ptr"], data["depth"]
+
+
+def _save_part(path: Path, part: FilePart) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, geo_code=part[0], wkb=part[1], wkb_ptr=part[2], depth=part[3])
+    tmp.replace(path)
+
+
+def ingest_flood_files(
+    files: Sequence[Path],
+    sources: List[List[Any]],
+    parts_dir: Path,
+    workers: int,
+    progress: Optional[Progress] = None,
+) -> List[FilePart]:
+    """
+    Every file's part, in file order: read from parts_dir when an earlier
+    (possibly interrupted) ingestion already persisted it, otherwise read on
+    up to `workers` processes and persisted as each one completes.
+    sources[i] is [name, size, mtime_ns] of files[i]; progress(done, total,
+    resumed) is called after each file. A read that fails raises.
+    """
+    paths = [_part_path(parts_dir, src) for src in sources]
+    parts: List[Optional[FilePart]] = [None] * len(files)
+    for i, path in enumerate(paths):
+        if path.exists():
+            try:
+                parts[i] = _load_part(path)
+            except Exception:
+                pass  # unreadable (torn) part: read the file again
+    todo = [i for i, part in enumerate(parts) if part is None]
+    resumed = len(files) - len(todo)
+    if resumed:
+        print(f"[Flood] Resuming ingestion: {resumed}/{len(files)} flood files already ingested")
+    if progress is not None:
+        progress(resumed, len(files), resumed)
+
+    try:
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        persist = True
+    except OSError:
+        persist = False
+    done = resumed
+
+    def _completed(i: int, part: FilePart) -> None:
+        nonlocal persist, done
+        parts[i] = part
+        if persist:
+            try:
+                _save_part(paths[i], part)
+            except OSError as e:
+                print(f"[Flood] ✗ Ingested {files[i].name} not persisted ({e})")
+                persist = False
+        done += 1
+        if progress is not None:
+            progress(done, len(files), resumed)
+
+    if workers <= 1 or len(todo) <= 1:
+        for i in todo:
+            _completed(i, read_flood_file(str(files[i])))
+    else:
+        # spawn: the caller is a thread of a running server, forking it is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo)), mp_context=ctx) as pool:
+            futures = {pool.submit(read_flood_file, str(files[i])): i for i in todo}
+            for future in as_completed(futures):
+                _completed(futures[future], future.result())
+
+    # Parts of files that were removed or rewritten are never read again
+    keep = set(paths)
+    for stale in parts_dir.glob("*.npz"):
+        if stale not in keep:
+            stale.unlink(missing_ok=True)
+    return parts
@@ -0,0 +1,136 @@
+# server/flood_roads.py
+"""
+Flooded-roads results for /api/flood-roads, served from the flood cell store.
+
+The roads file is read once into a shared road table: every road is encoded
+to its GeoJSON Feature bytes up front (with "flooded": true), and a
+LineIndex over the road lines is queried once with all flood cells to get
+the (cell, road) intersection pairs. A timestamp's flooded roads are then a
+depth threshold over its row of the depth matrix and a lookup in those
+pairs, and the response body is the matching roads' pre-encoded features
+joined into a FeatureCollection: a byte join with no GeoJSON
+(de)serialization. Row arrays are kept per (cell store version, timestamp,
+threshold).
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import geopandas as gpd
+except ImportError:  # flooded roads need geopandas
+    gpd = None
+
+try:
+    from server.flood_cells import FloodCells, cell_pairs, lines_of
+    from server.spatial_index import LineIndex
+except ImportError:
+    from flood_cells import FloodCells, cell_pairs, lines_of
+    from spatial_index import LineIndex
+
+
+def _file_key(path: Path) -> str:
+    st = path.stat()
+    return f"{path.name}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+class FloodRoads:
+    """
+    Shared road table of one roads file plus its intersections with the
+    flood cells of the current cell store.
+    """
+
+    def __init__(self, roads_path: Path):
+        t0 = time.perf_counter()
+        self.roads_path = Path(roads_path)
+        self.roads_key = _file_key(self.roads_path)
+
+        roads = gpd.read_file(self.roads_path)
+        if roads.crs is None:
+            roads = roads.set_crs("EPSG:4326")
+        self.roads = roads[roads.geometry.notnull() & ~roads.geometry.is_empty]
+        if self.roads.crs.to_epsg() != 4326:
+            self.roads = self.roads.to_crs("EPSG:4326")  # flood cells are lon / lat
+        self.index = LineIndex(self.roads.geometry.values, range(len(self.roads)), f"roads {self.roads_path.name}")
+
+        # Feature bytes by road row, encoded once (ids are the roads file's row index)
+        self.features: List[bytes] = []
+        for feat in json.loads(self.roads.to_json())["features"]:
+            feat["properties"] = dict(feat.get("properties") or {}, flooded=True)
+            self.features.append(_dumps(feat))
+
+        self._lock = threading.Lock()
+        self._pairs: Optional[Tuple[str, Tuple[np.ndarray, np.ndarray]]] = None  # (cell store version, pairs)
+        self._rows: Dict[Tuple[str, int, float], np.ndarray] = {}
+        print(f"[FloodRoads] Road table: {len(self.features)} roads from {self.roads_path.name} "
+              f"in {time.perf_counter() - t0:.2f}s")
+
+    def is_current(self) -> bool:
+        """False once the roads file changed on disk."""
+        return self.roads_path.exists() and _file_key(self.roads_path) == self.roads_key
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def pairs(self, cells: FloodCells) -> Tuple[np.ndarray, np.ndarray]:
+        """(cell, road row) intersections with the cells of this cell store version."""
+        with self._lock:
+            if self._pairs is None or self._pairs[0] != cells.version:
+                t0 = time.perf_counter()
+                self._pairs = (cells.version, cell_pairs(cells, self.index))
+                self._rows.clear()
+                print(f"[FloodRoads] Flood cells -> roads: {len(self._pairs[1][0])} intersections "
+                      f"in {time.perf_counter() - t0:.2f}s")
+            return self._pairs[1]
+
+    def rows(self, cells: FloodCells, t: int, depth_threshold: float) -> np.ndarray:
+        """Sorted road rows intersecting a cell deeper than depth_threshold at timestamp t."""
+        pairs = self.pairs(cells)
+        key = (cells.version, t, depth_threshold)
+        with self._lock:
+            rows = self._rows.get(key)
+        if rows is None:
+            rows = np.unique(lines_of(pairs, cells.flooded(t, depth_threshold))).astype(np.int32)
+            with self._lock:
+                self._rows[key] = rows
+        return rows
+
+    def body(self, cells: FloodCells, t: int, depth_threshold: float) -> bytes:
+        """/api/flood-roads response for timestamp t: a GeoJSON FeatureCollection as bytes."""
+        rows = self.rows(cells, t, depth_threshold)
+        props = {
+            "roads_file": self.roads_path.name,
+            "flood_file": cells.names[t],
+            "depth_threshold_m": depth_threshold,
+            "count": int(len(rows)),
+        }
+        if not self.features:
+            props["note"] = "roads empty"
+        return b"".join((
+            b'{"type":"FeatureCollection","features":[',
+            b",".join([self.features[r] for r in rows]),
+            b'],"properties":',
+            _dumps(props),
+            b"}",
+        ))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n_pairs = len(self._pairs[1][0]) if self._pairs is not None else 0
+        return {
+            "roads": len(self.features),
+            "road_table_bytes": sum(len(b) for b in self.features),
+            "cell_intersections": n_pairs,
+            "index": self.index.stats(),
+        }
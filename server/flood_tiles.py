@@ -0,0 +1,147 @@
+# server/flood_tiles.py
+"""
+Flood polygons cut to slippy-map tiles for /api/flood/tiles/<z>/<x>/<y>.
+
+Tiles are cut from the flood cell store: a tile queries the store's STRtree
+over all its cells with its bounds (FloodCells.query), keeps the cells
+present at the requested timestamp and clips them to the tile rectangle. Up
+to FLOOD_TILE_MERGE_ZOOM the cells are unioned into a single feature and
+simplified towards one pixel, never changing a polygon's area by more than
+MERGE_AREA_TOLERANCE; above it every cell is sent with its geo_code and
+depth. Encoded tiles are kept in an LRU keyed by (cell store version,
+timestamp, z, x, y).
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, List, Tuple
+
+import numpy as np
+
+try:
+    import shapely
+except ImportError:  # flood tiles need shapely
+    shapely = None
+
+try:
+    from server.flood_cells import FloodCells
+except ImportError:
+    from flood_cells import FloodCells
+
+# Tile edge in screen pixels (simplification / merge grid is one pixel)
+TILE_PX = 256
+MAX_TILE_ZOOM = 22
+# Max relative area change simplifying one merged polygon may cause
+MERGE_AREA_TOLERANCE = 0.02
+
+# (cell store version, timestamp, z, x, y) -> encoded FeatureCollection
+_tiles: "OrderedDict[Tuple[str, int, int, int, int], bytes]" = OrderedDict()
+_tiles_lock = threading.Lock()
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) in degrees of a Web Mercator XYZ tile."""
+    if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError(f"Invalid tile {z}/{x}/{y}")
+    n = 2.0 ** z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def _collection(features: List[bytes], props: dict) -> bytes:
+    return b"".join((
+        b'{"type":"FeatureCollection","features":[',
+        b",".join(features),
+        b'],"properties":',
+        json.dumps(props, separators=(",", ":")).encode("utf-8"),
+        b"}",
+    ))
+
+
+def _feature(geometry_json: str, props: bytes) -> bytes:
+    return b'{"type":"Feature","properties":' + props + b',"geometry":' + geometry_json.encode("utf-8") + b"}"
+
+
+def _merge(geoms: np.ndarray, bounds: Tuple[float, float, float, float], pixel: float) -> Any:
+    """
+    Union of geoms clipped to bounds, simplified to about one pixel. The union
+    is exact (snapping to a pixel grid drops every sub-pixel cell). Small or
+    thin polygons collapse under a one-pixel tolerance, so each polygon takes
+    the coarsest of pixel, pixel/4, pixel/16 that changes its area by at most
+    MERGE_AREA_TOLERANCE, and is kept as is otherwise.
+    """
+    parts = shapely.get_parts(shapely.clip_by_rect(shapely.union_all(geoms), *bounds))
+    parts = parts[shapely.get_type_id(parts) == 3]  # Polygon
+    if parts.shape[0] == 0:
+        return shapely.Polygon()
+    area = shapely.area(parts)
+    out = parts.copy()
+    todo = np.ones(parts.shape[0], dtype=bool)
+    for tolerance in (pixel, pixel / 4, pixel / 16):
+        simplified = shapely.simplify(parts[todo], tolerance, preserve_topology=True)
+        ok = np.abs(shapely.area(simplified) - area[todo]) <= MERGE_AREA_TOLERANCE * area[todo]
+        idx = np.flatnonzero(todo)[ok]
+        out[idx] = simplified[ok]
+        todo[idx] = False
+        if not todo.any():
+            break
+    return shapely.multipolygons(out)
+
+
+def _render(cells: FloodCells, t: int, z: int, x: int, y: int, merge_zoom: int) -> bytes:
+    west, south, east, north = tile_bounds(z, x, y)
+    hits = cells.query(shapely.box(west, south, east, north))
+    hits = hits[cells.present(t)[hits]]
+    meta = {"flood_file": cells.names[t], "z": z, "x": x, "y": y, "cells": int(hits.shape[0])}
+    if hits.shape[0] == 0:
+        return _collection([], dict(meta, merged=z <= merge_zoom))
+
+    geoms = cells.geoms()
+    depth = cells.depth[t]
+    if z <= merge_zoom:
+        pixel = (east - west) / TILE_PX
+        merged = _merge(geoms[hits], (west, south, east, north), pixel)
+        features = []
+        if not merged.is_empty:
+            finite = depth[hits][np.isfinite(depth[hits])]
+            props = {"cells": int(hits.shape[0]), "max_depth": round(float(finite.max()), 4) if finite.size else None}
+            features.append(_feature(shapely.to_geojson(merged), json.dumps(props, separators=(",", ":")).encode("utf-8")))
+        return _collection(features, dict(meta, merged=True))
+
+    clipped = shapely.clip_by_rect(geoms[hits], west, south, east, north)
+    keep = ~shapely.is_empty(clipped)
+    features = []
+    for g, c in zip(shapely.to_geojson(clipped[keep]), hits[keep]):
+        d = float(depth[c])
+        props = {"geo_code": str(cells.geo_codes[c]), "depth": round(d, 4) if np.isfinite(d) else None}
+        features.append(_feature(g, json.dumps(props, separators=(",", ":")).encode("utf-8")))
+    return _collection(features, dict(meta, merged=False))
+
+
+def flood_tile(cells: FloodCells, t: int, z: int, x: int, y: int, merge_zoom: int, cache_size: int) -> bytes:
+    """
+    GeoJSON FeatureCollection (bytes) of the flood cells present at
+    timestamp t inside tile z/x/y, clipped to the tile; merged and simplified
+    at z <= merge_zoom. Raises ValueError for tiles outside the XYZ grid.
+    """
+    tile_bounds(z, x, y)
+    tile_key = (cells.version, t, z, x, y)
+    with _tiles_lock:
+        body = _tiles.get(tile_key)
+        if body is not None:
+            _tiles.move_to_end(tile_key)
+            return body
+
+    body = _render(cells, t, z, x, y, merge_zoom)
+    with _tiles_lock:
+        _tiles[tile_key] = body
+        while len(_tiles) > cache_size:
+            _tiles.popitem(last=False)
+    return body
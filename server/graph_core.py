@@ -0,0 +1,621 @@
+# server/graph_core.py
+"""
+Array-backed routing core.
+
+The osmnx MultiDiGraph is compiled once into flat numpy arrays:
+dense int32 node ids, a CSR adjacency (offsets + targets) and float32
+edge weights. Every directed (u, v, k) edge gets a dense edge id equal
+to its position in the CSR arrays, so searches return edge ids directly
+and never have to re-pick a parallel edge afterwards.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import networkx as nx
+
+try:
+    from scipy.spatial import cKDTree
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+except ImportError:  # scipy is optional: fall back to numpy / networkx
+    cKDTree = None
+    csr_matrix = None
+    connected_components = None
+
+DEFAULT_SPEED_KPH = 30.0
+EARTH_RADIUS_M = 6371000.0
+
+
+class CompiledGraph:
+    """
+    Read-only CSR view of the routing graph.
+
+    Node arrays are indexed by dense node id (0..N-1), edge arrays by
+    dense edge id (0..E-1). Edges are sorted by source node, so the
+    outgoing edges of node i are edge ids indptr[i]..indptr[i+1]-1.
+    """
+
+    def __init__(
+        self,
+        node_ids: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        indptr: np.ndarray,
+        edge_source: np.ndarray,
+        edge_target: np.ndarray,
+        edge_key: np.ndarray,
+        length: np.ndarray,
+        travel_time: np.ndarray,
+        free_flow_kph: np.ndarray,
+        length_m: Optional[np.ndarray] = None,
+        osmid_ptr: Optional[np.ndarray] = None,
+        osmid: Optional[np.ndarray] = None,
+    ):
+        self.node_ids = node_ids
+        self.x = x
+        self.y = y
+        self.indptr = indptr
+        self.edge_source = edge_source
+        self.edge_target = edge_target
+        self.edge_key = edge_key
+        self.length = length
+        self.travel_time = travel_time
+        self.free_flow_kph = free_flow_kph
+        # Exact (float64) GraphML lengths for reported distances; `length` is the float32 search weight
+        self.length_m = length_m if length_m is not None else length.astype(np.float64)
+        # OSM way ids per edge: osmid[osmid_ptr[e]:osmid_ptr[e+1]]
+        self.osmid_ptr = osmid_ptr if osmid_ptr is not None else np.zeros(edge_target.shape[0] + 1, dtype=np.int64)
+        self.osmid = osmid if osmid is not None else np.zeros(0, dtype=np.int64)
+
+        for arr in (node_ids, x, y, indptr, edge_source, edge_target, edge_key, length, travel_time, free_flow_kph,
+                    self.length_m, self.osmid_ptr, self.osmid):
+            arr.setflags(write=False)
+
+        self.node_index: Dict[int, int] = {int(n): i for i, n in enumerate(node_ids.tolist())}
+
+        # memoryviews for the search loops: element access is cheaper than
+        # indexing the numpy arrays directly and needs no copy.
+        self._indptr_l = memoryview(indptr)
+        self._target_l = memoryview(edge_target)
+        self._source_l = memoryview(edge_source)
+
+        # Reverse CSR (incoming edges grouped by target) for backward searches:
+        # the incoming edges of node i are rev_edge[rev_indptr[i]:rev_indptr[i+1]]
+        rev_order = np.argsort(edge_target, kind="stable").astype(np.int32)
+        self.rev_indptr = np.zeros(self.n_nodes + 1, dtype=np.int32)
+        np.cumsum(np.bincount(edge_target, minlength=self.n_nodes), out=self.rev_indptr[1:])
+        self.rev_edge = rev_order
+        self._rev_indptr_l = memoryview(self.rev_indptr)
+        self._rev_edge_l = memoryview(self.rev_edge)
+
+        self._init_bounds()
+
+        # Connectivity labels (see attach_connectivity)
+        self.scc_label: Optional[np.ndarray] = None
+        self.has_out: Optional[np.ndarray] = None
+        self._scc_l = None
+
+        self._build_node_index()
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.node_ids.shape[0])
+
+    @property
+    def n_edges(self) -> int:
+        return int(self.edge_target.shape[0])
+
+    # ---------------------------
+    # Id conversion
+    # ---------------------------
+    def dense_node(self, osm_id: int) -> int:
+        return self.node_index[int(osm_id)]
+
+    def edge_uvk(self, eid: int) -> Tuple[int, int, int]:
+        """(u, v, k) graph key of a dense edge id."""
+        return (
+            int(self.node_ids[self._source_l[eid]]),
+            int(self.node_ids[self._target_l[eid]]),
+            int(self.edge_key[eid]),
+        )
+
+    def edge_id(self, u: int, v: int, k: int) -> Optional[int]:
+        """Dense edge id of a graph (u, v, k) key, or None if it doesn't exist."""
+        su = self.node_index.get(int(u))
+        sv = self.node_index.get(int(v))
+        if su is None or sv is None:
+            return None
+        for e in range(self._indptr_l[su], self._indptr_l[su + 1]):
+            if self._target_l[e] == sv and int(self.edge_key[e]) == int(k):
+                return e
+        return None
+
+    def edge_ids(self, edges: Iterable[Tuple[int, int, int]]) -> np.ndarray:
+        """Dense edge ids for an iterable of (u, v, k) keys (unknown keys are skipped)."""
+        out = []
+        for u, v, k in edges:
+            e = self.edge_id(u, v, k)
+            if e is not None:
+                out.append(e)
+        return np.asarray(out, dtype=np.int64)
+
+    def edge_mask(self, edges: Iterable[Tuple[int, int, int]]) -> np.ndarray:
+        """Boolean mask over dense edge ids for an iterable of (u, v, k) keys."""
+        mask = np.zeros(self.n_edges, dtype=bool)
+        mask[self.edge_ids(edges)] = True
+        return mask
+
+    def out_degree(self, i: int) -> int:
+        return self._indptr_l[i + 1] - self._indptr_l[i]
+
+    def edge_osmids(self, eid: int) -> List[int]:
+        return self.osmid[self.osmid_ptr[eid]:self.osmid_ptr[eid + 1]].tolist()
+
+    # ---------------------------
+    # Snapshot
+    # ---------------------------
+    SNAPSHOT_FIELDS = (
+        "node_ids", "x", "y", "indptr", "edge_source", "edge_target", "edge_key",
+        "length", "travel_time", "free_flow_kph", "length_m", "osmid_ptr", "osmid",
+    )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Everything needed to rebuild this graph without the GraphML (see from_arrays)."""
+        return {name: getattr(self, name) for name in self.SNAPSHOT_FIELDS}
+
+    @classmethod
+    def from_arrays(cls, data) -> "CompiledGraph":
+        return cls(*(np.array(data[name]) for name in cls.SNAPSHOT_FIELDS))
+
+    # ---------------------------
+    # Connectivity
+    # ---------------------------
+    def attach_connectivity(self, scc_label: np.ndarray, has_out: np.ndarray) -> None:
+        """Install per-node strongly connected component labels and out-degree flags."""
+        if scc_label.shape[0] != self.n_nodes or has_out.shape[0] != self.n_nodes:
+            raise ValueError("connectivity arrays do not match the graph")
+        self.scc_label = scc_label
+        self.has_out = has_out
+        self._scc_l = memoryview(np.ascontiguousarray(scc_label))
+
+    def same_component(self, a: int, b: int) -> bool:
+        """O(1): True if dense nodes a and b are strongly connected (each reaches the other)."""
+        return self._scc_l[a] == self._scc_l[b]
+
+    # ---------------------------
+    # Spatial index (node snapping)
+    # ---------------------------
+    def _build_node_index(self) -> None:
+        """
+        KD-tree over node coordinates in a local equirectangular projection
+        (metres). Over a city-sized extent the distortion against haversine
+        is far below the snapping tolerance.
+        """
+        t0 = time.perf_counter()
+        lat0 = math.radians(float(self.y.mean())) if self.n_nodes else 0.0
+        self._kx = EARTH_RADIUS_M * math.cos(lat0) * math.pi / 180.0
+        self._ky = EARTH_RADIUS_M * math.pi / 180.0
+        self._xy_m = np.column_stack((self.x * self._kx, self.y * self._ky))
+        self._kdtree = cKDTree(self._xy_m) if cKDTree is not None and self.n_nodes else None
+        kind = "cKDTree" if self._kdtree is not None else "numpy scan"
+        print(f"[Core] Node spatial index ({kind}) built in {time.perf_counter() - t0:.3f}s")
+
+    def nearest_nodes(self, lat: float, lon: float, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k nearest nodes to a point.
+
+        Returns:
+            (distances in metres, dense node ids), both ordered nearest first
+        """
+        k = max(1, min(int(k), self.n_nodes))
+        q = np.array([lon * self._kx, lat * self._ky])
+        if self._kdtree is not None:
+            dist, idx = self._kdtree.query(q, k=k)
+            return np.atleast_1d(dist), np.atleast_1d(idx).astype(np.int64)
+
+        d2 = ((self._xy_m - q) ** 2).sum(axis=1)
+        idx = np.argpartition(d2, k - 1)[:k] if k < self.n_nodes else np.arange(self.n_nodes)
+        idx = idx[np.argsort(d2[idx], kind="stable")]
+        return np.sqrt(d2[idx]), idx.astype(np.int64)
+
+    # ---------------------------
+    # Geographic lower bounds (A*)
+    # ---------------------------
+    def _init_bounds(self) -> None:
+        """
+        Great-circle span of every edge and the largest factors such that
+        length >= length_bound_scale * span and
+        travel_time >= time_bound_scale * span hold for EVERY edge.
+        Derived from the data rather than assumed, so the A* heuristic
+        stays admissible even where a stored length undercuts the straight
+        line or an edge is faster than its tagged speed.
+        """
+        self._lat_r = np.radians(self.y)
+        self._lon_r = np.radians(self.x)
+        self._cos_lat = np.cos(self._lat_r)
+        src, dst = self.edge_source, self.edge_target
+        self.edge_span_m = _haversine_rad(
+            self._lat_r[src], self._lon_r[src], self._cos_lat[src],
+            self._lat_r[dst], self._lon_r[dst], self._cos_lat[dst],
+        )
+
+        ok = self.edge_span_m > 0
+        length = self.length.astype(np.float64)
+        # Traffic only slows edges down (speed_ratio <= 1), so free flow is the floor
+        speed_mps = self.free_flow_kph.astype(np.float64) * (1000.0 / 3600.0)
+        free_flow_tt = np.where(speed_mps > 0, length / np.where(speed_mps > 0, speed_mps, 1.0), length / 8.33)
+        tt_floor = np.minimum(self.travel_time.astype(np.float64), free_flow_tt)
+
+        self.length_bound_scale = 0.0
+        self.time_bound_scale = 0.0
+        if ok.any():
+            span = self.edge_span_m[ok]
+            # (1 - 1e-6) absorbs float32 rounding of the per-request weight overlays
+            self.length_bound_scale = max(0.0, min(1.0, float((length[ok] / span).min())) * (1 - 1e-6))
+            self.time_bound_scale = max(0.0, float((tt_floor[ok] / span).min()) * (1 - 1e-6))
+
+    def heuristic_to(self, target: int, scale: float) -> np.ndarray:
+        """Lower bound on the cost from every node to dense node `target`: scale * great-circle metres."""
+        h = _haversine_rad(
+            self._lat_r, self._lon_r, self._cos_lat,
+            self._lat_r[target], self._lon_r[target], self._cos_lat[target],
+        )
+        return h * scale
+
+    # ---------------------------
+    # Search
+    # ---------------------------
+    def search(self, source: int, target: int, weights: np.ndarray, mode: str = "dijkstra", bound_scale: float = 0.0):
+        """Dispatch to dijkstra / astar / bidirectional (unknown modes fall back to dijkstra)."""
+        if mode == "astar" and bound_scale > 0:
+            return self.astar(source, target, weights, bound_scale)
+        if mode == "bidirectional":
+            return self.bidirectional_dijkstra(source, target, weights)
+        return self.dijkstra(source, target, weights)
+
+    def dijkstra(self, source: int, target: int, weights: np.ndarray) -> Tuple[Optional[List[int]], int]:
+        """
+        Heap-based Dijkstra from dense node `source` to dense node `target`.
+
+        Args:
+            weights: per-edge costs indexed by dense edge id
+
+        Returns:
+            (edge ids along the path or None if unreachable, nodes settled)
+        """
+        indptr = self._indptr_l
+        head = self._target_l
+        weights = _view(weights)
+        inf = float("inf")
+
+        dist: Dict[int, float] = {source: 0.0}
+        pred: Dict[int, int] = {}
+        settled = set()
+        heap = [(0.0, source)]
+        push, pop = heapq.heappush, heapq.heappop
+
+        while heap:
+            d, u = pop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u == target:
+                return self._unwind(pred, source, target), len(settled)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = head[e]
+                nd = d + weights[e]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    pred[v] = e
+                    push(heap, (nd, v))
+
+        return None, len(settled)
+
+    def shortest_path_tree(
+        self, source: int, weights: np.ndarray, targets: Optional[Iterable[int]] = None
+    ) -> Tuple[Dict[int, float], Dict[int, int]]:
+        """
+        Dijkstra from dense node `source` until every node in `targets` is
+        settled (the whole reachable graph if None).
+
+        Returns:
+            (cost per reached node, predecessor edge id per reached node)
+        """
+        indptr = self._indptr_l
+        head = self._target_l
+        weights = _view(weights)
+        inf = float("inf")
+        remaining = set(targets) if targets is not None else None
+
+        dist: Dict[int, float] = {source: 0.0}
+        pred: Dict[int, int] = {}
+        settled = set()
+        heap = [(0.0, source)]
+        push, pop = heapq.heappush, heapq.heappop
+
+        while heap:
+            d, u = pop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+            for e in range(indptr[u], indptr[u + 1]):
+                v = head[e]
+                nd = d + weights[e]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    pred[v] = e
+                    push(heap, (nd, v))
+
+        return {u: dist[u] for u in settled}, {u: pred[u] for u in settled if u != source}
+
+    def astar(self, source: int, target: int, weights: np.ndarray, bound_scale: float) -> Tuple[Optional[List[int]], int]:
+        """
+        A* from `source` to `target` with h(v) = bound_scale * haversine(v, target).
+
+        bound_scale must satisfy weights[e] >= bound_scale * edge_span_m[e]
+        for every edge (length_bound_scale for length-based costs,
+        time_bound_scale for travel-time-based costs). The heuristic is
+        then consistent, so the first time `target` is settled its path
+        is optimal.
+        """
+        indptr = self._indptr_l
+        head = self._target_l
+        weights = _view(weights)
+        h = memoryview(self.heuristic_to(target, bound_scale))
+        inf = float("inf")
+
+        dist: Dict[int, float] = {source: 0.0}
+        pred: Dict[int, int] = {}
+        settled = set()
+        heap = [(h[source], 0.0, source)]
+        push, pop = heapq.heappush, heapq.heappop
+
+        while heap:
+            _, d, u = pop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u == target:
+                return self._unwind(pred, source, target), len(settled)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = head[e]
+                nd = d + weights[e]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    pred[v] = e
+                    push(heap, (nd + h[v], nd, v))
+
+        return None, len(settled)
+
+    def bidirectional_dijkstra(self, source: int, target: int, weights: np.ndarray) -> Tuple[Optional[List[int]], int]:
+        """
+        Dijkstra from both ends (forward over the CSR, backward over the
+        reverse CSR), expanding the side with the smaller queue head. Stops
+        once the two queue heads together can't beat the best meeting path.
+
+        Returns:
+            (edge ids along the path or None if unreachable, nodes settled in both directions)
+        """
+        if source == target:
+            return [], 1
+
+        fwd_ptr, fwd_head = self._indptr_l, self._target_l
+        bwd_ptr, bwd_edge, tail = self._rev_indptr_l, self._rev_edge_l, self._source_l
+        weights = _view(weights)
+        inf = float("inf")
+        push, pop = heapq.heappush, heapq.heappop
+
+        dist_f: Dict[int, float] = {source: 0.0}
+        dist_b: Dict[int, float] = {target: 0.0}
+        pred_f: Dict[int, int] = {}
+        succ_b: Dict[int, int] = {}
+        done_f = set()
+        done_b = set()
+        heap_f = [(0.0, source)]
+        heap_b = [(0.0, target)]
+        best = inf
+        meet = -1
+
+        while heap_f and heap_b:
+            if heap_f[0][0] + heap_b[0][0] >= best:
+                break
+            if heap_f[0][0] <= heap_b[0][0]:
+                d, u = pop(heap_f)
+                if u in done_f:
+                    continue
+                done_f.add(u)
+                for e in range(fwd_ptr[u], fwd_ptr[u + 1]):
+                    v = fwd_head[e]
+                    nd = d + weights[e]
+                    if nd < dist_f.get(v, inf):
+                        dist_f[v] = nd
+                        pred_f[v] = e
+                        push(heap_f, (nd, v))
+                    db = dist_b.get(v)
+                    if db is not None and nd + db < best:
+                        best = nd + db
+                        meet = v
+            else:
+                d, u = pop(heap_b)
+                if u in done_b:
+                    continue
+                done_b.add(u)
+                for i in range(bwd_ptr[u], bwd_ptr[u + 1]):
+                    e = bwd_edge[i]
+                    v = tail[e]
+                    nd = d + weights[e]
+                    if nd < dist_b.get(v, inf):
+                        dist_b[v] = nd
+                        succ_b[v] = e
+                        push(heap_b, (nd, v))
+                    df = dist_f.get(v)
+                    if df is not None and nd + df < best:
+                        best = nd + df
+                        meet = v
+
+        settled = len(done_f) + len(done_b)
+        if meet < 0:
+            return None, settled
+
+        # Forward half: source -> meet; backward half: meet -> target
+        path = self._unwind(pred_f, source, meet)
+        node = meet
+        head = self._target_l
+        while node != target:
+            e = succ_b[node]
+            path.append(e)
+            node = head[e]
+        return path, settled
+
+    def _unwind(self, pred: Dict[int, int], source: int, target: int) -> List[int]:
+        tail = self._source_l
+        path: List[int] = []
+        node = target
+        while node != source:
+            e = pred[node]
+            path.append(e)
+            node = tail[e]
+        path.reverse()
+        return path
+
+
+def _view(weights) -> Sequence[float]:
+    if isinstance(weights, np.ndarray):
+        return memoryview(np.ascontiguousarray(weights))
+    return weights
+
+
+def _edge_osmids(val) -> List[int]:
+    """Integer OSM way ids of an edge's osmid attribute (int, list, or "a;b" / "[a, b]" strings)."""
+    if val is None:
+        return []
+    if isinstance(val, (list, tuple)):
+        out: List[int] = []
+        for v in val:
+            out.extend(_edge_osmids(v))
+        return out
+    if isinstance(val, (int, np.integer)):
+        return [int(val)]
+    if isinstance(val, float):
+        return [int(val)] if math.isfinite(val) else []
+    out = []
+    for part in str(val).strip("[]").replace(",", ";").split(";"):
+        try:
+            out.append(int(part.strip()))
+        except ValueError:
+            pass
+    return out
+
+
+def _haversine_rad(lat1, lon1, cos1, lat2, lon2, cos2) -> np.ndarray:
+    """Vectorized great-circle distance in metres from radians and precomputed cosines."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos1 * cos2 * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def compute_connectivity(core: CompiledGraph) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Strongly connected component label (int32) and has-outgoing-edge flag
+    (bool) for every dense node id.
+    """
+    n = core.n_nodes
+    has_out = np.diff(core.indptr) > 0
+    if connected_components is not None:
+        adj = csr_matrix(
+            (np.ones(core.n_edges, dtype=np.int8), core.edge_target, core.indptr),
+            shape=(n, n),
+        )
+        _, labels = connected_components(adj, directed=True, connection="strong")
+        return labels.astype(np.int32), has_out
+
+    D = nx.DiGraph()
+    D.add_nodes_from(range(n))
+    D.add_edges_from(zip(core.edge_source.tolist(), core.edge_target.tolist()))
+    labels = np.empty(n, dtype=np.int32)
+    for i, comp in enumerate(nx.strongly_connected_components(D)):
+        labels[list(comp)] = i
+    return labels, has_out
+
+
+def build_compiled_graph(G: nx.MultiDiGraph) -> CompiledGraph:
+    """
+    Compile a (u, v, k) MultiDiGraph into a CompiledGraph.
+
+    Expects node attributes x/y and edge attributes length/travel_time/
+    free_flow_kph (missing speeds fall back to DEFAULT_SPEED_KPH).
+    Raises ValueError if node ids are not integers.
+    """
+    t0 = time.perf_counter()
+
+    nodes = list(G.nodes)
+    try:
+        node_ids = np.asarray([int(n) for n in nodes], dtype=np.int64)
+    except (TypeError, ValueError):
+        raise ValueError("CompiledGraph requires integer node ids")
+    index = {n: i for i, n in enumerate(nodes)}
+
+    x = np.asarray([float(G.nodes[n].get("x", 0.0)) for n in nodes], dtype=np.float64)
+    y = np.asarray([float(G.nodes[n].get("y", 0.0)) for n in nodes], dtype=np.float64)
+
+    m = G.number_of_edges()
+    length_m = np.empty(m, dtype=np.float64)
+    osmid_count = np.zeros(m, dtype=np.int64)
+    osmids: List[int] = []
+    src = np.empty(m, dtype=np.int32)
+    dst = np.empty(m, dtype=np.int32)
+    key = np.empty(m, dtype=np.int64)
+    length = np.empty(m, dtype=np.float32)
+    travel_time = np.empty(m, dtype=np.float32)
+    free_flow_kph = np.empty(m, dtype=np.float32)
+
+    default_mps = DEFAULT_SPEED_KPH * 1000.0 / 3600.0
+    for i, (u, v, k, data) in enumerate(G.edges(keys=True, data=True)):
+        src[i] = index[u]
+        dst[i] = index[v]
+        key[i] = int(k)
+        ln = float(data.get("length", 100.0))
+        length[i] = ln
+        length_m[i] = float(data.get("length", 0.0))
+        ids = _edge_osmids(data.get("osmid"))
+        osmid_count[i] = len(ids)
+        osmids.extend(ids)
+        travel_time[i] = float(data.get("travel_time", ln / default_mps))
+        free_flow_kph[i] = float(data.get("free_flow_kph", DEFAULT_SPEED_KPH))
+
+    # Sort edges by source node so each node's out-edges are contiguous (CSR).
+    order = np.argsort(src, kind="stable")
+    src, dst, key = src[order], dst[order], key[order]
+    length, travel_time, free_flow_kph = length[order], travel_time[order], free_flow_kph[order]
+    length_m = length_m[order]
+
+    # Per-edge osmid runs, reordered along with the edges
+    osmid_flat = np.asarray(osmids, dtype=np.int64)
+    old_ptr = np.zeros(m + 1, dtype=np.int64)
+    np.cumsum(osmid_count, out=old_ptr[1:])
+    osmid_count = osmid_count[order]
+    osmid_ptr = np.zeros(m + 1, dtype=np.int64)
+    np.cumsum(osmid_count, out=osmid_ptr[1:])
+    take = np.repeat(old_ptr[order] - osmid_ptr[:-1], osmid_count) + np.arange(osmid_ptr[-1])
+    osmid_flat = osmid_flat[take]
+
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(src, minlength=len(nodes)), out=indptr[1:])
+
+    core = CompiledGraph(
+        node_ids, x, y, indptr, src, dst, key, length, travel_time, free_flow_kph,
+        length_m=length_m, osmid_ptr=osmid_ptr, osmid=osmid_flat,
+    )
+    print(f"[Core] Compiled CSR graph: nodes={core.n_nodes} edges={core.n_edges} in {time.perf_counter() - t0:.2f}s")
+    if core.time_bound_scale > 0:
+        print(f"[Core] A* bounds: length >= {core.length_bound_scale:.4f} x straight line, max free-flow speed {3.6 / core.time_bound_scale:.1f} kph")
+    return core
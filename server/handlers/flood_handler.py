@@ -4,12 +4,17 @@ Flood data endpoint handlers.
 Handles flood GeoJSON retrieval and flood-roads intersection.
 """
 
+import gzip
+import hashlib
+import json
 import sys
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 from typing import Optional, Tuple, Any, List, Dict
 
-from flask import jsonify
+import numpy as np
 
 # Import global config
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
@@ -17,9 +22,22 @@ import config as global_config
 
 # Optional geospatial libraries
 if global_config.GEOPANDAS_OK:
-    import geopandas as gpd
+    import shapely
 
-_FLOOD_ROADS_CACHE: Dict[str, Dict[str, Any]] = {}  # Cache for flood-roads data
+from server.flood_cells import FloodCells, FloodCellsNotReady, is_ingesting
+from server.routing import get_flood_cells
+from server.flood_roads import FloodRoads
+from server.flood_tiles import flood_tile
+
+# (file size / mtime, flood file name) -> (gzipped GeoJSON, content hash)
+_FLOOD_GZ: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+# Same key -> minified GeoJSON, kept once a client without gzip asked for it
+_FLOOD_RAW: Dict[Tuple[str, str], bytes] = {}
+_FLOOD_GZ_LOCK = threading.Lock()
+
+# Road table + its flood cell intersections, built once per roads file
+_FLOOD_ROADS: Optional[FloodRoads] = None
+_FLOOD_ROADS_LOCK = threading.Lock()
 
 
 def parse_ts_from_name(filename: str) -> Optional[datetime]:
@@ -128,29 +146,220 @@ def resolve_flood_path_by_index(time_param: Optional[str]) -> Tuple[Path, Option
     return path, target.get("timestamp")
 
 
-def get_flood_data(time_param: Optional[str] = None) -> dict:
+def _flood_cells() -> Optional[FloodCells]:
+    """
+    Columnar flood cell store of FLOOD_GEOCODED_DIR (None without shapely or
+    flood files). Raises FloodCellsNotReady while it is first ingested.
+    """
+    cells = get_flood_cells()
+    if cells is None and is_ingesting():
+        raise FloodCellsNotReady("Flood data is still loading, retry shortly")
+    return cells
+
+
+def _flood_cell_index(time_param: Optional[str]) -> Tuple[FloodCells, int]:
+    """Flood cell store and its timestamp row for a time index or filename."""
+    path, _ = resolve_flood_path_by_index(time_param)
+    cells = _flood_cells()
+    t = cells.index_of(path.name) if cells is not None else None
+    if t is None:
+        raise FileNotFoundError(f"Flood file not in the flood cell store: {path.name}")
+    return cells, t
+
+
+def _flood_key(path: Path) -> Tuple[str, str]:
+    """_FLOOD_GZ key of a flood file: changes whenever the file is rewritten."""
+    st = path.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}", path.name
+
+
+def _flood_gzip(path: Path) -> Tuple[bytes, str]:
+    """
+    Gzipped GeoJSON of a flood file (minified, otherwise as stored: name,
+    crs and every feature and property) and the SHA-1 of the uncompressed
+    bytes, built once per file version.
+    """
+    key = _flood_key(path)
+    with _FLOOD_GZ_LOCK:
+        entry = _FLOOD_GZ.get(key)
+    if entry is not None:
+        return entry
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        raw = json.dumps(json.loads(raw), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    except ValueError:
+        pass  # served as stored
+    entry = (gzip.compress(raw, compresslevel=6, mtime=0), hashlib.sha1(raw).hexdigest())
+    with _FLOOD_GZ_LOCK:
+        # Entries of older store versions / file versions are never hit again
+        for stale in [k for k in _FLOOD_GZ if k[1] == path.name]:
+            del _FLOOD_GZ[stale]
+            _FLOOD_RAW.pop(stale, None)
+        _FLOOD_GZ[key] = entry
+    return entry
+
+
+def _flood_raw(path: Path) -> Tuple[bytes, str]:
+    """Uncompressed counterpart of _flood_gzip, decompressed once per key and then kept."""
+    key = _flood_key(path)
+    with _FLOOD_GZ_LOCK:
+        raw = _FLOOD_RAW.get(key)
+        entry = _FLOOD_GZ.get(key)
+    if raw is not None and entry is not None:
+        return raw, entry[1]
+    body, digest = _flood_gzip(path)
+    raw = gzip.decompress(body)
+    with _FLOOD_GZ_LOCK:
+        if key in _FLOOD_GZ:  # not superseded meanwhile
+            _FLOOD_RAW[key] = raw
+    return raw, digest
+
+
+def precompute_flood_gzip() -> None:
+    """Gzip every flood timestamp up front so the first slider pass is served from memory."""
+    flood_dir = global_config.FLOOD_GEOCODED_DIR
+    t0 = time.perf_counter()
+    for f in list_flood_files():
+        path = flood_dir / f["filename"]
+        try:
+            _flood_gzip(path)
+        except Exception as e:
+            print(f"[Flood] ✗ Could not gzip {path.name}: {e}")
+    with _FLOOD_GZ_LOCK:
+        n = len(_FLOOD_GZ)
+        gz_bytes = sum(len(entry[0]) for entry in _FLOOD_GZ.values())
+    print(f"[Flood] ✓ {n} flood timestamps gzipped ({gz_bytes / 1e6:.1f} MB) in {time.perf_counter() - t0:.1f}s")
+
+
+def get_flood_data(time_param: Optional[str] = None, accept_gzip: bool = True) -> dict:
     """
     Get flood GeoJSON data.
     
     Args:
         time_param: Time index or filename
+        accept_gzip: Whether the client accepts a gzip Content-Encoding
         
     Returns:
-        GeoJSON dictionary
+        {"success", "body": GeoJSON bytes (gzipped if "gzip"), "gzip", "etag": content hash}
         
     Raises:
         FileNotFoundError: If flood file not found
     """
     try:
         path, _ = resolve_flood_path_by_index(time_param)
-        with open(path, "r", encoding="utf-8") as f:
-            return {"success": True, "data": f.read()}
+        body, digest = _flood_gzip(path) if accept_gzip else _flood_raw(path)
+        return {"success": True, "body": body, "gzip": accept_gzip, "etag": digest}
     except FileNotFoundError as e:
         raise FileNotFoundError(str(e))
     except Exception as e:
         raise Exception(f"Failed reading flood GeoJSON: {str(e)}")
 
 
+def get_flood_tile(time_param: Optional[str], z: int, x: int, y: int) -> Tuple[bytes, str]:
+    """
+    Flood polygons of one XYZ tile, clipped to it (merged and simplified at
+    low zooms).
+    
+    Args:
+        time_param: Time index or filename
+        z, x, y: Tile coordinates
+        
+    Returns:
+        (GeoJSON FeatureCollection encoded as JSON bytes, ETag), the ETag
+        changing with the flood cell store version
+        
+    Raises:
+        FileNotFoundError: If flood file not found
+        ValueError: If the tile is outside the XYZ grid
+        FloodCellsNotReady: While the flood cell store is first ingested
+    """
+    if not global_config.GEOPANDAS_OK:
+        raise Exception("geopandas/shapely not available")
+
+    cells, t = _flood_cell_index(time_param)
+    merge_zoom = global_config.FLOOD_TILE_MERGE_ZOOM
+    body = flood_tile(cells, t, z, x, y, merge_zoom, global_config.FLOOD_TILE_CACHE_SIZE)
+    return body, f"{cells.version}-{t}-{merge_zoom}"
+
+
+def _series_values(rows: np.ndarray) -> List[List[Optional[float]]]:
+    """Depth rows as JSON lists, null where a cell is absent or has no readable depth."""
+    values = np.round(rows.astype(np.float64), 4)
+    out = values.astype(object)
+    out[~np.isfinite(values)] = None
+    return out.tolist()
+
+
+def get_flood_series(
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None
+) -> dict:
+    """
+    Depth over every flood timestamp of the cells containing a point or
+    intersecting a bbox, read from the per-cell rows of the flood cell store.
+    
+    Args:
+        lat, lon: Point to look up
+        bbox: (west, south, east, north) in degrees, instead of a point
+        
+    Returns:
+        {"success", "query", "times": [...], "count", "cells": [{"geo_code",
+        "lat", "lon", "max_depth", "depth": [one value per time]}]}
+        
+    Raises:
+        ValueError: If the point / bbox is invalid or the bbox holds too many cells
+        FileNotFoundError: If no flood cells are available
+        FloodCellsNotReady: While the flood cell store is first ingested
+    """
+    if not global_config.GEOPANDAS_OK:
+        raise Exception("geopandas/shapely not available")
+
+    if bbox is not None:
+        west, south, east, north = bbox
+        if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+            raise ValueError("bbox must be west,south,east,north with west < east and south < north")
+        geometry = shapely.box(west, south, east, north)
+        query = {"bbox": [west, south, east, north]}
+    else:
+        if lat is None or lon is None:
+            raise ValueError("Provide lat and lon, or bbox")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("lat/lon out of range")
+        geometry = shapely.Point(lon, lat)
+        query = {"lat": lat, "lon": lon}
+
+    cells = _flood_cells()
+    if cells is None:
+        raise FileNotFoundError("No flood cells available (no flood files in FLOOD_GEOCODED_DIR)")
+
+    hits = cells.query(geometry)
+    if hits.shape[0] > global_config.FLOOD_SERIES_MAX_CELLS:
+        raise ValueError(f"bbox matches {hits.shape[0]} cells, more than FLOOD_SERIES_MAX_CELLS "
+                         f"({global_config.FLOOD_SERIES_MAX_CELLS}); use a smaller bbox")
+
+    times = []
+    for i, name in enumerate(cells.names):
+        ts = parse_ts_from_name(name)
+        times.append({"index": i, "filename": name, "timestamp": ts.isoformat() if ts else None})
+
+    rows = np.asarray(cells.series[hits])
+    centroids = shapely.get_coordinates(shapely.centroid(cells.geoms()[hits]))
+    peak = np.where(np.isfinite(rows), rows, -np.inf).max(axis=1, initial=-np.inf)
+    out_cells = []
+    for k, (c, depth) in enumerate(zip(hits, _series_values(rows))):
+        out_cells.append({
+            "geo_code": str(cells.geo_codes[c]),
+            "lat": round(float(centroids[k, 1]), 6),
+            "lon": round(float(centroids[k, 0]), 6),
+            "max_depth": round(float(peak[k]), 4) if np.isfinite(peak[k]) else None,
+            "depth": depth,
+        })
+    return {"success": True, "query": query, "times": times, "count": len(out_cells), "cells": out_cells}
+
+
 def find_roads_file() -> Optional[Path]:
     """Find available roads GeoJSON file."""
     for p in global_config.ROADS_CANDIDATES:
@@ -159,17 +368,56 @@ def find_roads_file() -> Optional[Path]:
     return None
 
 
-def get_flooded_roads(time_param: Optional[str] = None) -> dict:
+def _flood_roads(roads_path: Path) -> FloodRoads:
+    """
+    Shared road table for roads_path, built once (and again only if the file
+    changes). The freshness check and the rebuild run outside the lock, so
+    requests are never queued behind a stat or a rebuild; the lock only
+    guards the swap.
+    """
+    global _FLOOD_ROADS
+    roads = _FLOOD_ROADS
+    if roads is not None and roads.roads_path == roads_path and roads.is_current():
+        return roads
+    built = FloodRoads(roads_path)
+    with _FLOOD_ROADS_LOCK:
+        roads = _FLOOD_ROADS
+        # A concurrent rebuild of the same file won: keep it (and its cached intersections)
+        if roads is not None and roads.roads_path == roads_path and roads.roads_key == built.roads_key:
+            return roads
+        _FLOOD_ROADS = built
+        return built
+
+
+def precompute_flooded_roads() -> None:
+    """Build the road table and its flood cell intersections up front."""
+    if not global_config.GEOPANDAS_OK:
+        return
+    roads_path = find_roads_file()
+    cells = get_flood_cells(wait=True)
+    if not roads_path or cells is None:
+        print("[FloodRoads] Road GeoJSON or flood cells not found, skipping pre-compute.")
+        return
+    store = _flood_roads(roads_path)
+    store.pairs(cells)
+    stats = store.stats()
+    print(f"[FloodRoads] ✓ Ready: {stats['roads']} roads, {stats['cell_intersections']} cell intersections, "
+          f"road table {stats['road_table_bytes'] / 1e6:.1f} MB")
+
+
+def get_flooded_roads(time_param: Optional[str] = None) -> bytes:
     """
-    Get flooded road segments by intersecting roads with flood polygons.
+    Get road segments intersecting a flood cell deeper than
+    FLOOD_DEPTH_THRESHOLD_M at the given time.
     
     Args:
         time_param: Flood time index or filename
         
     Returns:
-        GeoJSON FeatureCollection of flooded roads
+        GeoJSON FeatureCollection of flooded roads, encoded as JSON bytes
         
     Raises:
+        FloodCellsNotReady: While the flood cell store is first ingested
         Exception: If geopandas not available or processing fails
     """
     if not global_config.GEOPANDAS_OK:
@@ -180,80 +428,12 @@ def get_flooded_roads(time_param: Optional[str] = None) -> dict:
         raise FileNotFoundError("Road GeoJSON not found")
 
     try:
-        flood_path, _ = resolve_flood_path_by_index(time_param)
-        
-        # Create cache key (unique identifier for this combination)
-        cache_key = f"{roads_path.name}_{flood_path.name}"
-        
-        # Check if result is already cached
-        if cache_key in _FLOOD_ROADS_CACHE:
-            return _FLOOD_ROADS_CACHE[cache_key]
-
-        roads = gpd.read_file(roads_path)
-        flood = gpd.read_file(flood_path)
-
-        if roads.empty:
-            return {
-                "type": "FeatureCollection",
-                "features": [],
-                "properties": {"note": "roads empty"}
-            }
-
-        if flood.empty:
-            return {
-                "type": "FeatureCollection",
-                "features": [],
-                "properties": {"note": "flood empty"}
-            }
-
-        # Ensure CRS compatibility
-        if roads.crs is None:
-            roads = roads.set_crs("EPSG:4326")
-        if flood.crs is None:
-            flood = flood.set_crs("EPSG:4326")
-        if roads.crs != flood.crs:
-            flood = flood.to_crs(roads.crs)
-
-        # Keep only valid geometries
-        flood = flood[flood.geometry.notnull()]
-        roads = roads[roads.geometry.notnull()]
-
-        # Spatial join for roads intersecting flood
-        flood_poly = flood[~flood.geometry.is_empty].copy()
-        roads_ln = roads[~roads.geometry.is_empty].copy()
-
-        joined = gpd.sjoin(roads_ln, flood_poly[["geometry"]], how="inner", predicate="intersects")
-
-        if joined.empty:
-            return {
-                "type": "FeatureCollection",
-                "features": [],
-                "properties": {
-                    "roads_file": roads_path.name,
-                    "flood_file": flood_path.name,
-                    "count": 0
-                }
-            }
-
-        # Deduplicate
-        joined = joined.drop_duplicates(subset=[joined.index.name] if joined.index.name else None)
-        joined["flooded"] = True
-
-        import json
-        out = json.loads(joined.to_json())
-        out.setdefault("properties", {})
-        out["properties"].update({
-            "roads_file": roads_path.name,
-            "flood_file": flood_path.name,
-            "count": len(out.get("features", []))
-        })
-        
-        # Save result to cache for future requests
-        _FLOOD_ROADS_CACHE[cache_key] = out
-        
-        return out
+        cells, t = _flood_cell_index(time_param)
+        return _flood_roads(roads_path).body(cells, t, global_config.FLOOD_DEPTH_THRESHOLD_M)
 
     except FileNotFoundError as e:
         raise FileNotFoundError(str(e))
+    except FloodCellsNotReady:
+        raise
     except Exception as e:
         raise Exception(f"Failed flood->roads intersection: {str(e)}")
@@ -0,0 +1,94 @@
+# server/overlays.py
+"""
+Versioned per-edge weight overlays.
+
+The routing graph is frozen after load. Anything that changes per request
+(traffic travel times, flood penalties) lives in flat numpy arrays indexed
+by dense edge id, built once per version key such as
+("smart", traffic_snapshot_id, flood_index) and then shared read-only
+between request threads.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+
+class OverlayStore:
+    """
+    Thread-safe LRU of read-only weight arrays keyed by version tuples.
+
+    Arrays are marked non-writeable before they are published, so a
+    request can never modify weights another request is routing on.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = threading.RLock()
+        # key -> lock held while that key's overlay is being built
+        self._building: Dict[Hashable, threading.Lock] = {}
+        self._stats = {"hits": 0, "builds": 0, "evictions": 0, "build_seconds": 0.0}
+
+    def get(self, key: Hashable, builder: Callable[[], np.ndarray]) -> np.ndarray:
+        """Return the overlay for `key`, building it with `builder()` on first use."""
+        with self._lock:
+            arr = self._entries.get(key)
+            if arr is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return arr
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        # Concurrent requests for the same version wait for one build instead
+        # of racing several; lookups of other keys are never blocked by it.
+        with build_lock:
+            with self._lock:
+                arr = self._entries.get(key)
+                if arr is not None:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return arr
+            try:
+                t0 = time.perf_counter()
+                arr = np.ascontiguousarray(builder())
+                arr.setflags(write=False)
+                dt = time.perf_counter() - t0
+                with self._lock:
+                    self._stats["builds"] += 1
+                    self._stats["build_seconds"] += dt
+                    self._entries[key] = arr
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._stats["evictions"] += 1
+                return arr
+            finally:
+                with self._lock:
+                    if self._building.get(key) is build_lock:
+                        del self._building[key]
+
+    def peek(self, key: Hashable) -> Optional[np.ndarray]:
+        """The overlay for `key` if it is held, without touching the LRU order."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": int(sum(a.nbytes for a in self._entries.values())),
+                "hits": self._stats["hits"],
+                "builds": self._stats["builds"],
+                "evictions": self._stats["evictions"],
+                "build_seconds": round(self._stats["build_seconds"], 3),
+            }
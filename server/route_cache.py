@@ -0,0 +1,133 @@
+# server/route_cache.py
+"""
+Progressive route cache.
+
+A thread-safe LRU over route path records, keyed by (origin node, dest
+node, cost key) and holding the dense edge ids of the path plus search
+metadata; geometry is rendered from the edge ids on every hit. It is
+bounded by total record size (compact JSON bytes) and by entry count.
+Every entry expires after the TTL of its route type, and all statistics
+are updated under the same lock as the entries, so concurrent waitress
+threads see consistent numbers.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+def payload_bytes(value: Any) -> int:
+    """Size of `value` as compact JSON, i.e. roughly the memory a path record holds (mostly its edge ids)."""
+    return len(json.dumps(value, separators=(",", ":")))
+
+
+class RouteCache:
+    """
+    LRU with recency promotion: get() moves a hit to the most recent end,
+    and inserts evict from the least recent end until both bounds hold.
+    Expired entries are dropped when they are looked up and are skipped by
+    items().
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entries: int,
+        ttl_s: Dict[str, float],
+        default_ttl_s: float = 3600.0,
+    ):
+        self.max_bytes = int(max_bytes)
+        self.max_entries = int(max_entries)
+        self.ttl_s = dict(ttl_s)
+        self.default_ttl_s = float(default_ttl_s)
+        # key -> (value, nbytes, route_type, expires_at)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, str, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "inserts": 0, "evictions": 0, "expired": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, route_type: str) -> float:
+        return float(self.ttl_s.get(route_type, self.default_ttl_s))
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value (promoted to most recent) or None; counts a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] <= time.monotonic():
+                self._drop(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        route_type: str,
+        nbytes: Optional[int] = None,
+        ttl_s: Optional[float] = None,
+    ) -> int:
+        """
+        Insert or replace; returns the number of entries evicted to make room.
+        ttl_s overrides the route type's TTL (e.g. the time left on a disk row).
+        """
+        if nbytes is None:
+            nbytes = payload_bytes(value)
+        expires_at = time.monotonic() + (self.ttl_for(route_type) if ttl_s is None else ttl_s)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, nbytes, route_type, expires_at)
+            self._bytes += nbytes
+            self._stats["inserts"] += 1
+
+            evicted = 0
+            while len(self._entries) > 1 and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                evicted += 1
+            self._stats["evictions"] += evicted
+            return evicted
+
+    def _drop(self, key: Hashable) -> None:
+        _, nbytes, _, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def items(self) -> List[Tuple[Hashable, Any, str]]:
+        """(key, value, route_type) of every live entry, least recent first."""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, e[0], e[2]) for k, e in self._entries.items() if e[3] > now]
+
+    def clear(self, reset_stats: bool = True) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if reset_stats:
+                self._stats = dict.fromkeys(self._stats, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            })
+        total = stats["hits"] + stats["misses"]
+        stats["total_requests"] = total
+        stats["hit_rate_percent"] = round(stats["hits"] / total * 100, 2) if total else 0.0
+        return stats
@@ -0,0 +1,226 @@
+# server/route_matrix.py
+"""
+Many-to-many travel-time / distance matrices on the compiled core.
+
+One shortest-path tree per distinct origin under the route type's cost
+overlay. With scipy the trees come from csgraph's C Dijkstra over the graph
+reduced to the cheapest parallel edge per (u, v); distance and ETA along
+every tree path are then accumulated for all nodes at once by pointer
+jumping over the predecessor arrays. Without scipy each tree is a heap
+Dijkstra on the core that stops once all destinations are settled.
+The same trees also yield full edge paths (shortest_path_edges), used to
+precompute the hotspot route table.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+except ImportError:  # scipy is optional: fall back to the core's heap Dijkstra
+    csr_matrix = None
+    csgraph_dijkstra = None
+
+# Origins searched per csgraph call (bounds the origins x nodes work arrays)
+ORIGIN_CHUNK = 32
+
+
+def compute_route_matrix(
+    core,
+    sources: Sequence[int],
+    targets: Sequence[int],
+    cost: np.ndarray,
+    travel_time: np.ndarray,
+) -> Dict[str, Any]:
+    """
+    Least-`cost` paths from every dense source node to every dense target node.
+
+    Returns dict with:
+      cost, distance_m, eta_s: float64 (len(sources), len(targets)) arrays,
+                               NaN where the target is unreachable
+      search:                  "csgraph" or "dijkstra"
+      seconds:                 {"reduce", "search", "accumulate"}
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    shape = (sources.shape[0], targets.shape[0])
+    out = {name: np.full(shape, np.nan) for name in ("cost", "distance_m", "eta_s")}
+
+    uniq, inverse = np.unique(sources, return_inverse=True)
+    if csgraph_dijkstra is not None:
+        seconds = _matrix_csgraph(core, uniq, inverse, targets, cost, travel_time, out)
+        search = "csgraph"
+    else:
+        seconds = _matrix_dijkstra(core, uniq, inverse, targets, cost, travel_time, out)
+        search = "dijkstra"
+    return dict(out, search=search, seconds=seconds)
+
+
+def shortest_path_edges(
+    core,
+    sources: Sequence[int],
+    targets: Sequence[int],
+    cost: np.ndarray,
+) -> Dict[Tuple[int, int], Optional[np.ndarray]]:
+    """
+    Edge ids (int32) of a least-`cost` path for every (source, target) pair
+    of distinct dense nodes, or None when the target is unreachable.
+    One shortest-path tree per source.
+    """
+    sources = np.unique(np.asarray(sources, dtype=np.int64))
+    targets = np.unique(np.asarray(targets, dtype=np.int64)).tolist()
+    paths: Dict[Tuple[int, int], Optional[np.ndarray]] = {}
+
+    if csgraph_dijkstra is not None:
+        n = core.n_nodes
+        graph, key, eid = _reduced_graph(core, cost)
+        for lo in range(0, sources.shape[0], ORIGIN_CHUNK):
+            chunk = sources[lo:lo + ORIGIN_CHUNK]
+            _, pred = csgraph_dijkstra(graph, directed=True, indices=chunk, return_predecessors=True)
+            for row, source in enumerate(chunk.tolist()):
+                parent_of = pred[row]
+                for target in targets:
+                    if target == source:
+                        continue
+                    if parent_of[target] < 0:
+                        paths[(source, target)] = None
+                        continue
+                    nodes = [target]
+                    while nodes[-1] != source:
+                        nodes.append(int(parent_of[nodes[-1]]))
+                    parent = np.asarray(nodes[:0:-1], dtype=np.int64)
+                    child = np.asarray(nodes[-2::-1], dtype=np.int64)
+                    paths[(source, target)] = eid[np.searchsorted(key, parent * n + child)].astype(np.int32)
+        return paths
+
+    tail = core.edge_source
+    for source in sources.tolist():
+        _, pred = core.shortest_path_tree(source, cost, targets)
+        for target in targets:
+            if target == source:
+                continue
+            if target not in pred:
+                paths[(source, target)] = None
+                continue
+            edges = []
+            node = target
+            while node != source:
+                e = pred[node]
+                edges.append(e)
+                node = int(tail[e])
+            paths[(source, target)] = np.asarray(edges[::-1], dtype=np.int32)
+    return paths
+
+
+def _reduced_graph(core, cost: np.ndarray):
+    """
+    csgraph matrix keeping the cheapest parallel edge per (u, v), plus the
+    sorted u * n + v keys and the dense edge id behind each entry.
+    """
+    n = core.n_nodes
+    src = core.edge_source.astype(np.int64)
+    dst = core.edge_target.astype(np.int64)
+    c = np.asarray(cost, dtype=np.float64)
+
+    # Cheapest parallel edge per (u, v), in CSR (u-major) order
+    order = np.lexsort((c, dst, src))
+    key = src[order] * n + dst[order]
+    first = np.ones(key.shape[0], dtype=bool)
+    first[1:] = key[1:] != key[:-1]
+    eid = order[first]
+    key = key[first]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src[eid], minlength=n), out=indptr[1:])
+    graph = csr_matrix((c[eid], dst[eid], indptr), shape=(n, n))
+    return graph, key, eid
+
+
+def _matrix_csgraph(core, uniq, inverse, targets, cost, travel_time, out) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    n = core.n_nodes
+    graph, key, eid = _reduced_graph(core, cost)
+    t_reduce = time.perf_counter() - t0
+
+    length = core.length_m
+    tt = np.asarray(travel_time, dtype=np.float64)
+    t_search = 0.0
+    t_acc = 0.0
+
+    for lo in range(0, uniq.shape[0], ORIGIN_CHUNK):
+        chunk = uniq[lo:lo + ORIGIN_CHUNK]
+        t1 = time.perf_counter()
+        dist, pred = csgraph_dijkstra(graph, directed=True, indices=chunk, return_predecessors=True)
+        t2 = time.perf_counter()
+        t_search += t2 - t1
+
+        # Per-node edge from its tree parent, then pointer jumping:
+        # acc[v] = sum over v's path up to anc[v]; anc doubles every round
+        rows, cols = np.nonzero(pred >= 0)
+        parent = pred[rows, cols].astype(np.int64)
+        pe = eid[np.searchsorted(key, parent * n + cols)]
+        acc_len = np.zeros(dist.size)
+        acc_tt = np.zeros(dist.size)
+        anc = np.full(dist.size, -1, dtype=np.int64)
+        flat = rows * n + cols
+        acc_len[flat] = length[pe]
+        acc_tt[flat] = tt[pe]
+        anc[flat] = rows * n + parent
+
+        active = flat
+        while active.size:
+            a = anc[active]
+            acc_len[active] += acc_len[a]
+            acc_tt[active] += acc_tt[a]
+            anc[active] = anc[a]
+            active = active[anc[active] >= 0]
+
+        # Scatter the chunk's target columns to every origin row that snapped to it
+        sel = np.arange(chunk.shape[0])[:, None] * n + targets[None, :]
+        reach = np.isfinite(dist[:, targets])
+        rows_out = np.nonzero((inverse >= lo) & (inverse < lo + chunk.shape[0]))[0]
+        for name, values in (("cost", dist.ravel()), ("distance_m", acc_len), ("eta_s", acc_tt)):
+            m = np.where(reach, values[sel], np.nan)
+            out[name][rows_out] = m[inverse[rows_out] - lo]
+        t_acc += time.perf_counter() - t2
+
+    return {"reduce": t_reduce, "search": t_search, "accumulate": t_acc}
+
+
+def _matrix_dijkstra(core, uniq, inverse, targets, cost, travel_time, out) -> Dict[str, float]:
+    length = core.length_m
+    tail = core.edge_source
+    wanted = set(targets.tolist())
+    t_search = 0.0
+    t_acc = 0.0
+
+    for i, source in enumerate(uniq.tolist()):
+        t1 = time.perf_counter()
+        dist, pred = core.shortest_path_tree(source, cost, wanted)
+        t2 = time.perf_counter()
+        t_search += t2 - t1
+
+        row = np.full((3, targets.shape[0]), np.nan)
+        for j, target in enumerate(targets.tolist()):
+            if target not in dist:
+                continue
+            d_len = 0.0
+            d_tt = 0.0
+            node = target
+            while node != source:
+                e = pred[node]
+                d_len += float(length[e])
+                d_tt += float(travel_time[e])
+                node = int(tail[e])
+            row[:, j] = (dist[target], d_len, d_tt)
+        rows_out = np.nonzero(inverse == i)[0]
+        out["cost"][rows_out] = row[0]
+        out["distance_m"][rows_out] = row[1]
+        out["eta_s"][rows_out] = row[2]
+        t_acc += time.perf_counter() - t2
+
+    return {"reduce": 0.0, "search": t_search, "accumulate": t_acc}
@@ -0,0 +1,189 @@
+# server/route_store.py
+"""
+Persistent (disk) tier of the route cache.
+
+One SQLite row per cached path, keyed by (origin node, dest node, cost key)
+and holding the zlib-compressed JSON record together with its route type,
+created / last-hit timestamps, hit count and wall-clock expiry. Rows are
+written as routes are inserted and read back one at a time on memory
+misses, so nothing has to be parsed at startup. Expired and least
+recently used rows beyond max_rows are pruned every few hundred writes
+(and on checkpoint), so keys that are never read again (superseded
+traffic snapshots) do not pile up. Node ids only make sense for the graph
+they were snapped on: the store remembers the graph hash and drops every
+row when it changes.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Writes between two prunes (fewer for small stores, so max_rows stays tight)
+PRUNE_EVERY = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS routes (
+    origin_node INTEGER NOT NULL,
+    dest_node   INTEGER NOT NULL,
+    cost_key    TEXT    NOT NULL,
+    route_type  TEXT    NOT NULL,
+    payload     BLOB    NOT NULL,
+    created_at  REAL    NOT NULL,
+    last_hit_at REAL,
+    hits        INTEGER NOT NULL DEFAULT 0,
+    expires_at  REAL    NOT NULL,
+    PRIMARY KEY (origin_node, dest_node, cost_key)
+);
+CREATE INDEX IF NOT EXISTS routes_expires ON routes (expires_at);
+"""
+
+
+def _freeze(value):
+    """JSON lists back to the (nested) tuples used in cache keys."""
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _encode(record: Any) -> bytes:
+    return zlib.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(payload: bytes) -> Any:
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+class RouteStore:
+    """
+    Thread-safe SQLite route store. A single connection is shared by all
+    waitress threads behind a lock; WAL journaling keeps each insert to one
+    short append.
+    """
+
+    def __init__(self, path: Path, graph_hash: str, max_rows: int):
+        self.path = Path(path)
+        self.max_rows = int(max_rows)
+        self._prune_every = max(1, min(PRUNE_EVERY, self.max_rows // 4))
+        self._writes_since_prune = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "expired": 0}
+
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'graph_hash'").fetchone()
+        if row is None or row[0] != graph_hash:
+            if row is not None:
+                print("[Cache] Route store was built for a different graph, clearing it")
+            with self._lock:
+                self._conn.execute("DELETE FROM routes")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('graph_hash', ?)", (graph_hash,)
+                )
+        self.prune()
+
+    @staticmethod
+    def _key_columns(key: Tuple[int, int, tuple]) -> Tuple[int, int, str]:
+        origin_node, dest_node, cost_key = key
+        return int(origin_node), int(dest_node), json.dumps(cost_key, separators=(",", ":"))
+
+    def get(self, key: Tuple[int, int, tuple]) -> Optional[Tuple[Any, str, float]]:
+        """(record, route_type, seconds left) or None; a hit updates last_hit_at / hits."""
+        cols = self._key_columns(key)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, route_type, expires_at FROM routes "
+                "WHERE origin_node = ? AND dest_node = ? AND cost_key = ?",
+                cols,
+            ).fetchone()
+            if row is not None and row[2] <= now:
+                self._conn.execute(
+                    "DELETE FROM routes WHERE origin_node = ? AND dest_node = ? AND cost_key = ?", cols
+                )
+                self._stats["expired"] += 1
+                row = None
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute(
+                "UPDATE routes SET last_hit_at = ?, hits = hits + 1 "
+                "WHERE origin_node = ? AND dest_node = ? AND cost_key = ?",
+                (now,) + cols,
+            )
+            self._stats["hits"] += 1
+        return _decode(row[0]), row[1], row[2] - now
+
+    def put(self, key: Tuple[int, int, tuple], record: Any, route_type: str, ttl_s: float) -> None:
+        cols = self._key_columns(key)
+        payload = _encode(record)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routes "
+                "(origin_node, dest_node, cost_key, route_type, payload, created_at, last_hit_at, hits, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, NULL, 0, ?)",
+                cols + (route_type, payload, now, now + ttl_s),
+            )
+            self._stats["writes"] += 1
+            self._writes_since_prune += 1
+            due = self._writes_since_prune >= self._prune_every
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop expired rows, then the least recently used rows beyond max_rows."""
+        with self._lock:
+            self._writes_since_prune = 0
+            removed = self._conn.execute("DELETE FROM routes WHERE expires_at <= ?", (time.time(),)).rowcount
+            self._stats["expired"] += removed
+            removed += self._conn.execute(
+                "DELETE FROM routes WHERE rowid IN ("
+                "SELECT rowid FROM routes ORDER BY COALESCE(last_hit_at, created_at) DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            ).rowcount
+        return removed
+
+    def items(self) -> Iterator[Tuple[Tuple[int, int, tuple], Any, str]]:
+        """(key, record, route_type) of every live row, decoded lazily."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT origin_node, dest_node, cost_key, route_type, payload FROM routes WHERE expires_at > ?",
+                (time.time(),),
+            ).fetchall()
+        for origin_node, dest_node, cost_key, route_type, payload in rows:
+            yield (origin_node, dest_node, _freeze(json.loads(cost_key))), _decode(payload), route_type
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM routes")
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def checkpoint(self) -> None:
+        """Prune, then fold the WAL back into the main database file."""
+        self.prune()
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+            stats = dict(self._stats)
+        stats.update({
+            "rows": rows,
+            "max_rows": self.max_rows,
+            "file_bytes": self.path.stat().st_size if self.path.exists() else 0,
+        })
+        return stats
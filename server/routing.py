@@ -2,19 +2,51 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, Any, List, Tuple, Optional, Set
+from typing import Dict, Any, List, Tuple, Optional
 import math
 import json
 import time
+import os
 import sys
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
 import networkx as nx
+import numpy as np
 
 # Import global configuration
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 import config as global_config
 
+try:
+    from server.graph_core import CompiledGraph, build_compiled_graph, compute_connectivity
+    from server.overlays import OverlayStore
+    from server.traffic_influence import TrafficInfluence
+    from server.contraction import ContractionHierarchy, build_contraction_hierarchy
+    from server.cch import CustomizableCH, build_cch
+    from server.edge_geometry import EdgeGeometry
+    from server.route_matrix import compute_route_matrix, shortest_path_edges
+    from server.route_cache import RouteCache
+    from server.route_store import RouteStore
+    from server.flood_bitmaps import FloodBitmaps
+    from server.flood_cells import FloodCells, FloodCellsNotReady, FloodTimeline, cell_pairs, is_ingesting, lines_of, load_flood_cells
+    from server.spatial_index import LineIndex
+except ImportError:
+    from graph_core import CompiledGraph, build_compiled_graph, compute_connectivity
+    from overlays import OverlayStore
+    from traffic_influence import TrafficInfluence
+    from contraction import ContractionHierarchy, build_contraction_hierarchy
+    from cch import CustomizableCH, build_cch
+    from edge_geometry import EdgeGeometry
+    from route_matrix import compute_route_matrix, shortest_path_edges
+    from route_cache import RouteCache
+    from route_store import RouteStore
+    from flood_bitmaps import FloodBitmaps
+    from flood_cells import FloodCells, FloodCellsNotReady, FloodTimeline, cell_pairs, is_ingesting, lines_of, load_flood_cells
+    from spatial_index import LineIndex
+
 # Use global config for libraries
 GEOPANDAS_OK = global_config.GEOPANDAS_OK
 OSMNX_AVAILABLE = global_config.OSMNX_AVAILABLE
@@ -31,29 +63,97 @@ _graph: Optional[nx.MultiDiGraph] = None
 _gdf_edges = None
 _graphml_path_used: Optional[Path] = None
 _travel_time_initialized: bool = False  # Track if travel_time defaults are set
+_graph_load_seconds: float = 0.0  # GraphML parse time (reported when a snapshot replaces it)
+
+# Compiled CSR routing core (built once from _graph)
+_core: Optional[CompiledGraph] = None
+_core_failed: bool = False
+_core_lock = threading.Lock()
+_graph_hash: Optional[str] = None  # sha1 of the GraphML file; keys every derived artifact
+
+# Contraction hierarchy for `shortest` (static length), built offline
+_ch: Optional[ContractionHierarchy] = None
+_ch_checked: bool = False
+
+# Customizable contraction hierarchy for the traffic / flood route types:
+# metric-independent part built once, customized once per weight overlay
+_cch: Optional[CustomizableCH] = None
+_cch_failed: bool = False
+_cch_lock = threading.Lock()
+
+# Versioned read-only weight overlays shared between requests
+_overlays = OverlayStore(global_config.MAX_WEIGHT_OVERLAYS)
+
+# Flat per-edge polylines for rendering (memory-mapped, indexed by dense edge id)
+_edge_geom: Optional[EdgeGeometry] = None
+_edge_geom_lock = threading.Lock()
 
 _roads_by_osmid: Optional[Dict[Any, List[Any]]] = None
 _roads_geojson_path_used: Optional[Path] = None
 
-# Flood cache: flood_index -> set of (u,v,k) edge keys that intersect flood
-_flood_edge_cache: Dict[int, Set[Tuple[int, int, int]]] = {}
+# Hotspot route table: (overlay cost_key, origin node, dest node) -> edge ids,
+# rebuilt in the background after every traffic collection
+_hotspot_routes: Dict[Tuple[Any, int, int], np.ndarray] = {}
+_hotspot_stats: Dict[str, Any] = {"hits": 0, "builds": 0, "routes": 0}
+_hotspot_lock = threading.Lock()
+_hotspot_thread: Optional[threading.Thread] = None
+_hotspot_pending: bool = False
+
+# Flood cache: one packed bitmap over dense edge ids per flood index
+_flood_bitmaps: Optional[FloodBitmaps] = None
+_flood_lock = threading.Lock()
+# STRtree over edge LineStrings by dense id for flood joins, built once per graph
+_flood_edge_index: Optional[LineIndex] = None
+# (cell, dense edge id) intersection pairs of the flood cell store, with its version
+_flood_cell_edges: Optional[Tuple[str, Tuple[np.ndarray, np.ndarray]]] = None
+_flood_edges_lock = threading.Lock()
+# Flood pre-computation progress, phase "ingest" (flood files) then "masks" (see get_flood_precompute_progress)
+_flood_progress: Dict[str, Any] = {"state": "idle", "phase": None, "total": 0, "done": 0, "resumed": 0, "failed": 0}
 _flood_meta_cache: Dict[int, Dict[str, Any]] = {}  # logging/meta
 
 # Traffic cache: (lat, lon) -> (u, v, k)
 _traffic_cache: Dict[Tuple[float, float], Tuple[int, int, int]] = {}
 
-_route_cache: Dict[Tuple[float, float, float, float, int, str], Dict[str, Any]] = {}
-_route_cache_stats = {"hits": 0, "misses": 0}  # Track cache effectiveness
 
 # Use global configuration constants
 MAX_ROUTE_CACHE_SIZE = global_config.MAX_ROUTE_CACHE_SIZE
+ROUTING_ENGINE = global_config.ROUTING_ENGINE
+ROUTING_SEARCH = global_config.ROUTING_SEARCH
+CCH_ENABLED = global_config.CCH_ENABLED
+HOTSPOT_ROUTES_ENABLED = global_config.HOTSPOT_ROUTES_ENABLED
+HOTSPOT_LOCATIONS = list(global_config.PRESET_LOCATIONS.values())
 FLOOD_DEPTH_THRESHOLD_M = global_config.FLOOD_DEPTH_THRESHOLD_M
 FLOOD_PENALTY = global_config.FLOOD_PENALTY
+FLOOD_PRECOMPUTE_WORKERS = global_config.FLOOD_PRECOMPUTE_WORKERS or (os.cpu_count() or 1)
+
+# Route types whose cost depends on the traffic snapshot (cache keys carry its version)
+TRAFFIC_ROUTE_TYPES = ("Fastest", "smart")
+
+# Level-1 snap cache: (rounded lat, rounded lon, dest node, k) -> node id
+_snap_cache: "OrderedDict[Tuple[float, float, Optional[int], int], int]" = OrderedDict()
+_snap_lock = threading.Lock()
+_snap_stats = {"hits": 0, "misses": 0}
+SNAP_CACHE_SIZE = 20000
+
+# Level-2 path cache: (origin node, dest node, cost_key) -> path edge ids;
+# LRU bounded by bytes and entries, per-route-type TTLs
+_route_cache = RouteCache(
+    max_bytes=int(global_config.ROUTE_CACHE_MAX_MB * 1024 * 1024),
+    max_entries=MAX_ROUTE_CACHE_SIZE,
+    ttl_s=global_config.ROUTE_CACHE_TTL_S,
+)
 
 # Persistent cache paths
 CACHE_DIR = global_config.CACHE_DIR
 FLOOD_CACHE_FILE = global_config.FLOOD_CACHE_FILE
+FLOOD_CELLS_DIR = global_config.FLOOD_CELLS_DIR
 ROUTE_CACHE_FILE = global_config.ROUTE_CACHE_FILE
+ROUTE_CACHE_DISK_MAX_ROWS = global_config.ROUTE_CACHE_DISK_MAX_ROWS
+
+# Disk tier behind _route_cache, opened on first use
+_route_store: Optional[RouteStore] = None
+_route_store_error: Optional[str] = None
+_route_store_lock = threading.Lock()
 
 
 # ---------------------------
@@ -66,34 +166,95 @@ def _ensure_cache_dir():
         print(f"[Cache] Created cache directory: {CACHE_DIR}")
 
 
+def _flood_source_key(cells: Optional[FloodCells]) -> str:
+    """Depth threshold and flood cell store version flood bitmaps are computed from."""
+    return f"{FLOOD_DEPTH_THRESHOLD_M}|" + (cells.version if cells is not None else "")
+
+
+def _flood_meta_path() -> Path:
+    return FLOOD_CACHE_FILE.with_suffix(".npz")
+
+
+def _write_flood_meta(store: FloodBitmaps) -> None:
+    _save_npz_atomic(
+        _flood_meta_path(),
+        graph_hash=np.array(_graph_file_hash()),
+        source=np.array(store.source),
+        n_edges=np.array(store.n_edges),
+        present=store.present,
+    )
+
+
+def _open_flood_store(core: CompiledGraph, cells: Optional[FloodCells]) -> FloodBitmaps:
+    """
+    Flood bitmaps of `cells` memory-mapped read/write from FLOOD_CACHE_FILE,
+    so every timestamp is persisted as soon as it is computed. A missing or
+    stale file is replaced by an empty one; without a writable cache dir the
+    bitmaps stay in memory.
+    """
+    source = _flood_source_key(cells)
+    n_slots = cells.n_times if cells is not None else 0
+    shape = (n_slots, (core.n_edges + 7) // 8)
+    if n_slots == 0:
+        return FloodBitmaps.empty(0, core.n_edges, source)
+
+    meta_path = _flood_meta_path()
+    try:
+        if FLOOD_CACHE_FILE.exists() and meta_path.exists():
+            with np.load(meta_path) as meta:
+                fresh = (str(meta["graph_hash"]) == _graph_file_hash() and str(meta["source"]) == source
+                         and int(meta["n_edges"]) == core.n_edges)
+                present = meta["present"].copy()
+            if fresh:
+                bits = np.lib.format.open_memmap(FLOOD_CACHE_FILE, mode="r+")
+                if bits.shape == shape and present.shape == (n_slots,):
+                    return FloodBitmaps(bits, present, core.n_edges, source)
+            print(f"[Cache] Discarding stale {FLOOD_CACHE_FILE.name} (graph, flood files or threshold changed)")
+
+        _ensure_cache_dir()
+        # Created aside and renamed over: a replaced store may still be mapping the old file
+        tmp = FLOOD_CACHE_FILE.with_suffix(".tmp.npy")
+        bits = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8, shape=shape)
+        tmp.replace(FLOOD_CACHE_FILE)
+        store = FloodBitmaps(bits, np.zeros(n_slots, dtype=bool), core.n_edges, source)
+        _write_flood_meta(store)
+        return store
+    except Exception as e:
+        print(f"[Cache] ✗ Flood cache not persisted ({e}), keeping bitmaps in memory")
+        return FloodBitmaps.empty(n_slots, core.n_edges, source)
+
+
+def _store_flood_mask(store: FloodBitmaps, flood_idx: int, mask: np.ndarray) -> None:
+    """Set one timestamp's bitmap; the row reaches disk before it is marked present."""
+    with _flood_lock:
+        store.set_mask(flood_idx, mask)
+        # A store replaced meanwhile (flood data changed) no longer owns the .npz key
+        if isinstance(store.bits, np.memmap) and store is _flood_bitmaps:
+            try:
+                store.bits.flush()
+                _write_flood_meta(store)
+            except OSError as e:
+                print(f"[Cache] ✗ Failed to persist flood idx={flood_idx}: {e}")
+
+
 def save_flood_cache_to_disk() -> bool:
     """
-    Save flood edge cache to disk for persistence across restarts.
+    Timestamps are written to the memory-mapped flood cache as they are
+    computed; this only flushes it.
     Returns True if successful.
     """
-    global _flood_edge_cache
-    if not _flood_edge_cache:
+    store = _flood_bitmaps
+    if store is None or not store.present.any():
         print("[Cache] No flood cache to save")
         return False
+    if not isinstance(store.bits, np.memmap):
+        return False
     
     try:
-        _ensure_cache_dir()
-        
-        # Convert sets to lists for JSON serialization
-        export_data = {
-            "version": "1.0",
-            "created_at": datetime.now().isoformat(),
-            "entries_count": len(_flood_edge_cache),
-            "entries": {
-                str(k): [list(edge) for edge in v]
-                for k, v in _flood_edge_cache.items()
-            }
-        }
-        
-        with open(FLOOD_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(export_data, f)
-        
-        print(f"[Cache] ✓ Saved flood cache ({len(_flood_edge_cache)} entries) to {FLOOD_CACHE_FILE.name}")
+        with _flood_lock:
+            store.bits.flush()
+            _write_flood_meta(store)
+        print(f"[Cache] ✓ Flood cache on disk ({len(store.indices())} timestamps) in {FLOOD_CACHE_FILE.name}")
         return True
     except Exception as e:
         print(f"[Cache] ✗ Failed to save flood cache: {e}")
@@ -102,117 +263,99 @@ def save_flood_cache_to_disk() -> bool:
 
 def load_flood_cache_from_disk() -> bool:
     """
-    Load flood edge cache from disk.
-    Returns True if cache was loaded successfully.
+    Memory-map the flood bitmaps computed so far.
+    Returns True if any timestamp was loaded.
     """
-    global _flood_edge_cache
-    
-    if not FLOOD_CACHE_FILE.exists():
-        print(f"[Cache] No flood cache file found at {FLOOD_CACHE_FILE}")
-        return False
-    
     try:
-        with open(FLOOD_CACHE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        # Convert lists back to sets of tuples
-        for key, edges in data.get("entries", {}).items():
-            _flood_edge_cache[int(key)] = set(tuple(e) for e in edges)
-        
-        created = data.get("created_at", "unknown")
-        print(f"[Cache] ✓ Loaded flood cache ({len(_flood_edge_cache)} entries) from disk (created: {created})")
+        t0 = time.perf_counter()
+        core = load_core()
+        if core is None:
+            return False
+        store = _flood_store(core, get_flood_cells(wait=True))
+        loaded = len(store.indices())
+        if not loaded:
+            print(f"[Cache] No flood cache found at {FLOOD_CACHE_FILE}")
+            return False
+        print(f"[Cache] ✓ Loaded flood cache ({loaded} timestamps) from disk in {time.perf_counter() - t0:.3f}s")
         return True
     except Exception as e:
         print(f"[Cache] ✗ Failed to load flood cache: {e}")
         return False
 
 
+def load_route_store() -> Optional[RouteStore]:
+    """Open the SQLite disk tier of the route cache (None if it cannot be opened)."""
+    global _route_store, _route_store_error
+    if _route_store is not None or _route_store_error is not None:
+        return _route_store
+    with _route_store_lock:
+        if _route_store is None and _route_store_error is None:
+            try:
+                t0 = time.perf_counter()
+                _ensure_cache_dir()
+                _route_store = RouteStore(ROUTE_CACHE_FILE, _graph_file_hash(), ROUTE_CACHE_DISK_MAX_ROWS)
+                print(f"[Cache] ✓ Opened route store {ROUTE_CACHE_FILE.name} in {time.perf_counter() - t0:.3f}s")
+            except Exception as e:
+                _route_store_error = str(e)
+                print(f"[Cache] ✗ Route store unavailable, caching in memory only: {e}")
+    return _route_store
+
+
 def save_route_cache_to_disk() -> bool:
     """
-    Save route cache to disk for persistence across restarts.
+    Routes are written to the disk tier as they are cached; this only folds
+    the SQLite WAL back into the database file.
     Returns True if successful.
     """
-    global _route_cache
-    if not _route_cache:
-        print("[Cache] No route cache to save")
+    store = load_route_store()
+    if store is None:
         return False
-    
     try:
-        _ensure_cache_dir()
-        
-        # Convert tuple keys to strings for JSON compatibility
-        export_data = {
-            "version": "1.0",
-            "created_at": datetime.now().isoformat(),
-            "stats": _route_cache_stats,
-            "entries_count": len(_route_cache),
-            "entries": {}
-        }
-        
-        for key, val in _route_cache.items():
-            # key is (origin_lat, origin_lon, dest_lat, dest_lon, flood_idx, route_type)
-            key_str = f"{key[0]},{key[1]}_{key[2]},{key[3]}_{key[4]}_{key[5]}"
-            export_data["entries"][key_str] = {
-                "key_tuple": list(key),
-                "route": val
-            }
-        
-        with open(ROUTE_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(export_data, f)
-        
-        print(f"[Cache] ✓ Saved route cache ({len(_route_cache)} routes) to {ROUTE_CACHE_FILE.name}")
+        store.checkpoint()
+        print(f"[Cache] ✓ Route store checkpointed ({store.stats()['rows']} routes)")
         return True
     except Exception as e:
-        print(f"[Cache] ✗ Failed to save route cache: {e}")
+        print(f"[Cache] ✗ Failed to checkpoint route store: {e}")
         return False
 
 
 def load_route_cache_from_disk() -> bool:
     """
-    Load route cache from disk.
-    Returns True if cache was loaded successfully.
+    Open the disk tier of the route cache. Rows are not parsed up front:
+    memory misses fall through to it one route at a time.
+    Returns True if the store is available.
     """
-    global _route_cache, _route_cache_stats
-    
-    if not ROUTE_CACHE_FILE.exists():
-        print(f"[Cache] No route cache file found")
-        return False
-    
-    try:
-        with open(ROUTE_CACHE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        # Restore stats
-        if "stats" in data:
-            _route_cache_stats = data["stats"]
-        
-        # Convert string keys back to tuples
-        for key_str, entry in data.get("entries", {}).items():
-            key_tuple = tuple(entry["key_tuple"])
-            _route_cache[key_tuple] = entry["route"]
-        
-        created = data.get("created_at", "unknown")
-        print(f"[Cache] ✓ Loaded route cache ({len(_route_cache)} routes) from disk (created: {created})")
-        return True
-    except Exception as e:
-        print(f"[Cache] ✗ Failed to load route cache: {e}")
+    store = load_route_store()
+    if store is None:
         return False
+    print(f"[Cache] ✓ Route store has {store.stats()['rows']} routes on disk")
+    return True
 
 
 def invalidate_caches():
     """
     Clear all caches (memory and disk). Call when flood data files change.
     """
-    global _flood_edge_cache, _route_cache, _route_cache_stats
+    global _flood_bitmaps, _flood_cell_edges
     
-    _flood_edge_cache.clear()
+    with _flood_lock:
+        _flood_bitmaps = None
+    with _flood_edges_lock:
+        _flood_cell_edges = None
+    _overlays.clear()
+    if _cch is not None:
+        _cch.clear()
     _route_cache.clear()
-    _route_cache_stats = {"hits": 0, "misses": 0}
+    _hotspot_routes.clear()
     
     # Delete disk cache files
     if FLOOD_CACHE_FILE.exists():
         FLOOD_CACHE_FILE.unlink()
-    if ROUTE_CACHE_FILE.exists():
+    if _flood_meta_path().exists():
+        _flood_meta_path().unlink()
+    if _route_store is not None:
+        _route_store.clear()
+    elif ROUTE_CACHE_FILE.exists():
         ROUTE_CACHE_FILE.unlink()
     
     print("[Cache] ✓ All caches invalidated (memory and disk)")
@@ -230,14 +373,27 @@ def _pick_graphml_path() -> Path:
     )
 
 
+def _graph_path() -> Path:
+    global _graphml_path_used
+    if _graphml_path_used is None:
+        _graphml_path_used = _pick_graphml_path()
+    return _graphml_path_used
+
+
 def load_graph() -> nx.MultiDiGraph:
-    global _graph, _graphml_path_used
+    """
+    The networkx graph parsed from GraphML. Routing itself runs on the
+    compiled core (load_core), which starts from a snapshot when one
+    exists, so this is only needed for geometry / flood joins and the
+    networkx reference engine.
+    """
+    global _graph, _graph_load_seconds
 
     if _graph is not None:
         return _graph
 
-    path = _pick_graphml_path()
-    _graphml_path_used = path
+    t0 = time.perf_counter()
+    path = _graph_path()
     print(f"[Routing] Loading graph: {path}")
 
     if OSMNX_AVAILABLE:
@@ -268,10 +424,245 @@ def load_graph() -> nx.MultiDiGraph:
         _graph = G
         print("[Routing] Loaded using networkx.read_graphml")
 
-    print(f"[Routing] Graph ready: nodes={_graph.number_of_nodes()} edges={_graph.number_of_edges()}")
+    _graph_load_seconds = time.perf_counter() - t0
+    print(f"[Routing] Graph ready: nodes={_graph.number_of_nodes()} edges={_graph.number_of_edges()} in {_graph_load_seconds:.2f}s")
+    if _core is not None:
+        _tag_edge_ids(_graph, _core)
     return _graph
 
 
+def load_core() -> Optional[CompiledGraph]:
+    """
+    Compiled CSR view of the routing graph.
+    Loaded from the <graph stem>.core.npz snapshot when it matches the
+    GraphML hash; otherwise compiled from load_graph() and the snapshot is
+    written for the next start. The graph itself is frozen: per-request
+    weights live in overlays indexed by dense edge id (stored on each
+    networkx edge as `_eid`). Returns None if the build failed.
+    """
+    global _core, _core_failed
+    if _core is not None or _core_failed:
+        return _core
+
+    with _core_lock:
+        if _core is not None or _core_failed:
+            return _core
+
+        core = _load_core_snapshot()
+        if core is None:
+            t0 = time.perf_counter()
+            G = load_graph()
+            _initialize_travel_time_defaults(G)
+            try:
+                core = build_compiled_graph(G)
+            except Exception as e:
+                _core_failed = True
+                print(f"[Routing] CSR core build failed: {e}")
+                return None
+            # GraphML parse (possibly done earlier) + travel time defaults + compile
+            build_seconds = _graph_load_seconds + (time.perf_counter() - t0)
+            _save_core_snapshot(core, build_seconds)
+
+        if _graph is not None:
+            _tag_edge_ids(_graph, core)
+        _attach_connectivity(core)
+        _core = core
+    return _core
+
+
+def _tag_edge_ids(G: nx.MultiDiGraph, core: CompiledGraph) -> None:
+    """Store each edge's dense id as the `_eid` attribute (used by the networkx engine)."""
+    for eid in range(core.n_edges):
+        u, v, k = core.edge_uvk(eid)
+        G.edges[u, v, k]["_eid"] = eid
+
+
+def _load_core_snapshot() -> Optional[CompiledGraph]:
+    t0 = time.perf_counter()
+    path = _graph_artifact_path("core.npz")
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data["graph_hash"]) != _graph_file_hash():
+                print(f"[Routing] Ignoring stale {path.name} (graph changed)")
+                return None
+            build_seconds = float(data["build_seconds"])
+            core = CompiledGraph.from_arrays(data)
+    except Exception as e:
+        print(f"[Routing] Ignoring unreadable {path.name}: {e}")
+        return None
+    dt = time.perf_counter() - t0
+    print(f"[Routing] Loaded compiled graph snapshot {path.name}: nodes={core.n_nodes} edges={core.n_edges} "
+          f"in {dt:.3f}s (GraphML load + compile took {build_seconds:.2f}s, saved {build_seconds - dt:.2f}s)")
+    return core
+
+
+def _save_core_snapshot(core: CompiledGraph, build_seconds: float) -> None:
+    path = _graph_artifact_path("core.npz")
+    try:
+        _save_npz_atomic(
+            path,
+            graph_hash=np.array(_graph_file_hash()),
+            build_seconds=np.array(build_seconds),
+            **core.to_arrays(),
+        )
+        print(f"[Routing] Saved compiled graph snapshot to {path.name}")
+    except OSError as e:
+        print(f"[Routing] Could not persist compiled graph snapshot: {e}")
+
+
+def _graph_file_hash() -> str:
+    """Content hash of the loaded GraphML, used to validate artifacts saved next to it."""
+    global _graph_hash
+    if _graph_hash is None:
+        h = hashlib.sha1()
+        with open(_graph_path(), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _graph_hash = h.hexdigest()
+    return _graph_hash
+
+
+def _graph_artifact_path(suffix: str) -> Path:
+    """e.g. web/data/ggn_extent.graphml -> web/data/ggn_extent.<suffix>"""
+    path = _graph_path()
+    return path.with_name(f"{path.stem}.{suffix}")
+
+
+def _save_npz_atomic(path: Path, **arrays) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    tmp.replace(path)
+
+
+def _attach_connectivity(core: CompiledGraph) -> None:
+    """
+    Strongly connected component labels + out-degree flags for snapping.
+    Persisted next to the GraphML (keyed by its hash) so restarts skip the computation.
+    """
+    t0 = time.perf_counter()
+    path = _graph_artifact_path("labels.npz")
+    graph_hash = _graph_file_hash()
+
+    if path.exists():
+        try:
+            with np.load(path) as data:
+                if str(data["graph_hash"]) == graph_hash:
+                    core.attach_connectivity(data["scc_label"], data["has_out"])
+                    print(f"[Routing] Loaded connectivity labels from {path.name} in {time.perf_counter() - t0:.3f}s")
+                    return
+        except Exception as e:
+            print(f"[Routing] Ignoring unreadable {path.name}: {e}")
+
+    scc_label, has_out = compute_connectivity(core)
+    core.attach_connectivity(scc_label, has_out)
+    n_comp = int(scc_label.max()) + 1 if scc_label.size else 0
+    print(f"[Routing] Connectivity labels: {n_comp} strongly connected components in {time.perf_counter() - t0:.2f}s")
+    try:
+        _save_npz_atomic(path, graph_hash=np.array(graph_hash), scc_label=scc_label, has_out=has_out)
+    except OSError as e:
+        print(f"[Routing] Could not persist connectivity labels: {e}")
+
+
+def load_ch() -> Optional[ContractionHierarchy]:
+    """
+    Contraction hierarchy over edge length, loaded from <graph stem>.ch.npz
+    if it was built for the current GraphML (see build_ch). Returns None
+    when there is no valid artifact; `shortest` then uses the CSR search.
+    """
+    global _ch, _ch_checked
+    if _ch is not None or _ch_checked:
+        return _ch
+
+    core = load_core()
+    _ch_checked = True
+    if core is None:
+        return None
+
+    t0 = time.perf_counter()
+    path = _graph_artifact_path("ch.npz")
+    if not path.exists():
+        print(f"[Routing] No contraction hierarchy ({path.name}); build it with: python benchmarks/build_ch.py")
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data["graph_hash"]) != _graph_file_hash():
+                print(f"[Routing] Ignoring stale {path.name} (graph changed); rebuild with: python benchmarks/build_ch.py")
+                return None
+            _ch = ContractionHierarchy.from_arrays(data)
+    except Exception as e:
+        print(f"[Routing] Ignoring unreadable {path.name}: {e}")
+        return None
+    print(f"[Routing] Loaded contraction hierarchy from {path.name} ({_ch.n_shortcuts} shortcuts) in {time.perf_counter() - t0:.3f}s")
+    return _ch
+
+
+def build_ch() -> Optional[ContractionHierarchy]:
+    """Offline step: contract the graph under edge length and persist it next to the GraphML."""
+    global _ch, _ch_checked
+    core = load_core()
+    if core is None:
+        return None
+    ch = build_contraction_hierarchy(core, core.length)
+    path = _graph_artifact_path("ch.npz")
+    try:
+        _save_npz_atomic(path, graph_hash=np.array(_graph_file_hash()), **ch.to_arrays())
+        print(f"[Routing] Saved contraction hierarchy to {path.name}")
+    except OSError as e:
+        print(f"[Routing] Could not persist contraction hierarchy: {e}")
+    _ch = ch
+    _ch_checked = True
+    return ch
+
+
+def load_cch() -> Optional[CustomizableCH]:
+    """
+    Metric-independent CCH preprocessing (ordering, chordal arcs, triangles),
+    loaded from <graph stem>.cch.npz or built and saved there on first use.
+    Returns None if disabled (CCH_ENABLED) or the build failed.
+    """
+    global _cch, _cch_failed
+    if _cch is not None or _cch_failed or not CCH_ENABLED:
+        return _cch
+
+    with _cch_lock:
+        if _cch is not None or _cch_failed:
+            return _cch
+        core = load_core()
+        if core is None:
+            _cch_failed = True
+            return None
+
+        t0 = time.perf_counter()
+        path = _graph_artifact_path("cch.npz")
+        graph_hash = _graph_file_hash()
+        max_metrics = global_config.MAX_WEIGHT_OVERLAYS
+        if path.exists():
+            try:
+                with np.load(path) as data:
+                    if str(data["graph_hash"]) == graph_hash:
+                        _cch = CustomizableCH.from_arrays(data, max_metrics=max_metrics)
+                        print(f"[Routing] Loaded CCH from {path.name} in {time.perf_counter() - t0:.3f}s")
+                        return _cch
+            except Exception as e:
+                print(f"[Routing] Ignoring unreadable {path.name}: {e}")
+
+        try:
+            cch = build_cch(core, max_metrics=max_metrics)
+        except Exception as e:
+            _cch_failed = True
+            print(f"[Routing] CCH build failed: {e}")
+            return None
+        try:
+            _save_npz_atomic(path, graph_hash=np.array(graph_hash), **cch.to_arrays())
+        except OSError as e:
+            print(f"[Routing] Could not persist CCH: {e}")
+        _cch = cch
+    return _cch
+
+
 def _ensure_gdf_edges():
     """
     Get edge GeoDataFrame (geometry) from OSMnx graph (fast spatial operations).
@@ -408,15 +799,40 @@ def _haversine_m(lat1, lon1, lat2, lon2) -> float:
 # Traffic snapshot + apply
 # ---------------------------
 def load_traffic_snapshot() -> List[Dict]:
+    return load_traffic_snapshot_versioned()[1]
+
+
+# (path, mtime_ns) -> (snapshot id, points); avoids re-parsing an unchanged file per request
+_traffic_snapshot_memo: Optional[Tuple[Tuple[str, int], Tuple[str, List[Dict]]]] = None
+
+
+def load_traffic_snapshot_versioned() -> Tuple[str, List[Dict]]:
+    """
+    Latest traffic snapshot plus a version id for it.
+    The id is the collector's generated_at_utc (file mtime as fallback),
+    so weight overlays built for one snapshot are reused until the next run.
+    """
+    global _traffic_snapshot_memo
     traffic_file = PROJECT_ROOT / "web" / "data" / "latest_traffic.json"
-    if not traffic_file.exists():
-        return []
+    try:
+        stat_key = (str(traffic_file), traffic_file.stat().st_mtime_ns)
+    except OSError:
+        return "none", []
+
+    memo = _traffic_snapshot_memo
+    if memo is not None and memo[0] == stat_key:
+        return memo[1]
+
     try:
         with open(traffic_file, "r", encoding="utf-8") as f:
             data = json.load(f)
-        return data.get("points", [])
+        points = data.get("points", [])
+        version = str(data.get("generated_at_utc") or stat_key[1])
     except Exception:
-        return []
+        return "none", []
+
+    _traffic_snapshot_memo = (stat_key, (version, points))
+    return version, points
 
 
 def _parse_maxspeed_kph(val, default_kph: float) -> float:
@@ -465,68 +881,40 @@ def _initialize_travel_time_defaults(G: nx.MultiDiGraph) -> None:
 # will inherit that point's speed ratio (with distance-based decay)
 TRAFFIC_INFLUENCE_RADIUS_M = getattr(global_config, 'TRAFFIC_INFLUENCE_RADIUS_M', 500)  # default 500m
 
-# Cache for edges within radius of each traffic point
-_traffic_radius_cache: Dict[Tuple[float, float], List[Tuple[int, int, int, float]]] = {}
+# Edge-midpoint index + sparse edges x points influence matrices (built lazily from the core)
+_traffic_influence: Optional[TrafficInfluence] = None
 
 
-def _find_edges_within_radius(G: nx.MultiDiGraph, lat: float, lon: float, radius_m: float) -> List[Tuple[int, int, int, float]]:
-    """
-    Find all edges within radius_m of a point.
-    Returns list of (u, v, k, distance_m) tuples.
-    """
-    edges_in_radius = []
-    
-    for u, v, k, data in G.edges(keys=True, data=True):
-        # Get edge midpoint (approximate)
-        u_data = G.nodes[u]
-        v_data = G.nodes[v]
-        
-        u_lat = float(u_data.get("y", 0))
-        u_lon = float(u_data.get("x", 0))
-        v_lat = float(v_data.get("y", 0))
-        v_lon = float(v_data.get("x", 0))
-        
-        # Use midpoint of edge
-        mid_lat = (u_lat + v_lat) / 2
-        mid_lon = (u_lon + v_lon) / 2
-        
-        # Calculate distance from traffic point to edge midpoint
-        dist = _haversine_m(lat, lon, mid_lat, mid_lon)
-        
-        if dist <= radius_m:
-            edges_in_radius.append((u, v, k, dist))
-    
-    return edges_in_radius
+def _get_traffic_influence(core: CompiledGraph) -> TrafficInfluence:
+    """Edge-midpoint spatial index for `core`; the graph is only scanned once."""
+    global _traffic_influence
+    if _traffic_influence is None:
+        _traffic_influence = TrafficInfluence(core.edge_source, core.edge_target, core.x, core.y)
+    return _traffic_influence
 
 
 # Traffic assignment strategy options
 TRAFFIC_STRATEGY = "nearest"  # Options: "nearest", "worst", "weighted_average"
 
 
-def apply_traffic_data(G: nx.MultiDiGraph, traffic_points: List[Dict]) -> None:
+def compute_traffic_travel_times(core: CompiledGraph, traffic_points: List[Dict]) -> np.ndarray:
     """
-    Apply traffic data from monitoring points to ALL nearby edges within radius.
+    Per-edge travel_time (seconds, indexed by dense edge id) under a traffic snapshot.
+    Traffic from monitoring points is spread to ALL nearby edges within radius;
+    edges out of range keep their free-flow travel time. The graph is not modified.
     
     Strategy options (set TRAFFIC_STRATEGY above):
     - "nearest": Use the closest traffic point's data (most accurate)
     - "worst": Use the slowest speed ratio (conservative, avoids congestion)
     - "weighted_average": Blend all nearby points by distance (smooth but less accurate)
     
-    This ensures custom routes passing near traffic points use real speeds
-    instead of default free-flow speeds.
+    The edges x points distances / decay factors come from a sparse matrix
+    built once per (point locations, TRAFFIC_INFLUENCE_RADIUS_M), so a new
+    snapshot or strategy is only a vectorized reduction over that matrix.
     """
-    global _traffic_radius_cache
-    DEFAULT_SPEED_KPH = 30.0
-    
-    # Ensure defaults are initialized (one-time)
-    _initialize_travel_time_defaults(G)
-    
-    if not traffic_points:
-        return
-
     # Parse traffic points
     traffic_data = []
-    for p in traffic_points:
+    for p in traffic_points or []:
         lat = float(p.get("lat") or p.get("query_lat") or 0)
         lon = float(p.get("lon") or p.get("query_lon") or 0)
         sr = float(p.get("speed_ratio", 1.0))
@@ -536,106 +924,34 @@ def apply_traffic_data(G: nx.MultiDiGraph, traffic_points: List[Dict]) -> None:
         traffic_data.append((lat, lon, sr))
 
     if not traffic_data:
-        return
+        return _travel_time_for_speed_ratio(core, np.ones(core.n_edges, dtype=np.float32))
 
-    # For each edge, track: {edge_key: [(distance, speed_ratio, decay_factor), ...]}
-    edge_traffic_info: Dict[Tuple[int, int, int], List[Tuple[float, float, float]]] = {}
-    count_updated = 0
-    
-    # Step 1: Collect all traffic points that affect each edge
-    for lat, lon, sr in traffic_data:
-        cache_key = (round(lat, 6), round(lon, 6))
-        
-        # Check cache for edges within radius
-        if cache_key in _traffic_radius_cache:
-            edges_nearby = _traffic_radius_cache[cache_key]
-        else:
-            # Find all edges within radius (slower, but cached)
-            edges_nearby = _find_edges_within_radius(G, lat, lon, TRAFFIC_INFLUENCE_RADIUS_M)
-            _traffic_radius_cache[cache_key] = edges_nearby
-        
-        # Record this traffic point's influence on each nearby edge
-        for (u, v, k, dist) in edges_nearby:
-            # Distance decay: closer = stronger influence
-            # At 0m: factor = 1.0, at radius: factor = 0.3
-            decay_factor = max(0.3, 1.0 - (dist / TRAFFIC_INFLUENCE_RADIUS_M) * 0.7)
-            
-            uvk = (u, v, k)
-            if uvk not in edge_traffic_info:
-                edge_traffic_info[uvk] = []
-            edge_traffic_info[uvk].append((dist, sr, decay_factor))
-    
-    # Step 2: For each edge, choose the best traffic data based on strategy
-    for uvk, traffic_list in edge_traffic_info.items():
-        
-        if TRAFFIC_STRATEGY == "nearest":
-            # ═══════════════════════════════════════════════════════════════
-            # NEAREST: Use the closest traffic point's speed ratio
-            # Logic: The sensor closest to this road knows its condition best
-            # ═══════════════════════════════════════════════════════════════
-            nearest = min(traffic_list, key=lambda x: x[0])  # x[0] = distance
-            dist, sr, decay = nearest
-            effective_sr = sr * decay + 1.0 * (1 - decay)
-            
-        elif TRAFFIC_STRATEGY == "worst":
-            # ═══════════════════════════════════════════════════════════════
-            # WORST: Use the slowest (lowest) speed ratio
-            # Logic: Conservative - assume worst case to avoid congestion
-            # ═══════════════════════════════════════════════════════════════
-            effective_sr = 1.0
-            for dist, sr, decay in traffic_list:
-                candidate_sr = sr * decay + 1.0 * (1 - decay)
-                if candidate_sr < effective_sr:
-                    effective_sr = candidate_sr
-                    
-        elif TRAFFIC_STRATEGY == "weighted_average":
-            # ═══════════════════════════════════════════════════════════════
-            # WEIGHTED AVERAGE: Blend all nearby points by inverse distance
-            # Logic: Smooth result, but can dilute strong signals
-            # ═══════════════════════════════════════════════════════════════
-            total_weight = 0.0
-            weighted_sum = 0.0
-            for dist, sr, decay in traffic_list:
-                # Weight = inverse distance (closer = higher weight)
-                weight = 1.0 / max(dist, 1.0)  # Avoid division by zero
-                candidate_sr = sr * decay + 1.0 * (1 - decay)
-                weighted_sum += candidate_sr * weight
-                total_weight += weight
-            effective_sr = weighted_sum / total_weight if total_weight > 0 else 1.0
-            
-        else:
-            # Default to nearest
-            nearest = min(traffic_list, key=lambda x: x[0])
-            dist, sr, decay = nearest
-            effective_sr = sr * decay + 1.0 * (1 - decay)
-        
-        # Apply the chosen speed ratio to this edge
-        u, v, k = uvk
-        data = G.get_edge_data(u, v, k)
-        if data:
-            _update_edge_traffic(data, effective_sr)
-            count_updated += 1
-
-    print(f"[Routing] Updated {count_updated} edges with traffic data (strategy={TRAFFIC_STRATEGY}, radius={TRAFFIC_INFLUENCE_RADIUS_M}m, {len(traffic_data)} points)")
+    influence = _get_traffic_influence(core)
+    matrix = influence.matrix([(lat, lon) for lat, lon, _ in traffic_data], TRAFFIC_INFLUENCE_RADIUS_M)
+    point_sr = np.asarray([sr for _, _, sr in traffic_data], dtype=np.float64)
+    speed_ratio = matrix.speed_ratio(point_sr, TRAFFIC_STRATEGY).astype(np.float32)
 
+    print(f"[Routing] Traffic overlay: {matrix.edge_ids.size} edges with traffic data (strategy={TRAFFIC_STRATEGY}, radius={TRAFFIC_INFLUENCE_RADIUS_M}m, {len(traffic_data)} points)")
+    return _travel_time_for_speed_ratio(core, speed_ratio)
 
-def _update_edge_traffic(data: Dict, sr: float):
-    DEFAULT_SPEED_KPH = 30.0
-    length = float(data.get("length", 100.0))
-    ff_kph = float(data.get("free_flow_kph", DEFAULT_SPEED_KPH))
 
-    data["speed_ratio"] = sr
-    data["has_traffic"] = sr < 0.8
-    data["current_speed_kph"] = ff_kph * sr
-
-    speed_mps = data["current_speed_kph"] * 1000.0 / 3600.0
-    data["travel_time"] = length / speed_mps if speed_mps > 0 else length / 8.33
+def _travel_time_for_speed_ratio(core: CompiledGraph, speed_ratio: np.ndarray) -> np.ndarray:
+    """travel_time = length / (free_flow_speed * speed_ratio), like the free-flow defaults."""
+    speed_mps = core.free_flow_kph.astype(np.float64) * speed_ratio * (1000.0 / 3600.0)
+    length = core.length.astype(np.float64)
+    tt = np.where(speed_mps > 0, length / np.where(speed_mps > 0, speed_mps, 1.0), length / 8.33)
+    return tt.astype(np.float32)
 
 
 # ---------------------------
 # Nearest nodes
 # ---------------------------
 def find_nearest_node(lat: float, lon: float) -> int:
+    core = load_core()
+    if core is not None:
+        _, idx = core.nearest_nodes(lat, lon, 1)
+        return int(core.node_ids[idx[0]])
+
     G = load_graph()
     if OSMNX_AVAILABLE:
         return int(ox.distance.nearest_nodes(G, X=lon, Y=lat))
@@ -655,224 +971,345 @@ def find_nearest_node(lat: float, lon: float) -> int:
 
 
 def find_routable_node(lat: float, lon: float, dest_node: Optional[int] = None, k: int = 30) -> int:
-    G = load_graph()
-    if not OSMNX_AVAILABLE:
+    """
+    Nearest node that has outgoing edges (and, if dest_node is given, shares its
+    strongly connected component, so a path to it is guaranteed).
+    Candidates come from the core's KD-tree, nearest first; every check is an
+    O(1) lookup in the precomputed connectivity arrays.
+    """
+    core = load_core()
+    if core is None:
         return find_nearest_node(lat, lon)
 
-    n0 = int(ox.distance.nearest_nodes(G, X=lon, Y=lat))
-    if G.out_degree(n0) > 0 and (dest_node is None or nx.has_path(G, n0, dest_node)):
-        return n0
-
-    gdf_nodes = ox.graph_to_gdfs(G, nodes=True, edges=False)
-    ys = gdf_nodes["y"].to_numpy()
-    xs = gdf_nodes["x"].to_numpy()
-    dists = [_haversine_m(lat, lon, float(y), float(x)) for y, x in zip(ys, xs)]
-    gdf_nodes = gdf_nodes.copy()
-    gdf_nodes["dist_m"] = dists
-    candidates = gdf_nodes.nsmallest(k, "dist_m")
-
-    for node_id in candidates.index.tolist():
-        nid = int(node_id)
-        if G.out_degree(nid) <= 0:
+    _, candidates = core.nearest_nodes(lat, lon, k)
+    candidates = candidates.tolist()
+    has_out = core.has_out
+    dest = core.node_index.get(int(dest_node)) if dest_node is not None else None
+
+    first_routable = None
+    for i in candidates:
+        if not has_out[i]:
             continue
-        if dest_node is not None and not nx.has_path(G, nid, dest_node):
+        if first_routable is None:
+            first_routable = i
+        if dest is not None and not core.same_component(i, dest):
             continue
-        return nid
+        return int(core.node_ids[i])
 
-    return n0
+    # No candidate in the destination's component: take the nearest node with
+    # outgoing edges and let the search decide whether a path exists.
+    return int(core.node_ids[first_routable if first_routable is not None else candidates[0]])
 
 
 # ---------------------------
 # Geometry for rendering
 # ---------------------------
-def _best_edge_key(G: nx.MultiDiGraph, u: int, v: int) -> int:
-    edict = G.get_edge_data(u, v)
-    if edict is None:
-        return 0
-    return int(min(edict.keys(), key=lambda kk: float(edict[kk].get("length", 1e18))))
+def _resolve_edge_points(u: int, v: int, k: int, G: nx.MultiDiGraph, gdf_geoms: Dict[Tuple[int, int, int], Any]) -> List[Tuple[float, float]]:
+    """(lon, lat) points of one edge: osmnx geometry, then road GeoJSON, then the straight segment."""
+    pts: List[Tuple[float, float]] = []
 
+    geom = gdf_geoms.get((u, v, k))
+    if geom is not None:
+        try:
+            pts = list(geom.coords)
+        except Exception:
+            pts = []
 
-def _route_nodes_to_edges(route_nodes: List[int], G: nx.MultiDiGraph) -> List[Tuple[int, int, int]]:
-    edges = []
-    for a, b in zip(route_nodes[:-1], route_nodes[1:]):
-        k = _best_edge_key(G, int(a), int(b))
-        edges.append((int(a), int(b), int(k)))
-    return edges
+    if not pts:
+        try:
+            pts = _edge_geometry_points_from_geojson(u, v, k, G)
+        except FileNotFoundError:
+            pts = []  # no road GeoJSON either ("straight" geometry source)
 
+    if not pts:
+        udata = G.nodes[u]
+        vdata = G.nodes[v]
+        pts = [
+            (float(udata.get("x")), float(udata.get("y"))),
+            (float(vdata.get("x")), float(vdata.get("y"))),
+        ]
+    return pts
 
-def _edges_to_linestring_coords_lonlat(edges: List[Tuple[int, int, int]], G: nx.MultiDiGraph) -> List[List[float]]:
-    coords: List[Tuple[float, float]] = []
-    gdf_edges = _ensure_gdf_edges()
 
-    for i, (u, v, k) in enumerate(edges):
-        pts: List[Tuple[float, float]] = []
+def _geometry_source_key() -> str:
+    """Which geometry source the store was built from; a different source means a rebuild."""
+    if OSMNX_AVAILABLE:
+        return "osmnx"
+    try:
+        h = hashlib.sha1()
+        with open(_pick_roads_geojson_path(), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return f"geojson:{h.hexdigest()}"
+    except FileNotFoundError:
+        return "straight"
 
-        if gdf_edges is not None:
-            try:
-                geom = gdf_edges.loc[(u, v, k)].geometry
-                if geom is not None:
-                    pts = list(geom.coords)
-            except Exception:
-                pts = []
 
-        if not pts:
-            pts = _edge_geometry_points_from_geojson(u, v, k, G)
+def load_edge_geometry() -> Optional[EdgeGeometry]:
+    """
+    Flat per-edge polylines for rendering, memory-mapped from
+    <graph stem>.geom.npy (offsets + key in <graph stem>.geom.npz).
+    Built once from the networkx graph when missing or stale; the
+    GeoDataFrame / road GeoJSON used to build it are released afterwards.
+    """
+    global _edge_geom, _gdf_edges, _roads_by_osmid
+    if _edge_geom is not None:
+        return _edge_geom
+    core = load_core()
+    if core is None:
+        return None
 
-        if not pts:
-            udata = G.nodes[u]
-            vdata = G.nodes[v]
-            pts = [
-                (float(udata.get("x")), float(udata.get("y"))),
-                (float(vdata.get("x")), float(vdata.get("y"))),
-            ]
+    with _edge_geom_lock:
+        if _edge_geom is not None:
+            return _edge_geom
 
-        if i == 0:
-            coords.extend(pts)
-        else:
-            if coords and pts and coords[-1] == pts[0]:
-                coords.extend(pts[1:])
-            else:
-                coords.extend(pts)
+        t0 = time.perf_counter()
+        meta_path = _graph_artifact_path("geom.npz")
+        coords_path = _graph_artifact_path("geom.npy")
+        graph_hash = _graph_file_hash()
+        source = _geometry_source_key()
+
+        if meta_path.exists() and coords_path.exists():
+            try:
+                with np.load(meta_path) as meta:
+                    if str(meta["graph_hash"]) == graph_hash and str(meta["source"]) == source:
+                        ptr = meta["ptr"]
+                        coords = np.load(coords_path, mmap_mode="r")
+                        if ptr.shape[0] == core.n_edges + 1 and coords.shape[0] == int(ptr[-1]):
+                            _edge_geom = EdgeGeometry(coords, ptr)
+                            print(f"[Routing] Memory-mapped edge geometry from {coords_path.name}: "
+                                  f"{_edge_geom.n_points} points in {time.perf_counter() - t0:.3f}s")
+                            return _edge_geom
+                    print(f"[Routing] Ignoring stale {meta_path.name} (graph or geometry source changed)")
+            except Exception as e:
+                print(f"[Routing] Ignoring unreadable {meta_path.name}: {e}")
 
-    return [[float(lon), float(lat)] for lon, lat in coords]
+        G = load_graph()
+        had_gdf = _gdf_edges is not None
+        gdf_edges = _ensure_gdf_edges()
+        gdf_geoms: Dict[Tuple[int, int, int], Any] = {}
+        if gdf_edges is not None:
+            gdf_geoms = dict(zip(gdf_edges.index, gdf_edges.geometry))
+
+        geom = EdgeGeometry.from_edge_points(
+            _resolve_edge_points(*core.edge_uvk(eid), G, gdf_geoms) for eid in range(core.n_edges)
+        )
+        print(f"[Routing] Edge geometry flattened: {geom.n_points} points for {geom.n_edges} edges "
+              f"in {time.perf_counter() - t0:.2f}s")
+
+        try:
+            tmp = coords_path.with_name(coords_path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, geom.coords)
+            tmp.replace(coords_path)
+            _save_npz_atomic(meta_path, graph_hash=np.array(graph_hash), source=np.array(source), ptr=geom.ptr)
+            geom = EdgeGeometry(np.load(coords_path, mmap_mode="r"), geom.ptr)
+        except OSError as e:
+            print(f"[Routing] Could not persist edge geometry: {e}")
+
+        # Rendering no longer needs these; the flood join rebuilds the GeoDataFrame on demand
+        _roads_by_osmid = None
+        if not had_gdf:
+            _gdf_edges = None
+        _edge_geom = geom
+    return _edge_geom
 
 
 # ---------------------------
 # FLOOD: fast intersection + caching
 # ---------------------------
-def _flood_file_for_index(flood_idx: int) -> Optional[Path]:
+def get_flood_cells(wait: bool = False) -> Optional[FloodCells]:
+    """
+    Flood cell store of web/data/GEOCODED (ingested in the background once,
+    again when the files change). None until the first ingestion finishes,
+    unless wait=True.
+    """
     flood_dir = PROJECT_ROOT / "web" / "data" / "GEOCODED"
-    files = sorted(flood_dir.glob("D*.geojson"))
-    if not files:
+    return load_flood_cells(flood_dir, FLOOD_CELLS_DIR, FLOOD_PRECOMPUTE_WORKERS, progress=_report_ingest, wait=wait)
+
+
+def _report_ingest(done: int, total: int, resumed: int) -> None:
+    """Flood file ingestion progress, reported as the "ingest" phase of _flood_progress."""
+    global _flood_progress
+    with _flood_lock:
+        if _flood_progress.get("phase") != "ingest" or _flood_progress["state"] != "running":
+            _flood_progress = {"state": "running", "phase": "ingest", "total": total, "done": done,
+                               "resumed": resumed, "failed": 0, "started_at": time.time()}
+        _flood_progress["done"] = done
+        if done >= total:
+            _flood_progress["state"] = "done"
+
+
+def _flood_edges() -> Optional[LineIndex]:
+    """STRtree over the edge LineStrings by dense id, built once from the edge geometry store."""
+    global _flood_edge_index
+    with _flood_edges_lock:
+        if _flood_edge_index is None:
+            geom = load_edge_geometry()
+            if geom is None:
+                return None
+            _flood_edge_index = LineIndex.from_edge_geometry(geom.coords, geom.ptr)
+        return _flood_edge_index
+
+
+def _flood_cell_edge_pairs(cells: FloodCells) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(cell, dense edge id) pairs of every flood cell intersecting an edge, once per store version."""
+    global _flood_cell_edges
+    index = _flood_edges()
+    if index is None:
         return None
-    if 0 <= flood_idx < len(files):
-        return files[flood_idx]
-    # fallback
-    return files[0]
+    with _flood_edges_lock:
+        if _flood_cell_edges is None or _flood_cell_edges[0] != cells.version:
+            t0 = time.perf_counter()
+            pairs = cell_pairs(cells, index)
+            _flood_cell_edges = (cells.version, pairs)
+            print(f"[Routing] Flood cells -> edges: {len(pairs[0])} intersections over {cells.n_cells} cells "
+                  f"in {time.perf_counter() - t0:.2f}s")
+        return _flood_cell_edges[1]
 
 
-def _detect_depth_column(gdf: "gpd.GeoDataFrame") -> Optional[str]:
-    for col in ["depth", "flood_depth", "water_depth", "wd"]:
-        if col in gdf.columns:
-            return col
-    return None
+def _record_flood_meta(flood_idx: int, flood_name: str, meta: Dict[str, Any]) -> None:
+    _flood_meta_cache[flood_idx] = dict(meta, flood_file=flood_name)
 
 
-def _compute_flooded_edges_set(flood_idx: int) -> Set[Tuple[int, int, int]]:
+def _compute_flood_mask(core: CompiledGraph, flood_idx: int, cells: Optional[FloodCells]) -> np.ndarray:
     """
-    Compute once using GeoPandas sjoin (spatial index).
-    Returns set of edge keys (u,v,k) that intersect flooded polygons.
+    Thresholds the flood cell depths of flood_idx (FLOOD_DEPTH_THRESHOLD_M)
+    and marks the edges of the flooded cells through the cell -> edge pairs.
+    Returns a boolean mask over dense edge ids of edges that intersect flooded cells.
     """
-    if not GEOPANDAS_OK or not OSMNX_AVAILABLE:
-        return set()
+    flooded_mask = np.zeros(core.n_edges, dtype=bool)
+    if not GEOPANDAS_OK:
+        return flooded_mask
 
-    gdf_edges = _ensure_gdf_edges()
-    if gdf_edges is None or gdf_edges.empty:
-        return set()
+    if cells is None or cells.n_times == 0:
+        return flooded_mask
+    if not 0 <= flood_idx < cells.n_times:
+        flood_idx = 0  # fallback
 
-    flood_path = _flood_file_for_index(flood_idx)
-    if not flood_path or not flood_path.exists():
-        return set()
+    pairs = _flood_cell_edge_pairs(cells)
+    if pairs is None:
+        return flooded_mask
 
     t0 = time.perf_counter()
-    flood_gdf = gpd.read_file(flood_path)
-    if flood_gdf.empty:
-        return set()
-
-    # keep only polygons (your files are polygons)
-    flood_gdf = flood_gdf[flood_gdf.geometry.notnull() & ~flood_gdf.geometry.is_empty].copy()
-    if flood_gdf.empty:
-        return set()
-
-    depth_col = _detect_depth_column(flood_gdf)
-    if depth_col:
-        try:
-            flood_gdf = flood_gdf[flood_gdf[depth_col] > FLOOD_DEPTH_THRESHOLD_M].copy()
-        except Exception:
-            pass
-    if flood_gdf.empty:
-        return set()
-
-    # CRS normalize
-    if gdf_edges.crs is None:
-        gdf_edges = gdf_edges.set_crs("EPSG:4326")
-    if flood_gdf.crs is None:
-        flood_gdf = flood_gdf.set_crs("EPSG:4326")
-    if flood_gdf.crs != gdf_edges.crs:
-        flood_gdf = flood_gdf.to_crs(gdf_edges.crs)
-
-    # OPTIMIZATION: Filter edges by total flood bounds first
-    # This prevents checking 100k edges against polygons if they are far away
-    try:
-        bounds = flood_gdf.total_bounds # [minx, miny, maxx, maxy]
-        minx, miny, maxx, maxy = bounds
-        # Use cx indexer for fast bbox filtering
-        candidates = gdf_edges.cx[minx:maxx, miny:maxy]
-    except Exception as e:
-        print(f"[Routing] BBox filter failed ({e}), using all edges")
-        candidates = gdf_edges
-
-    if candidates.empty:
-         return set()
-
-    # Keep only needed columns
-    edges_geom = candidates[["geometry"]].copy()
-
-    # Spatial join: edges that intersect flood polygons
-    joined = gpd.GeoDataFrame()
+    cell_mask = cells.flooded(flood_idx, FLOOD_DEPTH_THRESHOLD_M)
+    flooded_mask[lines_of(pairs, cell_mask)] = True
+    meta = {
+        "cells_present": int(cells.present(flood_idx).sum()),
+        "cells_flooded": int(cell_mask.sum()),
+        "edges_flooded": int(flooded_mask.sum()),
+        "seconds": round(time.perf_counter() - t0, 4),
+    }
+    _record_flood_meta(flood_idx, cells.names[flood_idx], meta)
+    print(f"[Routing] Flood mask idx={flood_idx} flooded_edges={meta['edges_flooded']} "
+          f"({meta['cells_flooded']}/{meta['cells_present']} cells > {FLOOD_DEPTH_THRESHOLD_M} m, {cells.names[flood_idx]})")
+    return flooded_mask
+
+
+def _flood_store(core: CompiledGraph, cells: Optional[FloodCells]) -> FloodBitmaps:
+    """Flood bitmaps of `cells`, reopened when the graph, the cell store version or the threshold changes."""
+    global _flood_bitmaps
+    source = _flood_source_key(cells)
+    with _flood_lock:
+        if _flood_bitmaps is None or _flood_bitmaps.n_edges != core.n_edges or _flood_bitmaps.source != source:
+            if _flood_bitmaps is not None:
+                print("[Routing] Flood cells or depth threshold changed, reopening the flood cache")
+                _flood_meta_cache.clear()
+            _flood_bitmaps = _open_flood_store(core, cells)
+        return _flood_bitmaps
+
+
+def _get_flood_mask(core: CompiledGraph, flood_idx: int) -> Tuple[np.ndarray, str]:
+    """
+    Flooded flag per dense edge at flood_idx, computed from the flood cell
+    store on first use, and the flood source key it was computed from.
+    Raises FloodCellsNotReady while the flood files are first ingested.
+    """
+    cells = get_flood_cells()
+    if cells is None and is_ingesting():
+        raise FloodCellsNotReady("Flood data is still loading, retry shortly")
+    store = _flood_store(core, cells)
+    if store.n_slots == 0:
+        return np.zeros(core.n_edges, dtype=bool), store.source
+    if not 0 <= flood_idx < store.n_slots:
+        flood_idx = 0  # same fallback as _compute_flood_mask
+    if not store.has(flood_idx):
+        _store_flood_mask(store, flood_idx, _compute_flood_mask(core, flood_idx, cells))
+    return store.mask(flood_idx), store.source
+
+
+def get_flood_precompute_progress() -> Dict[str, Any]:
+    """
+    done/total of the running (or last) phase of the flood pre-computation:
+    "ingest" (flood files into the cell store) or "masks" (timestamps), with
+    an ETA from the items computed in this run (resumed ones cost nothing).
+    """
+    with _flood_lock:
+        progress = dict(_flood_progress)
+    started = progress.pop("started_at", None)
+    if started is not None:
+        elapsed = time.time() - started
+        progress["elapsed_s"] = round(elapsed, 1)
+        computed = progress["done"] - progress["resumed"]
+        if progress["state"] == "running" and computed > 0:
+            progress["eta_s"] = round(elapsed / computed * (progress["total"] - progress["done"]), 1)
+    return progress
+
+
+def _run_flood_jobs(
+    core: CompiledGraph, cells: FloodCells, store: FloodBitmaps, jobs: List[int], resumed: int
+) -> None:
+    """
+    Compute the missing timestamps from the flood cell store in flood index
+    order, persisting each one. A FloodTimeline carries the per-edge flooded
+    cell counts from one timestamp to the next, so each step only looks up
+    the edges of the cells that started or stopped being flooded.
+    """
+    global _flood_progress
+    with _flood_lock:
+        _flood_progress = {"state": "running", "phase": "masks", "total": len(jobs) + resumed, "done": resumed,
+                           "resumed": resumed, "failed": 0, "started_at": time.time()}
+
+    print(f"[Routing] Computing {len(jobs)} flood timestamps...")
+    pairs = _flood_cell_edge_pairs(cells) if GEOPANDAS_OK else None
+    timeline = FloodTimeline(cells, pairs, core.n_edges, FLOOD_DEPTH_THRESHOLD_M) if pairs is not None else None
+    state = "failed"
     try:
-        joined = gpd.sjoin(edges_geom, flood_gdf[["geometry"]], how="inner", predicate="intersects")
-    except Exception as e:
-        print(f"[Routing] ERROR in sjoin: {e}")
-        return set()
-
-    flooded: Set[Tuple[int, int, int]] = set()
-    if not joined.empty:
-        # joined index is MultiIndex (u,v,k)
-        for idx in joined.index:
+        for flood_idx in sorted(jobs):
             try:
-                # Handle cases where index might be simple or multi
-                if isinstance(idx, tuple) and len(idx) >= 3:
-                    u, v, k = idx[:3]
+                if timeline is None:
+                    mask = _compute_flood_mask(core, flood_idx, cells)
                 else:
-                    # sometimes reset_index might be needed if sjoin behaves differently
-                    continue
-                flooded.add((int(u), int(v), int(k)))
-            except Exception:
-                continue
-
-    dt = time.perf_counter() - t0
-    _flood_meta_cache[flood_idx] = {
-        "flood_file": flood_path.name,
-        "polygons_used": int(len(flood_gdf)),
-        "edges_flooded": int(len(flooded)),
-        "seconds": round(dt, 3),
-    }
-    print(f"[Routing] Flood cache build idx={flood_idx} flooded_edges={len(flooded)} in {dt:.2f}s ({flood_path.name})")
-    return flooded
-
-
-def _get_flooded_edges_set(flood_idx: int) -> Set[Tuple[int, int, int]]:
-    if flood_idx in _flood_edge_cache:
-        return _flood_edge_cache[flood_idx]
-    flooded = _compute_flooded_edges_set(flood_idx)
-    _flood_edge_cache[flood_idx] = flooded
-    return flooded
+                    mask, meta = timeline.advance(flood_idx)
+                    meta["edges_flooded"] = meta.pop("lines_flooded")
+                    _record_flood_meta(flood_idx, cells.names[flood_idx], meta)
+                _store_flood_mask(store, flood_idx, mask)
+            except Exception as e:
+                print(f"[Routing] ✗ Flood idx={flood_idx} failed: {e}")
+                with _flood_lock:
+                    _flood_progress["failed"] += 1
+            with _flood_lock:
+                _flood_progress["done"] += 1
+        state = "done"
+    finally:
+        with _flood_lock:
+            _flood_progress["state"] = state
 
 
 def precompute_all_flood_data():
     """
     Called at startup to load all flood data into memory.
-    OPTIMIZED: First tries to load from disk cache, skipping expensive computation.
+    The flood files are ingested into the flood cell store first (on a
+    process pool, only when they changed), each file persisted as it is read;
+    then the timestamps missing from the memory-mapped flood cache are
+    thresholded from the cell store and persisted one by one. Both phases
+    resume where a crash or restart left off and report progress through
+    get_flood_precompute_progress.
     """
-    # TRY TO LOAD FROM DISK FIRST (instant startup!)
-    if load_flood_cache_from_disk():
-        print("[Cache] ✓ Using cached flood data - skipping computation!")
-        # Also try to load route cache
-        load_route_cache_from_disk()
-        return  # Done! No need to compute
+    # Ingest / memory-map the flood cells and what earlier runs computed, and open the route store
+    load_flood_cache_from_disk()
+    load_route_cache_from_disk()
     
-    print("[Routing] Computing flood intersections (this will be saved to disk)...")
     flood_dir = PROJECT_ROOT / "web" / "data" / "GEOCODED"
     traffic_dir = PROJECT_ROOT / "collector" / "outputs" / "traffic_snapshots"
     
@@ -896,15 +1333,17 @@ def precompute_all_flood_data():
     
     print(f"[Routing] Found {len(traffic_timestamps)} traffic snapshots.")
     
-    flood_files = sorted(flood_dir.glob("D*.geojson"))
+    cells = get_flood_cells(wait=True)
+    flood_files = [flood_dir / name for name in cells.names] if cells is not None else []
     print(f"[Routing] Found {len(flood_files)} potential flood files.")
     
-    # Ensure graph & gdf_edges loaded
-    load_graph()
-    if OSMNX_AVAILABLE:
-        _ensure_gdf_edges()
+    core = load_core()
+    if core is None:
+        print("[Routing] Routing core unavailable, skipping pre-compute.")
+        return
+    store = _flood_store(core, cells)
 
-    cached_count = 0
+    selected: List[int] = []
     skipped_count = 0
 
     for i, f_file in enumerate(flood_files):
@@ -988,49 +1427,210 @@ def precompute_all_flood_data():
             print(f"[Routing] Failed to parse flood timestamp from {f_file.name}: {e}")
             
         # FALLBACK: Cache index 0 only if NO other files were cached yet
-        if i == 0 and not should_cache and cached_count == 0:
+        if i == 0 and not should_cache and not selected:
             print(f"[Routing] ⚠️ WARNING: Caching index 0 as fallback (NO traffic match!)")
             should_cache = True
 
         if should_cache:
-            _get_flooded_edges_set(i)
-            cached_count += 1
+            selected.append(i)
         else:
             skipped_count += 1
+
+    jobs = [i for i in selected if not store.has(i)]
+    resumed = len(selected) - len(jobs)
+    if not selected:
+        print(f"[Routing] No flood timestamps to pre-compute (Skipped {skipped_count} unmatched).")
+        return
+    if not jobs:
+        print(f"[Cache] ✓ Using cached flood data for all {resumed} timestamps - skipping computation!")
+        return
+    if resumed:
+        print(f"[Routing] Resuming flood pre-computation: {resumed}/{len(selected)} timestamps already on disk")
+    _run_flood_jobs(core, cells, store, jobs, resumed)
         
-    print(f"[Routing] Pre-computation complete. Cached {cached_count} timestamps (Skipped {skipped_count} unmatched).")
-    
-    # SAVE TO DISK for next startup (instant load!)
+    print(f"[Routing] Pre-computation complete. Cached {len(selected)} timestamps (Skipped {skipped_count} unmatched).")
     save_flood_cache_to_disk()
 
 
-def _apply_flood_costs(G: nx.MultiDiGraph, flooded_edges: Set[Tuple[int, int, int]]) -> None:
+# ---------------------------
+# Weight overlays
+# ---------------------------
+def resolve_route_weights(
+    core: CompiledGraph,
+    route_type: str,
+    flood_idx: int,
+    traffic: Optional[Tuple[str, List[Dict]]] = None,
+    publish: bool = True,
+) -> Dict[str, Any]:
     """
-    IMPORTANT: do not scan all edges with geometry checks.
-    Just set cost fields and then add penalty only for flooded edges.
+    Select the read-only weight overlays for one request.
+    Each overlay is built once per version key, (traffic snapshot id, flood index,
+    flood source key), and then shared by every request for that version, so a
+    request never writes weights another request is routing on.
+
+    Returns dict with:
+      cost:        per-edge search cost for route_type
+      travel_time: per-edge travel time used for the ETA
+      flood_mask:  per-edge flooded flags (None for route types that ignore flood)
+      version:     (traffic snapshot id or None, flood index or None)
+      bound_scale: A* lower-bound factor per great-circle metre for this cost
+      cost_key:    overlay version key of `cost` (keys CCH customizations)
+
+    `traffic` is an already loaded (version, points) snapshot; by default the
+    latest snapshot is read. With publish=False, flood overlays that are not
+    already shared are built for this call only, so batch callers (hotspot
+    refresh) do not evict the overlays live requests are using.
     """
-    # Base costs for all edges (cheap attributes only)
-    for u, v, k, data in G.edges(keys=True, data=True):
-        length = float(data.get("length", 100.0))
-        tt = float(data.get("travel_time", length / 8.33))
-        data["is_flooded"] = False
-        data["flood_cost"] = length
-        data["smart_cost"] = tt
-
-    # Apply penalty only to flooded edges
-    for (u, v, k) in flooded_edges:
-        data = G.get_edge_data(u, v, k)
-        if not data:
-            continue
-        # networkx returns dict for multi-edge
-        if isinstance(data, dict) and "length" not in data:
-            # data is keyed by k
-            data = data.get(k, {})
-        length = float(data.get("length", 100.0))
-        tt = float(data.get("travel_time", length / 8.33))
-        data["is_flooded"] = True
-        data["flood_cost"] = length + FLOOD_PENALTY
-        data["smart_cost"] = tt + FLOOD_PENALTY
+
+    def overlay(key, builder):
+        if publish:
+            return _overlays.get(key, builder)
+        arr = _overlays.peek(key)
+        return arr if arr is not None else builder()
+
+    t0 = time.perf_counter()
+    traffic_version = None
+    traffic_key = None
+    travel_time = core.travel_time
+    if route_type in TRAFFIC_ROUTE_TYPES:
+        traffic_version, traffic_points = traffic if traffic is not None else load_traffic_snapshot_versioned()
+        # Strategy / radius are part of the key so changing them re-derives the overlay
+        traffic_key = (traffic_version, TRAFFIC_STRATEGY, TRAFFIC_INFLUENCE_RADIUS_M)
+        travel_time = _overlays.get(
+            ("travel_time",) + traffic_key,
+            lambda: compute_traffic_travel_times(core, traffic_points),
+        )
+    t_traffic = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    flood_mask = None
+    flood_key = None
+    if route_type in ("flood_avoid", "smart"):
+        # Resolve the bitmap before taking the overlay lock (may threshold the cell store)
+        flooded, flood_source = _get_flood_mask(core, flood_idx)
+        # Flood cell store version + threshold of that bitmap, so persisted routes never outlive them
+        flood_key = (flood_idx, flood_source)
+        flood_mask = overlay(("flood_mask",) + flood_key, lambda: flooded)
+    else:
+        flood_idx = None
+
+    penalty = np.float32(FLOOD_PENALTY)
+    if route_type == "Fastest":
+        cost_key = ("travel_time",) + traffic_key
+        cost = travel_time
+    elif route_type == "flood_avoid":
+        cost_key = ("flood_cost",) + flood_key
+        cost = overlay(cost_key, lambda: core.length + penalty * flood_mask)
+    elif route_type == "smart":
+        cost_key = ("smart_cost", traffic_key) + flood_key
+        cost = overlay(cost_key, lambda: travel_time + penalty * flood_mask)
+    else:
+        cost_key = ("length",)
+        cost = core.length
+    t_flood = time.perf_counter() - t1
+
+    return {
+        "cost": cost,
+        "travel_time": travel_time,
+        "flood_mask": flood_mask,
+        "version": (traffic_version, flood_idx),
+        # Flood penalties only add cost, so the travel-time / length bounds still hold
+        "bound_scale": core.time_bound_scale if route_type in TRAFFIC_ROUTE_TYPES else core.length_bound_scale,
+        "cost_key": cost_key,
+        "seconds": {"traffic": t_traffic, "flood": t_flood},
+    }
+
+
+def _nx_overlay_weight(cost: np.ndarray):
+    """networkx weight callable reading a dense-edge-id overlay (via the `_eid` edge attribute)."""
+    def weight(u, v, edict):
+        return min(float(cost[d["_eid"]]) for d in edict.values())
+    return weight
+
+
+def _route_nodes_to_edge_ids(route_nodes: List[int], G: nx.MultiDiGraph, cost: np.ndarray) -> List[int]:
+    """Dense edge ids along a node path, taking the cheapest parallel edge under `cost`."""
+    edge_ids = []
+    for a, b in zip(route_nodes[:-1], route_nodes[1:]):
+        edict = G.get_edge_data(a, b)
+        edge_ids.append(min((d["_eid"] for d in edict.values()), key=lambda e: float(cost[e])))
+    return edge_ids
+
+
+ROUTE_TYPES = ("shortest", "Fastest", "flood_avoid", "smart")
+
+
+# ---------------------------
+# Two-level route cache
+# ---------------------------
+# Level 1: rounded coordinates -> snapped node. Depends only on the graph, so
+#          it is shared by every route type.
+# Level 2: (origin node, dest node, overlay cost_key) -> path edge ids, in the
+#          RouteCache. The cost key carries the traffic snapshot / flood index;
+#          summaries and geometry are rendered from the path on every hit, so
+#          nearby clicks that snap to the same nodes reuse one search.
+def _parse_flood_idx(flood_time: Optional[str]) -> int:
+    try:
+        return int(flood_time) if flood_time is not None else 0
+    except Exception:
+        return 0
+
+
+def _snap_cached(lat: float, lon: float, dest_node: Optional[int], k: int) -> int:
+    key = (round(lat, 5), round(lon, 5), dest_node, k)
+    with _snap_lock:
+        node = _snap_cache.get(key)
+        if node is not None:
+            _snap_cache.move_to_end(key)
+            _snap_stats["hits"] += 1
+            return node
+        _snap_stats["misses"] += 1
+
+    node = find_routable_node(lat, lon, dest_node=dest_node, k=k)
+    with _snap_lock:
+        _snap_cache[key] = node
+        while len(_snap_cache) > SNAP_CACHE_SIZE:
+            _snap_cache.popitem(last=False)
+    return node
+
+
+def snap_endpoints(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float) -> Tuple[int, int]:
+    """(origin node, dest node); the origin is snapped into the destination's component."""
+    dest_node = _snap_cached(dest_lat, dest_lon, None, 30)
+    origin_node = _snap_cached(origin_lat, origin_lon, dest_node, 40)
+    return origin_node, dest_node
+
+
+def _path_cache_lookup(cache_key) -> Optional[Dict[str, Any]]:
+    record = _route_cache.get(cache_key)
+    stats = _route_cache.stats()
+    if record is not None:
+        print(f"[Cache HIT] Returning cached route (hit rate: {stats['hit_rate_percent']:.1f}%, cache size: {stats['entries']})")
+        return record
+
+    # Memory miss: fall through to the disk tier and promote what it has
+    store = load_route_store()
+    hit = store.get(cache_key) if store is not None else None
+    if hit is not None:
+        record, route_type, ttl_left = hit
+        _route_cache.put(cache_key, record, route_type, ttl_s=ttl_left)
+        print(f"[Cache DISK HIT] Promoted route from disk (cache size: {len(_route_cache)})")
+        return record
+    print(f"[Cache MISS] Calculating new route (cache size: {stats['entries']})")
+    return None
+
+
+def _path_cache_store(cache_key, record: Dict[str, Any], route_type: str) -> None:
+    evicted = _route_cache.put(cache_key, record, route_type)
+    if evicted:
+        print(f"[Cache] Evicted {evicted} least recently used route(s)")
+    store = load_route_store()
+    if store is not None:
+        try:
+            store.put(cache_key, record, route_type, _route_cache.ttl_for(route_type))
+        except Exception as e:
+            print(f"[Cache] ✗ Failed to write route to disk: {e}")
+    print(f"[Cache] Stored new route (cache size: {len(_route_cache)})")
 
 
 # ---------------------------
@@ -1050,137 +1650,242 @@ def find_route(
       - Fastest:      minimize travel_time (traffic)
       - flood_avoid:  minimize flood_cost (length + penalty on flooded)
       - smart:        minimize smart_cost (travel_time + penalty on flooded)
+
+    Raises FloodCellsNotReady for flood_avoid / smart while the flood files
+    are first ingested.
     """
-    # PROGRESSIVE CACHE: Check if we've calculated this exact route before
-    try:
-        flood_idx = int(flood_time) if flood_time is not None else 0
-    except Exception:
-        flood_idx = 0
-    
-    # Create cache key (round coords to avoid float precision issues)
-    cache_key = (
-        round(origin_lat, 5),
-        round(origin_lon, 5),
-        round(dest_lat, 5),
-        round(dest_lon, 5),
-        flood_idx,
-        route_type
-    )
-    
-    # Check cache first
-    if cache_key in _route_cache:
-        _route_cache_stats["hits"] += 1
-        hit_rate = (_route_cache_stats["hits"] / (_route_cache_stats["hits"] + _route_cache_stats["misses"])) * 100
-        print(f"[Cache HIT] Returning cached route (hit rate: {hit_rate:.1f}%, cache size: {len(_route_cache)})")
-        return _route_cache[cache_key]
-    
-    # Cache MISS - calculate the route
-    _route_cache_stats["misses"] += 1
-    print(f"[Cache MISS] Calculating new route (cache size: {len(_route_cache)})")
-    
     t_start = time.perf_counter()
-    G = load_graph()
+    core = load_core()
+    if core is None:
+        return {"type": "FeatureCollection", "features": [], "error": "Routing core unavailable"}
 
-    # 1) Traffic - SKIP for "shortest" route (only needs length attribute)
-    t0 = time.perf_counter()
-    t_traffic = 0.0
-    if route_type in ("Fastest", "smart"):
-        traffic_points = load_traffic_snapshot()
-        apply_traffic_data(G, traffic_points)
-        t_traffic = time.perf_counter() - t0
+    # 1-2) Traffic and flood weights: select the shared read-only overlays
+    #      for this (traffic snapshot, flood index) version
+    flood_idx = _parse_flood_idx(flood_time)
+    weights = resolve_route_weights(core, route_type, flood_idx)
 
-    flooded_edges: Set[Tuple[int, int, int]] = set()
-    t_flood = 0.0
+    # 3) Nodes (level-1 cache)
+    origin_node, dest_node = snap_endpoints(origin_lat, origin_lon, dest_lat, dest_lon)
 
-    # 2) Flood costs only if needed
-    if route_type in ("flood_avoid", "smart"):
-        t1 = time.perf_counter()
-        try:
-            flood_idx = int(flood_time) if flood_time is not None else 0
-        except Exception:
-            flood_idx = 0
+    if origin_node == dest_node:
+        return {"type": "FeatureCollection", "features": [], "error": "Origin and destination are the same"}
 
-        flooded_edges = _get_flooded_edges_set(flood_idx)
-        _apply_flood_costs(G, flooded_edges)
-        t_flood = time.perf_counter() - t1
-        
-        # DEBUG: Log flood info
-        print(f"[Flood Debug] route_type={route_type}, flood_idx={flood_idx}")
-        print(f"[Flood Debug] Total flooded edges: {len(flooded_edges)}")
-        if flooded_edges:
-            sample = list(flooded_edges)[:5]
-            print(f"[Flood Debug] Sample flooded edges: {sample}")
+    # 4-6) Path (level-2 cache) + rendering
+    return _route_between(core, route_type, weights, origin_node, dest_node, flood_time, t_start)
 
-    # 3) Nodes
-    dest_node = find_routable_node(dest_lat, dest_lon, dest_node=None, k=30)
-    origin_node = find_routable_node(origin_lat, origin_lon, dest_node=dest_node, k=40)
 
-    if origin_node == dest_node:
-        return {"type": "FeatureCollection", "features": [], "error": "Origin and destination are the same"}
+def compare_routes(
+    origin_lat: float,
+    origin_lon: float,
+    dest_lat: float,
+    dest_lon: float,
+    flood_time: Optional[str] = None,
+    route_types: Tuple[str, ...] = ROUTE_TYPES,
+) -> Dict[str, Any]:
+    """
+    Every route type for one origin/destination in a single call.
+    Endpoints are snapped once and the traffic snapshot is read once; the
+    traffic and flood overlays are shared between the route types that use
+    them. Each path goes into the route cache under its own key, so later
+    single-type find_route() calls for the same trip are cache hits.
+
+    Returns {"routes": {route_type: FeatureCollection}, "summary": [...],
+             "best_eta_route_type", "flood_time", "debug_seconds"}.
+    """
+    t_start = time.perf_counter()
+    flood_idx = _parse_flood_idx(flood_time)
+
+    routes: Dict[str, Dict[str, Any]] = {}
+    t_snap = 0.0
+    core = load_core()
+    if core is None:
+        for route_type in route_types:
+            routes[route_type] = {"type": "FeatureCollection", "features": [], "error": "Routing core unavailable"}
+    else:
+        t0 = time.perf_counter()
+        origin_node, dest_node = snap_endpoints(origin_lat, origin_lon, dest_lat, dest_lon)
+        t_snap = time.perf_counter() - t0
+
+        # One snapshot for every traffic-aware type, even if the collector writes meanwhile
+        traffic = load_traffic_snapshot_versioned()
+        for route_type in route_types:
+            t_type = time.perf_counter()
+            try:
+                weights = resolve_route_weights(core, route_type, flood_idx, traffic=traffic)
+            except FloodCellsNotReady as e:
+                routes[route_type] = {"type": "FeatureCollection", "features": [], "error": str(e)}
+                continue
+            if origin_node == dest_node:
+                routes[route_type] = {"type": "FeatureCollection", "features": [], "error": "Origin and destination are the same"}
+            else:
+                routes[route_type] = _route_between(core, route_type, weights, origin_node, dest_node, flood_time, t_type)
+
+    summary = []
+    best_type, best_eta = None, float("inf")
+    for route_type in route_types:
+        result = routes[route_type]
+        props = result.get("properties") or {}
+        row = {
+            "route_type": route_type,
+            "distance_m": props.get("distance_m"),
+            "eta_s": props.get("eta_s"),
+            "has_flood": props.get("has_flood"),
+            "flooded_distance_m": props.get("flooded_distance_m"),
+            "num_edges": props.get("num_edges"),
+            "cached": (props.get("debug_seconds") or {}).get("cache") == "hit",
+            "error": result.get("error"),
+        }
+        summary.append(row)
+        if not row["error"] and row["eta_s"] is not None and row["eta_s"] < best_eta:
+            best_type, best_eta = route_type, row["eta_s"]
 
-    # 4) Weight
-    if route_type == "Fastest":
-        weight = "travel_time"
-    elif route_type == "flood_avoid":
-        weight = "flood_cost"
-    elif route_type == "smart":
-        weight = "smart_cost"
+    return {
+        "routes": routes,
+        "summary": summary,
+        "best_eta_route_type": best_type,
+        "flood_time": flood_time,
+        "debug_seconds": {
+            "snap": round(t_snap, 3),
+            "total": round(time.perf_counter() - t_start, 3),
+        },
+    }
+
+
+def _route_between(
+    core: CompiledGraph,
+    route_type: str,
+    weights: Dict[str, Any],
+    origin_node: int,
+    dest_node: int,
+    flood_time: Optional[str],
+    t_start: float,
+) -> Dict[str, Any]:
+    """Cached or freshly searched path between snapped nodes, rendered as a FeatureCollection."""
+    cache_key = (int(origin_node), int(dest_node), weights["cost_key"])
+    record = _path_cache_lookup(cache_key)
+    t_path = 0.0
+    if record is None:
+        t2 = time.perf_counter()
+        record = _search_path(core, route_type, weights, origin_node, dest_node)
+        t_path = time.perf_counter() - t2
+        if record.get("error"):
+            return {"type": "FeatureCollection", "features": [], "error": record["error"]}
+        _path_cache_store(cache_key, record, route_type)
+        cache_state = "miss"
     else:
-        weight = "length"
+        cache_state = "hit"
+    return _render_route(core, route_type, weights, record, origin_node, dest_node, flood_time, t_start, t_path, cache_state)
 
-    # 5) Solve shortest path
-    t2 = time.perf_counter()
-    try:
-        route_nodes = nx.shortest_path(G, origin_node, dest_node, weight=weight)
-    except nx.NetworkXNoPath:
-        return {"type": "FeatureCollection", "features": [], "error": "No path found"}
-    except Exception as e:
-        return {"type": "FeatureCollection", "features": [], "error": str(e)}
-    t_path = time.perf_counter() - t2
 
-    route_edges = _route_nodes_to_edges(route_nodes, G)
+def _search_path(
+    core: CompiledGraph,
+    route_type: str,
+    weights: Dict[str, Any],
+    origin_node: int,
+    dest_node: int,
+) -> Dict[str, Any]:
+    """{"edge_ids", "search", "nodes_settled"} for snapped endpoints, or {"error"}."""
+    # 4-5) Solve shortest path on the selected cost overlay
+    cost = weights["cost"]
+    settled = None
+    search = ROUTING_SEARCH if ROUTING_ENGINE != "networkx" else "networkx"
+    hotspot_path = _hotspot_route(weights["cost_key"], origin_node, dest_node)
+    if hotspot_path is not None:
+        search = "hotspot"
+        edge_ids = hotspot_path.tolist()
+    elif ROUTING_ENGINE == "networkx":
+        G = load_graph()
+        try:
+            route_nodes = nx.shortest_path(G, origin_node, dest_node, weight=_nx_overlay_weight(cost))
+        except nx.NetworkXNoPath:
+            return {"error": "No path found"}
+        except Exception as e:
+            return {"error": str(e)}
+        edge_ids = _route_nodes_to_edge_ids(route_nodes, G, cost)
+    else:
+        ch = load_ch() if route_type == "shortest" else None
+        cch = load_cch() if ch is None else None
+        if ch is not None:
+            search = "ch"
+            edge_ids, settled = ch.query(core.dense_node(origin_node), core.dense_node(dest_node))
+        elif cch is not None:
+            # Customizes on the first request for a new traffic snapshot / flood index
+            search = "cch"
+            metric = cch.customized(weights["cost_key"], cost)
+            edge_ids, settled = metric.query(core.dense_node(origin_node), core.dense_node(dest_node))
+        else:
+            edge_ids, settled = core.search(
+                core.dense_node(origin_node), core.dense_node(dest_node), cost,
+                mode=ROUTING_SEARCH, bound_scale=weights["bound_scale"],
+            )
+        if edge_ids is None:
+            return {"error": "No path found"}
+    return {"edge_ids": [int(e) for e in edge_ids], "search": search, "nodes_settled": settled}
+
+
+def _render_route(
+    core: CompiledGraph,
+    route_type: str,
+    weights: Dict[str, Any],
+    record: Dict[str, Any],
+    origin_node: int,
+    dest_node: int,
+    flood_time: Optional[str],
+    t_start: float,
+    t_path: float,
+    cache_state: str,
+) -> Dict[str, Any]:
+    """Summary + geometry of a path under the request's weights (flood flags, ETA)."""
+    t_traffic = weights["seconds"]["traffic"]
+    t_flood = weights["seconds"]["flood"]
+    flood_mask = weights["flood_mask"]
+    edge_ids = record["edge_ids"]
+
+    if flood_mask is not None:
+        # DEBUG: Log flood info
+        print(f"[Flood Debug] route_type={route_type}, flood_idx={weights['version'][1]}")
+        print(f"[Flood Debug] Total flooded edges: {int(flood_mask.sum())}")
+
+    num_nodes = len(edge_ids) + 1
 
     distance_m = 0.0
     travel_time_s = 0.0
     flooded_distance_m = 0.0
     has_any_flood = False
-    flooded_edge_list = []  # Track flooded edges for separate rendering
+    flooded_edge_list = []  # Track flooded edge ids for separate rendering
 
-    for (u, v, k) in route_edges:
-        data = G.get_edge_data(u, v, k) or {}
-        length = float(data.get("length", 0.0))
-        tt = float(data.get("travel_time", length / 8.33))
+    travel_time = weights["travel_time"]
+    for eid in edge_ids:
+        length = float(core.length_m[eid])
         distance_m += length
-        travel_time_s += tt
-        if data.get("is_flooded", False):
+        travel_time_s += float(travel_time[eid])
+        if flood_mask is not None and flood_mask[eid]:
             flooded_distance_m += length
             has_any_flood = True
-            flooded_edge_list.append((u, v, k))
+            flooded_edge_list.append(eid)
 
     # DEBUG: Log route flood analysis
-    if route_type in ("flood_avoid", "smart"):
-        flooded_count = sum(1 for (u,v,k) in route_edges if G.get_edge_data(u,v,k) and G.get_edge_data(u,v,k).get("is_flooded"))
-        print(f"[Flood Debug] Route has {len(route_edges)} edges, {flooded_count} are FLOODED")
+    if flood_mask is not None:
+        print(f"[Flood Debug] Route has {len(edge_ids)} edges, {len(flooded_edge_list)} are FLOODED")
         print(f"[Flood Debug] has_any_flood={has_any_flood}, flooded_distance={flooded_distance_m:.1f}m")
 
-    coords = _edges_to_linestring_coords_lonlat(route_edges, G)
+    geom = load_edge_geometry()
+    coords = geom.linestring(edge_ids)
     
     # Get coordinates for each flooded segment SEPARATELY (for overlay rendering)
     # Use MultiLineString since flooded edges may not be contiguous
     flooded_multi_coords = []
-    if flooded_edge_list:
-        for (u, v, k) in flooded_edge_list:
-            # Get coords for this single edge
-            edge_coords = _edges_to_linestring_coords_lonlat([(u, v, k)], G)
-            if len(edge_coords) >= 2:
-                flooded_multi_coords.append(edge_coords)
+    for eid in flooded_edge_list:
+        edge_coords = geom.edge_coords(eid)
+        if len(edge_coords) >= 2:
+            flooded_multi_coords.append(edge_coords)
 
     props = {
         "route_type": route_type,
         "distance_m": round(distance_m, 2),
         "eta_s": round(travel_time_s, 1),
-        "num_nodes": len(route_nodes),
-        "num_edges": len(route_edges),
+        "num_nodes": num_nodes,
+        "num_edges": len(edge_ids),
         "origin_node": int(origin_node),
         "dest_node": int(dest_node),
         "has_flood": has_any_flood,
@@ -1191,6 +1896,9 @@ def find_route(
             "traffic_apply": round(t_traffic, 3),
             "flood_apply": round(t_flood, 3),
             "shortest_path": round(t_path, 3),
+            "search": record["search"],
+            "nodes_settled": record["nodes_settled"],
+            "cache": cache_state,
             "total": round(time.perf_counter() - t_start, 3),
         }
     }
@@ -1218,59 +1926,246 @@ def find_route(
         }
         features.append(flooded_feature)
 
-    result = {"type": "FeatureCollection", "features": features, "properties": props}
-    
-    # PROGRESSIVE CACHE: Store this result for future requests
-    # Implement simple LRU: if cache full, remove oldest entry (first inserted)
-    if len(_route_cache) >= MAX_ROUTE_CACHE_SIZE:
-        # Remove the first (oldest) item
-        oldest_key = next(iter(_route_cache))
-        del _route_cache[oldest_key]
-        print(f"[Cache] Evicted oldest entry (cache at max size: {MAX_ROUTE_CACHE_SIZE})")
-    
-    _route_cache[cache_key] = result
-    print(f"[Cache] Stored new route (cache size: {len(_route_cache)})")
-    
-    return result
+    return {"type": "FeatureCollection", "features": features, "properties": props}
+
+
+# ---------------------------
+# Hotspot route table
+# ---------------------------
+def _hotspot_route(cost_key, origin_node: int, dest_node: int) -> Optional[np.ndarray]:
+    """Precomputed edge ids for a hotspot pair under the overlay `cost_key`, if any."""
+    path = _hotspot_routes.get((cost_key, origin_node, dest_node))
+    if path is not None:
+        with _hotspot_lock:
+            _hotspot_stats["hits"] += 1
+    return path
+
+
+def refresh_hotspot_routes() -> Dict[str, Any]:
+    """
+    Precompute every hotspot -> hotspot route (PRESET_LOCATIONS, snapped to
+    routable nodes) for every route type under the latest traffic snapshot,
+    for each flood index whose flooded edge set is already cached.
+
+    Paths are stored as edge-id arrays keyed by (overlay cost_key, origin node,
+    dest node); the cost key carries the traffic snapshot and flood index, so
+    a table built for an older snapshot is never served. The new table
+    replaces the old one in a single assignment once it is complete.
+    """
+    global _hotspot_routes
+    core = load_core()
+    if core is None:
+        return get_hotspot_stats()
+
+    t0 = time.perf_counter()
+    nodes = sorted({
+        core.dense_node(find_routable_node(p["lat"], p["lon"], dest_node=None, k=30))
+        for p in HOTSPOT_LOCATIONS
+    })
+    traffic = load_traffic_snapshot_versioned()
+    flood_indices = (_flood_bitmaps.indices() if _flood_bitmaps is not None else []) or [0]
+
+    table: Dict[Tuple[Any, int, int], np.ndarray] = {}
+    done = set()
+    for route_type in ROUTE_TYPES:
+        for flood_idx in flood_indices:
+            try:
+                weights = resolve_route_weights(core, route_type, flood_idx, traffic=traffic, publish=False)
+            except FloodCellsNotReady:
+                break  # flood route types join the table on the next refresh
+            if weights["cost_key"] in done:
+                continue  # shortest / Fastest do not depend on the flood index
+            done.add(weights["cost_key"])
+            paths = shortest_path_edges(core, nodes, nodes, weights["cost"])
+            for (s, t), path in paths.items():
+                if path is not None:
+                    table[(weights["cost_key"], int(core.node_ids[s]), int(core.node_ids[t]))] = path
+
+    _hotspot_routes = table
+    dt = time.perf_counter() - t0
+    with _hotspot_lock:
+        _hotspot_stats.update({
+            "traffic_version": traffic[0],
+            "flood_indices": flood_indices,
+            "hotspot_nodes": len(nodes),
+            "routes": len(table),
+            "edges_stored": int(sum(p.shape[0] for p in table.values())),
+            "build_seconds": round(dt, 3),
+            "built_at": datetime.now().isoformat(timespec="seconds"),
+            "builds": _hotspot_stats["builds"] + 1,
+        })
+    print(f"[Hotspot] {len(table)} routes ({len(nodes)} hotspots x {len(done)} weight versions) "
+          f"for traffic {traffic[0]} in {dt:.2f}s")
+    return get_hotspot_stats()
+
+
+def schedule_hotspot_refresh() -> None:
+    """
+    Rebuild the hotspot table in a background thread (collector on_collect
+    hook). A request arriving while a build runs queues exactly one rebuild.
+    """
+    global _hotspot_thread, _hotspot_pending
+    if not HOTSPOT_ROUTES_ENABLED:
+        return
+    with _hotspot_lock:
+        if _hotspot_thread is not None and _hotspot_thread.is_alive():
+            _hotspot_pending = True
+            return
+
+        def run():
+            global _hotspot_pending
+            while True:
+                try:
+                    refresh_hotspot_routes()
+                except Exception as e:
+                    print(f"[Hotspot] Refresh failed: {e}")
+                with _hotspot_lock:
+                    if not _hotspot_pending:
+                        return
+                    _hotspot_pending = False
+
+        _hotspot_thread = threading.Thread(target=run, name="HotspotRoutes", daemon=True)
+        _hotspot_thread.start()
+
+
+def get_hotspot_stats() -> Dict[str, Any]:
+    with _hotspot_lock:
+        stats = dict(_hotspot_stats)
+    return dict(stats, enabled=HOTSPOT_ROUTES_ENABLED, table_size=len(_hotspot_routes))
+
+
+# ---------------------------
+# Many-to-many matrix API
+# ---------------------------
+def route_matrix(
+    origins: List[Tuple[float, float]],
+    destinations: List[Tuple[float, float]],
+    route_type: str = "shortest",
+    flood_time: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Distance (m) and ETA (s) from every (lat, lon) origin to every (lat, lon)
+    destination under route_type's cost, without geometry. One shortest-path
+    tree per distinct snapped origin; unreachable pairs are None.
+    """
+    t_start = time.perf_counter()
+    core = load_core()
+    if core is None:
+        return {"error": "Routing core unavailable"}
+
+    flood_idx = _parse_flood_idx(flood_time)
+    weights = resolve_route_weights(core, route_type, flood_idx)
+    t_weights = time.perf_counter() - t_start
+
+    t0 = time.perf_counter()
+    origin_nodes = [find_routable_node(lat, lon, dest_node=None, k=40) for lat, lon in origins]
+    dest_nodes = [find_routable_node(lat, lon, dest_node=None, k=30) for lat, lon in destinations]
+    t_snap = time.perf_counter() - t0
+
+    res = compute_route_matrix(
+        core,
+        [core.dense_node(n) for n in origin_nodes],
+        [core.dense_node(n) for n in dest_nodes],
+        weights["cost"],
+        weights["travel_time"],
+    )
+
+    def as_lists(mat: np.ndarray, ndigits: int) -> List[List[Optional[float]]]:
+        return [[None if math.isnan(x) else round(x, ndigits) for x in row] for row in mat.tolist()]
+
+    seconds = res["seconds"]
+    print(f"[Routing] Matrix {len(origins)}x{len(destinations)} {route_type} ({res['search']}) "
+          f"in {time.perf_counter() - t_start:.2f}s")
+    return {
+        "route_type": route_type,
+        "flood_time": flood_time,
+        "origin_nodes": origin_nodes,
+        "dest_nodes": dest_nodes,
+        "distance_m": as_lists(res["distance_m"], 2),
+        "eta_s": as_lists(res["eta_s"], 1),
+        "search": res["search"],
+        "debug_seconds": {
+            "weights": round(t_weights, 3),
+            "snap": round(t_snap, 3),
+            "graph_reduce": round(seconds["reduce"], 3),
+            "search": round(seconds["search"], 3),
+            "accumulate": round(seconds["accumulate"], 3),
+            "total": round(time.perf_counter() - t_start, 3),
+        },
+    }
 
 
 def get_graph_info() -> Dict[str, Any]:
     try:
-        G = load_graph()
+        core = load_core()
+        if core is None:
+            G = load_graph()
+            n_nodes, n_edges = G.number_of_nodes(), G.number_of_edges()
+        else:
+            n_nodes, n_edges = core.n_nodes, core.n_edges
+        cells = get_flood_cells()
         return {
             "loaded": True,
             "graphml_path": str(_graphml_path_used) if _graphml_path_used else None,
             "roads_geojson_path": str(_roads_geojson_path_used) if _roads_geojson_path_used else None,
-            "nodes": G.number_of_nodes(),
-            "edges": G.number_of_edges(),
+            "nodes": n_nodes,
+            "edges": n_edges,
             "osmnx_available": OSMNX_AVAILABLE,
             "geopandas_available": GEOPANDAS_OK,
-            "flood_cache_size": len(_flood_edge_cache),
+            "routing_engine": ROUTING_ENGINE,
+            "routing_search": ROUTING_SEARCH,
+            "contraction_hierarchy": (
+                {"loaded": True, "arcs": _ch.n_arcs, "shortcuts": _ch.n_shortcuts} if _ch is not None else {"loaded": False}
+            ),
+            "cch": _cch.stats() if _cch is not None else {"loaded": False, "enabled": CCH_ENABLED},
+            "weight_overlays": _overlays.stats(),
+            "flood_cache_size": len(_flood_bitmaps.indices()) if _flood_bitmaps is not None else 0,
+            "flood_cache_bytes": _flood_bitmaps.nbytes if _flood_bitmaps is not None else 0,
             "flood_cache_meta": _flood_meta_cache,
+            "flood_precompute": get_flood_precompute_progress(),
+            "flood_edge_index": _flood_edge_index.stats() if _flood_edge_index is not None else {"loaded": False},
+            "flood_cells": cells.stats() if cells is not None else {"loaded": False},
         }
     except Exception as e:
         return {"loaded": False, "error": str(e)}
 
 
 def get_cache_stats() -> Dict[str, Any]:
-    """Return progressive route cache statistics"""
-    total_requests = _route_cache_stats["hits"] + _route_cache_stats["misses"]
-    hit_rate = (_route_cache_stats["hits"] / total_requests * 100) if total_requests > 0 else 0.0
+    """Return two-level route cache statistics"""
+    stats = _route_cache.stats()
+    with _snap_lock:
+        snap_hits, snap_misses, snap_size = _snap_stats["hits"], _snap_stats["misses"], len(_snap_cache)
+    snap_total = snap_hits + snap_misses
     
     return {
-        "cache_size": len(_route_cache),
-        "max_size": MAX_ROUTE_CACHE_SIZE,
-        "hits": _route_cache_stats["hits"],
-        "misses": _route_cache_stats["misses"],
-        "total_requests": total_requests,
-        "hit_rate_percent": round(hit_rate, 2),
-        "memory_efficient": len(_route_cache) < MAX_ROUTE_CACHE_SIZE
+        "cache_size": stats["entries"],
+        "max_size": stats["max_entries"],
+        "bytes": stats["bytes"],
+        "max_bytes": stats["max_bytes"],
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "total_requests": stats["total_requests"],
+        "hit_rate_percent": stats["hit_rate_percent"],
+        "evictions": stats["evictions"],
+        "expired": stats["expired"],
+        "ttl_s": _route_cache.ttl_s,
+        "memory_efficient": stats["bytes"] < stats["max_bytes"] and stats["entries"] < stats["max_entries"],
+        "snap_cache": {
+            "size": snap_size,
+            "max_size": SNAP_CACHE_SIZE,
+            "hits": snap_hits,
+            "misses": snap_misses,
+            "hit_rate_percent": round(snap_hits / snap_total * 100, 2) if snap_total else 0.0,
+        },
+        "disk": _route_store.stats() if _route_store is not None else None,
+        "hotspot_routes": get_hotspot_stats(),
     }
 
 
 def dump_route_cache_to_disk(folder: Path) -> str:
     """
     Debug tool: Writes the current in-memory route cache to a JSON file.
+    The persistent copy lives in the route store; only its stats are included.
     """
     if not folder.exists():
         folder.mkdir(parents=True, exist_ok=True)
@@ -1281,20 +2176,22 @@ def dump_route_cache_to_disk(folder: Path) -> str:
     
     # Convert tuple keys to strings for JSON compatibility
     export_data = {}
-    for key, val in _route_cache.items():
-        # key is (origin_lat, origin_lon, dest_lat, dest_lon, flood_idx, route_type)
-        key_str = f"{key[0]},{key[1]}_to_{key[2]},{key[3]}_flood{key[4]}_{key[5]}"
+    entries = _route_cache.items()
+    for key, val, route_type in entries:
+        # key is (origin_node, dest_node, cost_key)
+        key_str = f"{key[0]}_to_{key[1]}_{route_type}_{'_'.join(map(str, key[2]))}"
         export_data[key_str] = val
         
     info = {
         "timestamp": timestamp,
-        "cache_size": len(_route_cache),
-        "stats": _route_cache_stats,
+        "cache_size": len(entries),
+        "stats": _route_cache.stats(),
+        "disk": _route_store.stats() if _route_store is not None else None,
         "routes": export_data
     }
     
     with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(info, f, indent=2)
+        json.dump(info, f, separators=(",", ":"))
         
     return str(filepath)
 
@@ -0,0 +1,75 @@
+# server/spatial_index.py
+"""
+Long-lived STRtree indexes over line geometries.
+
+Flood intersections used to go through gpd.sjoin, which builds a fresh
+STRtree over the edges (or roads) on every call. A LineIndex is built once
+per graph / roads file and then answers any number of polygon queries;
+build and query times are tracked separately.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import shapely
+except ImportError:  # flood intersections need shapely
+    shapely = None
+
+
+class LineIndex:
+    """
+    STRtree over `geoms`; ids[i] is the caller's id for geometry i (a dense
+    edge id, a road row, ...).
+    """
+
+    def __init__(self, geoms: Sequence[Any], ids: Sequence[int], name: str):
+        t0 = time.perf_counter()
+        self.name = name
+        self.geoms = np.asarray(geoms, dtype=object)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.tree = shapely.STRtree(self.geoms)
+        self.build_seconds = time.perf_counter() - t0
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "query_seconds": 0.0}
+        print(f"[Spatial] {name}: STRtree over {len(self.geoms)} lines built in {self.build_seconds:.3f}s")
+
+    @classmethod
+    def from_edge_geometry(cls, coords: np.ndarray, ptr: np.ndarray, name: str = "graph edges") -> "LineIndex":
+        """
+        One LineString per dense edge id from a flat (lon, lat) point buffer
+        with CSR offsets (see EdgeGeometry). Edges with a single point are left out.
+        """
+        counts = np.diff(ptr)
+        usable = counts >= 2
+        point_edge = np.repeat(np.arange(counts.shape[0]), counts)
+        take = usable[point_edge]
+        rank = np.cumsum(usable) - 1
+        geoms = shapely.linestrings(np.asarray(coords)[take], indices=rank[point_edge[take]])
+        return cls(geoms, np.flatnonzero(usable), name)
+
+    def __len__(self) -> int:
+        return int(self.geoms.shape[0])
+
+    def query(self, geoms: Sequence[Any], predicate: str = "intersects") -> Tuple[np.ndarray, np.ndarray]:
+        """(position in geoms, id) of every (query geometry, indexed line) pair matching predicate."""
+        t0 = time.perf_counter()
+        query_idx, tree_idx = self.tree.query(np.asarray(geoms, dtype=object), predicate=predicate)
+        dt = time.perf_counter() - t0
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["query_seconds"] += dt
+        return query_idx, self.ids[tree_idx]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["query_seconds"] = round(stats["query_seconds"], 3)
+        stats.update({"name": self.name, "lines": len(self), "build_seconds": round(self.build_seconds, 3)})
+        return stats
+
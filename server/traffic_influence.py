@@ -0,0 +1,203 @@
+# server/traffic_influence.py
+"""
+Precomputed traffic-influence matrix.
+
+Each traffic monitoring point influences every edge whose midpoint lies
+within TRAFFIC_INFLUENCE_RADIUS_M, with a distance decay. The edges x points
+distances and decay factors only depend on the graph, the point locations
+and the radius, so they are built once into a sparse matrix and every new
+traffic snapshot is applied with vectorized segment reductions / a mat-vec
+instead of a Python loop over all edges.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+    from scipy.sparse import csr_matrix
+except ImportError:  # scipy is optional: fall back to numpy scans / bincount
+    cKDTree = None
+    csr_matrix = None
+
+EARTH_RADIUS_M = 6371000.0
+MAX_CACHED_MATRICES = 8
+
+
+def _haversine_m_vec(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    p1 = math.radians(lat)
+    p2 = np.radians(lats)
+    dlat = p2 - p1
+    dlon = np.radians(lons - lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class InfluenceMatrix:
+    """
+    Sparse edges x points influence for one (points, radius) combination.
+
+    Entries are sorted by edge, then by distance, so the first entry of
+    each edge segment is its nearest monitoring point.
+    """
+
+    def __init__(self, n_edges: int, rows: np.ndarray, cols: np.ndarray, dist: np.ndarray, radius_m: float, n_points: int):
+        order = np.lexsort((dist, rows))
+        self.rows = rows[order]
+        self.cols = cols[order]
+        self.dist = dist[order]
+        self.radius_m = radius_m
+        self.n_edges = n_edges
+        self.n_points = n_points
+
+        # Distance decay: closer = stronger influence
+        # At 0m: factor = 1.0, at radius: factor = 0.3
+        self.decay = np.maximum(0.3, 1.0 - (self.dist / radius_m) * 0.7)
+        # Inverse-distance weights for the weighted average (avoid division by zero)
+        self.weight = 1.0 / np.maximum(self.dist, 1.0)
+
+        # Edge segments: edge_ids[i] owns entries seg_start[i]..seg_start[i+1]-1
+        self.edge_ids, self.seg_start = np.unique(self.rows, return_index=True)
+        self.weight_sum = np.add.reduceat(self.weight, self.seg_start) if self.rows.size else np.zeros(0)
+
+        self._wd = None
+        if csr_matrix is not None and self.rows.size:
+            self._wd = csr_matrix(
+                (self.weight * self.decay, (self.rows, self.cols)), shape=(n_edges, n_points)
+            )
+
+    @property
+    def nnz(self) -> int:
+        return int(self.rows.size)
+
+    def speed_ratio(self, sr: np.ndarray, strategy: str) -> np.ndarray:
+        """
+        Effective per-edge speed ratio for per-point speed ratios `sr`.
+        Each point's ratio is blended toward free flow by its decay:
+        sr * decay + 1.0 * (1 - decay).
+        """
+        out = np.ones(self.n_edges, dtype=np.float64)
+        if not self.rows.size:
+            return out
+        slowdown = 1.0 - sr
+
+        if strategy == "worst":
+            # WORST: segment-min of the blended ratio over each edge's points
+            candidate = 1.0 - self.decay * slowdown[self.cols]
+            out[self.edge_ids] = np.minimum(1.0, np.minimum.reduceat(candidate, self.seg_start))
+        elif strategy == "weighted_average":
+            # WEIGHTED AVERAGE: inverse-distance blend, as one sparse mat-vec
+            if self._wd is not None:
+                num = self._wd @ slowdown
+                out[self.edge_ids] = 1.0 - num[self.edge_ids] / self.weight_sum
+            else:
+                num = np.bincount(self.rows, weights=self.weight * self.decay * slowdown[self.cols], minlength=self.n_edges)
+                out[self.edge_ids] = 1.0 - num[self.edge_ids] / self.weight_sum
+        else:
+            # NEAREST (default): gather the first (closest) entry of every edge
+            first = self.seg_start
+            out[self.edge_ids] = 1.0 - self.decay[first] * slowdown[self.cols[first]]
+        return out
+
+
+class TrafficInfluence:
+    """
+    Edge-midpoint spatial index plus a small cache of InfluenceMatrix objects.
+    The graph is scanned once here; changing the radius or the point set
+    only builds a new matrix from the index. The cache is shared between
+    request threads; each combination is built by one of them.
+    """
+
+    def __init__(self, edge_source: np.ndarray, edge_target: np.ndarray, node_x: np.ndarray, node_y: np.ndarray):
+        t0 = time.perf_counter()
+        self.mid_lat = (node_y[edge_source] + node_y[edge_target]) / 2
+        self.mid_lon = (node_x[edge_source] + node_x[edge_target]) / 2
+        self.n_edges = int(self.mid_lat.shape[0])
+
+        lat0 = math.radians(float(self.mid_lat.mean())) if self.n_edges else 0.0
+        self._kx = EARTH_RADIUS_M * math.cos(lat0) * math.pi / 180.0
+        self._ky = EARTH_RADIUS_M * math.pi / 180.0
+        self._tree = None
+        if cKDTree is not None and self.n_edges:
+            self._tree = cKDTree(np.column_stack((self.mid_lon * self._kx, self.mid_lat * self._ky)))
+
+        self._matrices: "OrderedDict[Hashable, InfluenceMatrix]" = OrderedDict()
+        self._lock = threading.Lock()
+        # key -> lock held while that key's matrix is being built
+        self._building: Dict[Hashable, threading.Lock] = {}
+        print(f"[Traffic] Edge midpoint index built for {self.n_edges} edges in {time.perf_counter() - t0:.3f}s")
+
+    def _edges_within(self, lat: float, lon: float, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(edge ids, haversine distances) of edge midpoints within radius_m of a point."""
+        if self._tree is not None:
+            # Projected search with a small margin, then exact haversine filter
+            cand = self._tree.query_ball_point([lon * self._kx, lat * self._ky], r=radius_m * 1.01 + 1.0)
+            cand = np.asarray(cand, dtype=np.int64)
+        else:
+            cand = np.arange(self.n_edges, dtype=np.int64)
+        dist = _haversine_m_vec(lat, lon, self.mid_lat[cand], self.mid_lon[cand])
+        keep = dist <= radius_m
+        return cand[keep], dist[keep]
+
+    def matrix(self, points: Sequence[Tuple[float, float]], radius_m: float) -> InfluenceMatrix:
+        """InfluenceMatrix for (lat, lon) points at radius_m, built once per combination."""
+        key = (float(radius_m), tuple((round(lat, 6), round(lon, 6)) for lat, lon in points))
+        with self._lock:
+            m = self._matrices.get(key)
+            if m is not None:
+                self._matrices.move_to_end(key)
+                return m
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        # Same pattern as OverlayStore.get: one build per key, other keys never wait on it
+        with build_lock:
+            with self._lock:
+                m = self._matrices.get(key)
+                if m is not None:
+                    self._matrices.move_to_end(key)
+                    return m
+            try:
+                m = self._build(points, radius_m)
+                with self._lock:
+                    self._matrices[key] = m
+                    while len(self._matrices) > MAX_CACHED_MATRICES:
+                        self._matrices.popitem(last=False)
+                return m
+            finally:
+                with self._lock:
+                    if self._building.get(key) is build_lock:
+                        del self._building[key]
+
+    def _build(self, points: Sequence[Tuple[float, float]], radius_m: float) -> InfluenceMatrix:
+        t0 = time.perf_counter()
+        rows: List[np.ndarray] = []
+        cols: List[np.ndarray] = []
+        dists: List[np.ndarray] = []
+        for j, (lat, lon) in enumerate(points):
+            eids, dist = self._edges_within(lat, lon, radius_m)
+            rows.append(eids)
+            cols.append(np.full(eids.shape[0], j, dtype=np.int64))
+            dists.append(dist)
+
+        def cat(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+        m = InfluenceMatrix(
+            self.n_edges, cat(rows, np.int64), cat(cols, np.int64), cat(dists, np.float64), float(radius_m), len(points)
+        )
+        print(f"[Traffic] Influence matrix: {m.nnz} edge-point entries ({m.edge_ids.size} edges, {len(points)} points, radius={radius_m}m) in {time.perf_counter() - t0:.3f}s")
+        return m
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "matrices": len(self._matrices),
+                "entries": int(sum(m.nnz for m in self._matrices.values())),
+            }
@@ -0,0 +1,88 @@
+# tests/test_flood_bitmaps.py
+"""
+FloodBitmaps bit operations against boolean masks, and the memory-mapped
+flood cache behind routing._flood_store: rows survive a reopen for the same
+flood data and are dropped when the cell store version or threshold changes.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from server import routing
+from server.flood_bitmaps import FloodBitmaps
+
+N_EDGES = 37  # not a multiple of 8
+
+
+@pytest.fixture
+def masks():
+    rng = np.random.default_rng(7)
+    return rng.random((4, N_EDGES)) < 0.3
+
+
+def test_bit_operations_match_boolean_masks(masks):
+    store = FloodBitmaps.empty(5, N_EDGES)
+    for t, mask in enumerate(masks):
+        store.set_mask(t, mask)
+
+    assert store.indices() == [0, 1, 2, 3]
+    assert store.has(3) and not store.has(4) and not store.has(5)
+    for t, mask in enumerate(masks):
+        assert np.array_equal(store.mask(t), mask)
+        assert store.popcount(t) == int(mask.sum())
+        eids = np.array([0, 7, 8, N_EDGES - 1])
+        assert np.array_equal(store.contains(t, eids), mask[eids])
+    assert np.array_equal(store.union([0, 2, 3]), masks[0] | masks[2] | masks[3])
+    assert np.array_equal(store.difference(1, 2), masks[1] & ~masks[2])
+
+
+@pytest.fixture
+def flood_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(routing, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(routing, "FLOOD_CACHE_FILE", tmp_path / "flood_bitmaps.npy")
+    monkeypatch.setattr(routing, "_graph_file_hash", lambda: "graph")
+    monkeypatch.setattr(routing, "_flood_bitmaps", None)
+    monkeypatch.setattr(routing, "_flood_meta_cache", {})
+    return tmp_path
+
+
+def _reopen(core, cells):
+    """The flood store as a freshly started server would open it."""
+    routing._flood_bitmaps = None
+    return routing._flood_store(core, cells)
+
+
+def test_flood_store_reopens_persisted_rows(flood_cache, masks):
+    core = SimpleNamespace(n_edges=N_EDGES)
+    cells = SimpleNamespace(version="v1", n_times=4)
+    store = routing._flood_store(core, cells)
+    assert isinstance(store.bits, np.memmap) and store.indices() == []
+    routing._store_flood_mask(store, 2, masks[2])
+    assert routing._flood_store(core, cells) is store
+
+    reopened = _reopen(core, cells)
+    assert reopened is not store
+    assert reopened.indices() == [2]
+    assert np.array_equal(reopened.mask(2), masks[2])
+
+
+def test_flood_store_reopens_empty_when_source_changes(flood_cache, masks, monkeypatch):
+    core = SimpleNamespace(n_edges=N_EDGES)
+    cells = SimpleNamespace(version="v1", n_times=4)
+    routing._store_flood_mask(routing._flood_store(core, cells), 1, masks[1])
+
+    # New cell store version: the running store is replaced by an empty one
+    store = routing._flood_store(core, SimpleNamespace(version="v2", n_times=4))
+    assert store.indices() == [] and not store.bits.any()
+    assert store.source == routing._flood_source_key(SimpleNamespace(version="v2"))
+
+    # Persisted rows of v1 do not come back after a restart on v2 either
+    routing._store_flood_mask(routing._flood_store(core, cells), 1, masks[1])
+    assert _reopen(core, SimpleNamespace(version="v2", n_times=4)).indices() == []
+
+    # Nor after a depth threshold change
+    routing._store_flood_mask(routing._flood_store(core, cells), 1, masks[1])
+    monkeypatch.setattr(routing, "FLOOD_DEPTH_THRESHOLD_M", routing.FLOOD_DEPTH_THRESHOLD_M + 0.1)
+    assert _reopen(core, cells).indices() == []
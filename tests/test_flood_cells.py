@@ -0,0 +1,240 @@
+# tests/test_flood_cells.py
+"""
+Flood cell store: ingestion of stem-named depth properties, thresholding,
+null depths, resuming an interrupted ingestion, backing off after a failed
+one, the incremental flooded-line
+timeline and the /api/flood/series output read from it.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from server import flood_cells, flood_precompute
+from server.flood_cells import FloodCellsNotReady, FloodTimeline, build_flood_cells, lines_of, load_flood_cells
+from server.handlers import flood_handler
+
+# Per flood file: geo_code -> depth (None = null depth); a missing code is absent from the file
+TIMELINE = {
+    "D202507130100.geojson": {"A": 0.05, "B": 0.3, "C": None},
+    "D202507130200.geojson": {"A": 0.2, "B": 0.3},
+    "D202507130300.geojson": {"B": 0.0, "C": 0.5, "D": 1.25},
+}
+CELLS = {"A": (0, 0), "B": (1, 0), "C": (0, 1), "D": (1, 1)}
+
+
+def _cell(code: str, stem: str, depth) -> dict:
+    x, y = CELLS[code]
+    x0, y0 = 77.0 + x * 0.001, 28.4 + y * 0.001
+    ring = [[x0, y0], [x0 + 0.001, y0], [x0 + 0.001, y0 + 0.001], [x0, y0 + 0.001], [x0, y0]]
+    return {
+        "type": "Feature",
+        "properties": {"geo_code": code, stem: depth},
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+    }
+
+
+@pytest.fixture
+def flood_dir(tmp_path):
+    d = tmp_path / "GEOCODED"
+    d.mkdir()
+    for name, depths in TIMELINE.items():
+        stem = name.split(".")[0]
+        features = [_cell(code, stem, depth) for code, depth in depths.items()]
+        (d / name).write_text(json.dumps({"type": "FeatureCollection", "name": stem, "features": features}))
+    return d
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    """Every test starts without a loaded store (load_flood_cells keeps one per process)."""
+    monkeypatch.setattr(flood_cells, "_flood_cells", None)
+    monkeypatch.setattr(flood_cells, "_checked", None)
+    monkeypatch.setattr(flood_cells, "_reingest_thread", None)
+    monkeypatch.setattr(flood_cells, "_failed", None)
+
+
+def _files(flood_dir):
+    return sorted(flood_dir.glob("D*.geojson"))
+
+
+def _depth(cells, t, code):
+    return float(cells.depth[t, list(cells.geo_codes).index(code)])
+
+
+def test_reads_the_depth_named_after_the_file_stem(flood_dir, tmp_path):
+    cells = build_flood_cells(_files(flood_dir), tmp_path / "store", workers=1)
+
+    assert cells.names == list(TIMELINE)
+    assert sorted(cells.geo_codes) == ["A", "B", "C", "D"]
+    assert _depth(cells, 0, "B") == pytest.approx(0.3)
+    assert _depth(cells, 2, "D") == pytest.approx(1.25)
+    # Cells missing from a file are absent at that timestamp
+    assert np.isnan(_depth(cells, 1, "C"))
+    assert not cells.present(1)[list(cells.geo_codes).index("C")]
+
+
+def test_threshold_selects_cells_deeper_than_it(flood_dir, tmp_path):
+    cells = build_flood_cells(_files(flood_dir), tmp_path / "store", workers=1)
+    codes = np.asarray(cells.geo_codes)
+
+    assert sorted(codes[cells.flooded(0, 0.1)]) == ["B"]
+    assert sorted(codes[cells.flooded(1, 0.1)]) == ["A", "B"]
+    assert sorted(codes[cells.flooded(2, 0.0)]) == ["C", "D"]
+
+
+def test_null_depth_is_present_but_never_flooded(flood_dir, tmp_path):
+    cells = build_flood_cells(_files(flood_dir), tmp_path / "store", workers=1)
+    c = list(cells.geo_codes).index("C")
+
+    assert _depth(cells, 0, "C") == -np.inf
+    assert cells.present(0)[c]
+    assert not cells.flooded(0, -1.0)[c]
+
+
+
+def test_depth_column_found_beyond_the_first_feature(tmp_path, capsys):
+    stem = "D202507130500"
+    features = [_cell("A", stem, 0.4), _cell("B", stem, "n/a"), _cell("C", stem, 0.6), _cell("D", stem, "nan")]
+    del features[0]["properties"][stem]
+    path = tmp_path / f"{stem}.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+
+    codes, _, _, depths = flood_precompute.read_flood_file(str(path))
+
+    assert list(codes) == ["A", "B", "C", "D"]
+    assert depths[2] == pytest.approx(0.6)
+    # Missing and unreadable depths are present but never flooded, with a warning
+    assert list(depths[[0, 1, 3]]) == [-np.inf] * 3
+    assert "2 cells with an unreadable" in capsys.readouterr().out
+
+
+def test_file_without_a_depth_column_never_floods(tmp_path, capsys):
+    features = [_cell("A", "level", 0.4)]
+    path = tmp_path / "D202507130500.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+
+    _, _, _, depths = flood_precompute.read_flood_file(str(path))
+
+    assert list(depths) == [-np.inf]
+    assert "has no depth property" in capsys.readouterr().out
+
+def test_store_is_reopened_memory_mapped(flood_dir, tmp_path):
+    built = load_flood_cells(flood_dir, tmp_path / "store", wait=True)
+    flood_cells._flood_cells = None
+    flood_cells._checked = None
+
+    reopened = load_flood_cells(flood_dir, tmp_path / "store")
+    assert reopened is not None and reopened.version == built.version
+    assert isinstance(reopened.depth, np.memmap)
+    np.testing.assert_array_equal(np.asarray(reopened.depth), np.asarray(built.depth))
+
+
+def test_interrupted_ingestion_resumes_with_the_unread_files(flood_dir, tmp_path, monkeypatch):
+    read = flood_precompute.read_flood_file
+    files = _files(flood_dir)
+    calls = []
+
+    def failing_read(path):
+        calls.append(path)
+        if path.endswith(files[-1].name):
+            raise OSError("interrupted")
+        return read(path)
+
+    monkeypatch.setattr(flood_precompute, "read_flood_file", failing_read)
+    with pytest.raises(OSError):
+        build_flood_cells(files, tmp_path / "store", workers=1)
+    assert len(calls) == 3
+
+    calls.clear()
+    monkeypatch.setattr(flood_precompute, "read_flood_file", lambda path: calls.append(path) or read(path))
+    progress = []
+    cells = build_flood_cells(files, tmp_path / "store", workers=1, progress=lambda *p: progress.append(p))
+
+    assert calls == [str(files[-1])]
+    assert progress[0] == (2, 3, 2) and progress[-1] == (3, 3, 2)
+    assert _depth(cells, 2, "D") == pytest.approx(1.25)
+
+
+def test_failed_ingestion_is_not_retried_until_the_files_change(flood_dir, tmp_path, monkeypatch):
+    read = flood_precompute.read_flood_file
+    calls = []
+
+    def failing_read(path):
+        calls.append(path)
+        raise ValueError("broken flood file")
+
+    monkeypatch.setattr(flood_precompute, "read_flood_file", failing_read)
+    assert load_flood_cells(flood_dir, tmp_path / "store", wait=True) is None
+    assert len(calls) == 1
+
+    # Same files: neither the fast path nor a rescan starts another ingestion
+    assert load_flood_cells(flood_dir, tmp_path / "store", wait=True) is None
+    flood_cells._checked = None
+    assert load_flood_cells(flood_dir, tmp_path / "store", wait=True) is None
+    assert len(calls) == 1 and not flood_cells.is_ingesting()
+
+    # A changed file is ingested again right away
+    monkeypatch.setattr(flood_precompute, "read_flood_file", read)
+    (flood_dir / "D202507130400.geojson").write_text((flood_dir / "D202507130300.geojson").read_text())
+    cells = load_flood_cells(flood_dir, tmp_path / "store", wait=True)
+    assert cells is not None and cells.n_times == 4
+    assert flood_cells._failed is None
+
+
+def test_failed_ingestion_is_retried_after_the_interval(flood_dir, tmp_path, monkeypatch):
+    read = flood_precompute.read_flood_file
+    monkeypatch.setattr(flood_precompute, "read_flood_file", lambda path: 1 / 0)
+    assert load_flood_cells(flood_dir, tmp_path / "store", wait=True) is None
+
+    monkeypatch.setattr(flood_precompute, "read_flood_file", read)
+    monkeypatch.setattr(flood_cells, "RETRY_INTERVAL_S", 0.0)
+    flood_cells._checked = None
+    assert load_flood_cells(flood_dir, tmp_path / "store", wait=True) is not None
+
+
+def test_timeline_matches_thresholding_each_timestamp(flood_dir, tmp_path):
+    cells = build_flood_cells(_files(flood_dir), tmp_path / "store", workers=1)
+    # Lines 0..4; some cells intersect several lines, line 4 none
+    rng = np.random.default_rng(3)
+    cell_idx = rng.integers(0, cells.n_cells, 12)
+    pairs = (cell_idx, rng.integers(0, 4, 12))
+    timeline = FloodTimeline(cells, pairs, 5, 0.1)
+
+    for t in [0, 1, 2, 0, 2, 1]:
+        expected = np.zeros(5, dtype=bool)
+        expected[lines_of(pairs, cells.flooded(t, 0.1))] = True
+        mask, meta = timeline.advance(t)
+        np.testing.assert_array_equal(mask, expected)
+        assert meta["lines_flooded"] == int(expected.sum())
+        assert meta["cells_flooded"] == int(cells.flooded(t, 0.1).sum())
+    assert (timeline.count >= 0).all()
+
+
+def test_series_of_a_point_and_a_bbox(flood_dir, tmp_path, monkeypatch):
+    cells = build_flood_cells(_files(flood_dir), tmp_path / "store", workers=1)
+    monkeypatch.setattr(flood_handler, "get_flood_cells", lambda wait=False: cells)
+
+    # Centre of cell C: null depth, absent, then 0.5
+    result = flood_handler.get_flood_series(lat=28.4015, lon=77.0005)
+    assert [t["filename"] for t in result["times"]] == list(TIMELINE)
+    assert result["times"][0]["timestamp"] == "2025-07-13T01:00:00"
+    assert result["count"] == 1
+    (cell,) = result["cells"]
+    assert cell["geo_code"] == "C"
+    assert cell["depth"] == [None, None, 0.5]
+    assert cell["max_depth"] == 0.5
+    assert cell["lat"] == pytest.approx(28.4015) and cell["lon"] == pytest.approx(77.0005)
+
+    result = flood_handler.get_flood_series(bbox=(77.0012, 28.4002, 77.0018, 28.4018))
+    assert [c["geo_code"] for c in result["cells"]] == ["B", "D"]
+    assert result["cells"][0]["depth"] == [0.3, 0.3, 0.0]
+    assert result["cells"][1]["depth"] == [None, None, 1.25]
+
+
+def test_series_is_not_ready_while_first_ingested(monkeypatch):
+    monkeypatch.setattr(flood_handler, "get_flood_cells", lambda wait=False: None)
+    monkeypatch.setattr(flood_handler, "is_ingesting", lambda: True)
+    with pytest.raises(FloodCellsNotReady):
+        flood_handler.get_flood_series(lat=28.4015, lon=77.0005)
@@ -0,0 +1,89 @@
+# tests/test_route_cache.py
+"""
+RouteCache: LRU eviction by payload bytes and by entry count, recency
+promotion and per-route-type TTL expiry (on a fake monotonic clock).
+"""
+
+import pytest
+
+from server import route_cache
+from server.route_cache import RouteCache, payload_bytes
+
+RECORD = {"edges": list(range(20)), "length_m": 1234.5}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(route_cache, "time", clock)
+    return clock
+
+
+def _cache(max_bytes=10 ** 6, max_entries=100, ttl_s=None):
+    return RouteCache(max_bytes, max_entries, ttl_s or {"shortest": 60.0, "Fastest": 10.0})
+
+
+def test_evicts_least_recent_beyond_max_entries(clock):
+    cache = _cache(max_entries=3)
+    for k in "abc":
+        cache.put(k, RECORD, "shortest")
+    assert cache.get("a") == RECORD  # a is now the most recent
+
+    assert cache.put("d", RECORD, "shortest") == 1
+    assert cache.get("b") is None
+    assert [k for k, _, _ in cache.items()] == ["c", "a", "d"]
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["evictions"] == 1
+
+
+def test_evicts_until_payload_bytes_fit(clock):
+    size = payload_bytes(RECORD)
+    cache = _cache(max_bytes=size * 2 + size // 2)
+    cache.put("a", RECORD, "shortest")
+    cache.put("b", RECORD, "shortest")
+    assert cache.stats()["bytes"] == 2 * size
+
+    big = {"edges": list(range(40))}
+    assert cache.put("c", big, "shortest") == 2
+    assert len(cache) == 1 and cache.stats()["bytes"] == payload_bytes(big)
+
+    # A single entry larger than the bound is still kept (the newest entry always stays)
+    cache.put("huge", {"edges": list(range(1000))}, "shortest")
+    assert [k for k, _, _ in cache.items()] == ["huge"]
+
+
+def test_replacing_a_key_updates_its_size(clock):
+    cache = _cache()
+    cache.put("a", RECORD, "shortest")
+    cache.put("a", {"edges": []}, "shortest")
+    assert len(cache) == 1
+    assert cache.stats()["bytes"] == payload_bytes({"edges": []})
+
+
+def test_entries_expire_after_their_route_type_ttl(clock):
+    cache = _cache()
+    cache.put("fast", RECORD, "Fastest")
+    cache.put("short", RECORD, "shortest")
+    cache.put("other", RECORD, "unknown")  # default TTL (3600 s)
+    cache.put("disk", RECORD, "shortest", ttl_s=5.0)
+
+    clock.now += 9.0
+    assert {k for k, _, _ in cache.items()} == {"fast", "short", "other"}
+    clock.now += 2.0
+    assert cache.get("fast") is None
+    assert cache.get("short") == RECORD
+    assert {k for k, _, _ in cache.items()} == {"short", "other"}
+
+    clock.now += 60.0
+    assert cache.get("short") is None
+    assert cache.get("other") == RECORD
+    stats = cache.stats()
+    assert stats["expired"] == 2 and stats["hits"] == 2 and stats["misses"] == 2
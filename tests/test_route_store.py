@@ -0,0 +1,86 @@
+# tests/test_route_store.py
+"""
+RouteStore: SQLite round-trip of records and cache keys, expiry, pruning
+to max_rows by recency (on a fake wall clock) and clearing on a graph change.
+"""
+
+import pytest
+
+from server import route_store
+from server.route_store import RouteStore
+
+COST_KEY = ("smart", ("traffic", 3), None)
+RECORD = {"edges": [4, 8, 15, 16], "length_m": 42.0, "coords": [[77.03, 28.46], [77.04, 28.47]]}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(route_store, "time", clock)
+    return clock
+
+
+def _key(origin, dest=0):
+    return (origin, dest, COST_KEY)
+
+
+def test_round_trip(tmp_path, clock):
+    store = RouteStore(tmp_path / "routes.sqlite", "g1", max_rows=100)
+    store.put(_key(1, 2), RECORD, "Fastest", ttl_s=60.0)
+
+    clock.now += 10.0
+    record, route_type, left = store.get(_key(1, 2))
+    assert record == RECORD and route_type == "Fastest" and left == pytest.approx(50.0)
+    assert store.get((1, 2, ("smart", ("traffic", 4), None))) is None
+
+    # Reopened for the same graph: rows survive, cost keys come back as tuples
+    reopened = RouteStore(tmp_path / "routes.sqlite", "g1", max_rows=100)
+    assert list(reopened.items()) == [(_key(1, 2), RECORD, "Fastest")]
+
+
+def test_expired_rows_are_dropped(tmp_path, clock):
+    store = RouteStore(tmp_path / "routes.sqlite", "g1", max_rows=100)
+    store.put(_key(1), RECORD, "Fastest", ttl_s=10.0)
+    store.put(_key(2), RECORD, "shortest", ttl_s=100.0)
+
+    clock.now += 20.0
+    assert store.get(_key(1)) is None
+    assert [k for k, _, _ in store.items()] == [_key(2)]
+    clock.now += 100.0
+    store.prune()
+    assert store.stats()["rows"] == 0
+    assert store.stats()["expired"] == 2
+
+
+def test_prunes_least_recently_used_beyond_max_rows(tmp_path, clock):
+    store = RouteStore(tmp_path / "routes.sqlite", "g1", max_rows=4)
+    for origin in range(4):
+        clock.now += 1.0
+        store.put(_key(origin), RECORD, "shortest", ttl_s=3600.0)
+    clock.now += 1.0
+    assert store.get(_key(0)) is not None  # the oldest row is now the most recent hit
+
+    for origin in range(4, 6):
+        clock.now += 1.0
+        store.put(_key(origin), RECORD, "shortest", ttl_s=3600.0)
+    store.prune()
+
+    assert store.stats()["rows"] == 4
+    assert {k[0] for k, _, _ in store.items()} == {0, 3, 4, 5}
+
+
+def test_graph_change_clears_rows(tmp_path, clock):
+    path = tmp_path / "routes.sqlite"
+    RouteStore(path, "g1", max_rows=100).put(_key(1), RECORD, "shortest", ttl_s=3600.0)
+
+    store = RouteStore(path, "g2", max_rows=100)
+    assert store.get(_key(1)) is None
+    assert store.stats()["rows"] == 0
@@ -0,0 +1,138 @@
+# tests/test_routing_core.py
+"""
+CH, CCH and CompiledGraph searches against networkx on a small synthetic
+street grid with one-way streets and parallel edges.
+"""
+
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from server.cch import build_cch
+from server.contraction import build_contraction_hierarchy
+from server.graph_core import build_compiled_graph
+
+GRID = 12
+PAIRS = 300
+SEARCH_MODES = ("dijkstra", "astar", "bidirectional")
+
+
+def _grid_graph(seed: int = 1) -> nx.MultiDiGraph:
+    """
+    GRID x GRID streets ~100 m apart: every 4th row is one-way eastbound,
+    every 5th column one-way northbound, and some blocks get a second,
+    parallel edge that is sometimes the cheaper one.
+    """
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph()
+    for r in range(GRID):
+        for c in range(GRID):
+            G.add_node(1000 + r * GRID + c, x=77.0 + c * 0.001, y=28.4 + r * 0.0009)
+
+    def street(u: int, v: int) -> None:
+        length = 100.0 + rng.uniform(0.0, 60.0)
+        G.add_edge(u, v, length=length, travel_time=length / rng.uniform(5.0, 15.0), free_flow_kph=50.0)
+        if rng.random() < 0.15:
+            alt = length * rng.uniform(0.8, 1.3)
+            G.add_edge(u, v, length=alt, travel_time=alt / rng.uniform(5.0, 15.0), free_flow_kph=50.0)
+
+    for r in range(GRID):
+        for c in range(GRID):
+            node = 1000 + r * GRID + c
+            if c + 1 < GRID:
+                street(node, node + 1)
+                if r % 4 != 0:
+                    street(node + 1, node)
+            if r + 1 < GRID:
+                street(node, node + GRID)
+                if c % 5 != 0:
+                    street(node + GRID, node)
+    return G
+
+
+@pytest.fixture(scope="module")
+def graph():
+    G = _grid_graph()
+    return G, build_compiled_graph(G)
+
+
+@pytest.fixture(scope="module")
+def od_pairs(graph):
+    G, _ = graph
+    rng = random.Random(7)
+    nodes = list(G.nodes)
+    return [(rng.choice(nodes), rng.choice(nodes)) for _ in range(PAIRS)]
+
+
+def _reference(G: nx.MultiDiGraph, o: int, d: int, weight: str):
+    try:
+        return nx.shortest_path_length(G, o, d, weight=weight)
+    except nx.NetworkXNoPath:
+        return None
+
+
+def _check_path(core, edge_ids, o: int, d: int, weights: np.ndarray, ref) -> None:
+    """edge_ids must be a continuous o -> d walk costing ref (None: no path)."""
+    if ref is None:
+        assert edge_ids is None
+        return
+    assert edge_ids is not None
+    uvk = [core.edge_uvk(e) for e in edge_ids]
+    if o == d:
+        assert uvk == []
+        return
+    assert uvk[0][0] == o and uvk[-1][1] == d
+    assert all(a[1] == b[0] for a, b in zip(uvk[:-1], uvk[1:]))
+    got = float(sum(float(weights[e]) for e in edge_ids))
+    assert got == pytest.approx(ref, rel=1e-5)
+
+
+def test_graph_has_one_way_and_parallel_edges(graph):
+    G, core = graph
+    assert any(G.number_of_edges(u, v) > 1 for u, v in G.edges())
+    assert any(not G.has_edge(v, u) for u, v in G.edges())
+    assert core.n_edges == G.number_of_edges()
+
+
+def test_contraction_hierarchy_matches_networkx(graph, od_pairs):
+    G, core = graph
+    ch = build_contraction_hierarchy(core, core.length)
+    assert ch.n_shortcuts > 0
+    for o, d in od_pairs:
+        edge_ids, _ = ch.query(core.dense_node(o), core.dense_node(d))
+        _check_path(core, edge_ids, o, d, core.length, _reference(G, o, d, "length"))
+
+
+def test_customizable_ch_matches_networkx(graph, od_pairs):
+    G, core = graph
+    cch = build_cch(core)
+    for weight, cost in (("length", core.length), ("travel_time", core.travel_time)):
+        metric = cch.customized(weight, cost)
+        for o, d in od_pairs:
+            edge_ids, _ = metric.query(core.dense_node(o), core.dense_node(d))
+            _check_path(core, edge_ids, o, d, cost, _reference(G, o, d, weight))
+
+
+def test_customizable_ch_recustomizes_per_key(graph):
+    _, core = graph
+    cch = build_cch(core, max_metrics=1)
+    a = cch.customized("a", core.length)
+    assert cch.customized("a", core.length) is a
+    cch.customized("b", core.travel_time)
+    assert cch.customized("a", core.length) is not a
+
+
+@pytest.mark.parametrize("mode", SEARCH_MODES)
+def test_compiled_graph_search_matches_networkx(graph, od_pairs, mode):
+    G, core = graph
+    for weight, cost, scale in (
+        ("length", core.length, core.length_bound_scale),
+        ("travel_time", core.travel_time, core.time_bound_scale),
+    ):
+        if mode == "astar":
+            assert scale > 0
+        for o, d in od_pairs:
+            edge_ids, _ = core.search(core.dense_node(o), core.dense_node(d), cost, mode=mode, bound_scale=scale)
+            _check_path(core, edge_ids, o, d, cost, _reference(G, o, d, weight))
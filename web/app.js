@@ -1319,18 +1319,19 @@ async function updateRouteComparison(origin, dest) {
     const oLon = getLon(origin);
     const dLon = getLon(dest);
 
-    // Use Promise.allSettled so if one fails, others still show
-    const promises = types.map(t =>
-      fetch(`${API_BASE}/api/route?origin_lat=${origin.lat}&origin_lon=${oLon}&dest_lat=${dest.lat}&dest_lon=${dLon}&type=${t.id}&flood_time=${currentFloodIndex}`)
-        .then(res => {
-          if (!res.ok) throw new Error(res.statusText);
-          return res.json();
-        })
-        .then(data => ({ type: t, data: data, success: true }))
-        .catch(err => ({ type: t, error: err, success: false }))
-    );
-
-    const results = await Promise.all(promises);
+    // One call snaps the endpoints once and returns every route type
+    // (each result is cached server-side, so single-type requests reuse it)
+    const res = await fetch(`${API_BASE}/api/route/compare?origin_lat=${origin.lat}&origin_lon=${oLon}&dest_lat=${dest.lat}&dest_lon=${dLon}&flood_time=${currentFloodIndex}`);
+    const comparison = await res.json();
+    const routes = comparison.routes || {};
+
+    const results = types.map(t => {
+      const data = routes[t.id];
+      if (!data || data.error) {
+        return { type: t, error: data ? data.error : comparison.error, success: false };
+      }
+      return { type: t, data: data, success: true };
+    });
 
     tbody.innerHTML = ""; // Clear loader
 